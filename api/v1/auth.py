@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends
+from fastapi.security import HTTPAuthorizationCredentials
+
+from dependencies.auth import parse_bearer_token, security, verify_sanctum_token
+from dependencies.token_cache import revoke_token, token_cache
+
+router = APIRouter()
+
+@router.delete("/auth/token", summary="Forget the caller's token in the auth caches")
+async def revoke_current_token(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: int = Depends(verify_sanctum_token),
+):
+    """
+    Call when the token is deleted or rotated (e.g. on logout), so it stops
+    being trusted from the auth caches: at once in this worker and in Redis,
+    within AUTH_CACHE_TTL in the other workers.
+    """
+    token_id, _ = parse_bearer_token(credentials.credentials)
+    await revoke_token(token_id)
+    return {"revoked": token_id}
+
+@router.get("/health", summary="Liveness and this worker's auth cache counters")
+async def health():
+    return {"status": "ok", "auth_cache": token_cache.stats()}
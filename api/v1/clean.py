@@ -1,74 +1,182 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from dependencies.auth import verify_sanctum_token
 from dependencies.db import get_db
-from services.cleaning_service import clean_and_prepare_data
-from dependencies.cache import cache, CACHE_TTL
-import pandas as pd
-import json
+from dependencies.workers import process_pool, thread_pool
+from services.cleaning_service import clean_raw_dataset, clean_delta_dataset
+from dependencies.cache import cache
+from services.aggregates import save_aggregates, save_appended_aggregates
+from services.dataset_store import (
+    save_cleaned_dataset, append_cleaned_dataset, load_cleaning_state, get_dataset_info, get_cleaned_version,
+    raw_data_key, cleaned_data_key, fetch_dataset_blobs, fetch_row_groups, dataset_lineage, appended_row_groups,
+    load_cleaned_snapshot,
+)
+from services.records_service import (
+    RECORD_FORMATS, RECORDS_MAX_PAGE_SIZE, RECORDS_PAGE_SIZE, decode_cursor, records_page, stream_records,
+)
 
 router = APIRouter()
 
+
+def _dataset_handle(version: Optional[str]) -> dict:
+    """Where the rows of a cleaned dataset version are served from."""
+    return {"version": version, "records_url": f"/api/v1/cleaned-records?version={version}"}
+
 @router.get("/clean-data", summary="Clean cached raw data and cache the result")
 async def clean_user_uploaded_data(
+    request: Request,
+    mode: str = Query("auto", enum=["auto", "full"]),
     user_id: int = Depends(verify_sanctum_token),
     db = Depends(get_db),
 ):
     """
-    1) Load raw JSON from Redis key `raw_data:user:{user_id}`.
-    2) Build a DataFrame, clean it, compute stats.
-    3) Cache and return the cleaned‐payload under `cleaned_data:user:{user_id}`.
+    1) Load the raw dataset from Redis key `raw_data:user:{user_id}`.
+    2) Decode it to a DataFrame, clean it, compute stats.
+    3) Cache the cleaned dataset under `cleaned_data:user:{user_id}` and return a summary.
+
+    The summary carries a `dataset` handle: the version of the cleaned data
+    and the /cleaned-records URL its rows are paged or streamed from.
+
+    With `mode=auto`, rows appended since the last clean (`/upload-data?mode=append`)
+    are cleaned on their own and added to the cleaned dataset. `mode=full`
+    always re-cleans everything.
     """
     try:
-        raw_key = f"raw_data:user:{user_id}"
-        if not cache.exists(raw_key):
+        raw_key = raw_data_key(user_id)
+        # existence check and fetch in one round trip
+        async with cache.pipeline(transaction=False) as pipe:
+            exists, raw_blob = await pipe.exists(raw_key).get(raw_key).execute()
+        if not exists:
             raise HTTPException(
                 status_code=404,
                 detail="No uploaded data found; please POST to /api/v1/upload-data first."
             )
 
-        # load raw records
-        raw_json = cache.get(raw_key)
-        records = json.loads(raw_json)
-        df = pd.DataFrame(records)
-
-        # clean
-        cleaned = clean_and_prepare_data(df)
-
-        # serialize cleaned records
-        cleaned_json = cleaned.reset_index(drop=True) \
-                              .to_json(orient="records", date_format="iso")
-        records_clean = json.loads(cleaned_json)
-
-        # compute basic stats
-        desc = cleaned.describe(include="all").T
-        stats_json = (
-            desc.reset_index()
-                .rename(columns={"index": "column"})
-                .to_json(
-                    orient="records",
-                    date_format="iso",
-                    date_unit="s",
-                    default_handler=str,
-                )
+        if mode == "auto":
+            state, row_index = await load_cleaning_state(user_id)
+            appended = appended_row_groups(raw_blob, state.get("lineage")) if state else None
+            info = await get_dataset_info(cleaned_data_key(user_id)) if appended is not None else None
+            if info is not None:
+                return await _clean_appended(request, user_id, raw_blob, appended, state, row_index, info)
+
+        # streamed uploads are stored as row groups behind a manifest
+        raw_blobs = await fetch_dataset_blobs(raw_blob)
+
+        # decode, clean, describe and aggregate in a worker process
+        cleaned, stats, memory, aggregates, state, row_index = await process_pool.run(
+            clean_raw_dataset, raw_blobs, request=request
+        )
+
+        # cache cleaned dataset in the columnar format, stats as metadata;
+        # the new version invalidates decoded copies held by other workers
+        state["lineage"] = dataset_lineage(raw_blob)
+        previous_version = await get_cleaned_version(user_id)
+        version = await save_cleaned_dataset(
+            user_id, cleaned, meta={"statistics": stats}, state=state, row_index=row_index
         )
-        stats = json.loads(stats_json)
+        # dashboard endpoints read these instead of recomputing per request
+        await save_aggregates(user_id, version, aggregates, replaces=previous_version)
 
-        payload = {
+        return {
             "message":    "Data cleaned successfully.",
+            "mode":       "full",
             "rows":       len(cleaned),
             "columns":    cleaned.columns.tolist(),
-            "data":       records_clean,
+            "dataset":    _dataset_handle(version),
             "statistics": stats,
+            # bytes of the cleaned frame before and after its dtype plan
+            "memory":     memory,
         }
 
-        # cache cleaned
-        clean_key = f"cleaned_data:user:{user_id}"
-        cache.set(clean_key, json.dumps(payload), ex=CACHE_TTL)
-
-        return payload
-
     except HTTPException:
         # re-raise our 404 if no raw data
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _clean_appended(request: Request, user_id: int, raw_blob: bytes, appended: list,
+                          state: dict, row_index: bytes, info: dict) -> dict:
+    """Clean only the appended row groups and add them to the cleaned dataset."""
+    meta = info["meta"]
+    appended_rows, memory, stale = 0, None, meta.get("stale", [])
+    rows, columns = info["rows"], info["columns"]
+    version = await get_cleaned_version(user_id)
+
+    if appended:
+        delta_blobs = await fetch_row_groups(appended)
+        cleaned, memory, state, delta_index, new_stale = await process_pool.run(
+            clean_delta_dataset, delta_blobs, state, row_index, request=request
+        )
+        state["lineage"] = dataset_lineage(raw_blob)
+        previous_version = version
+        version, meta = await append_cleaned_dataset(user_id, cleaned, state, delta_index, stale=new_stale)
+        await save_appended_aggregates(user_id, version, previous_version, cleaned)
+        rows, stale, appended_rows = state["rows"], meta["stale"], len(cleaned)
+
+    return {
+        "message":       "Appended data cleaned successfully." if appended else "No new rows to clean.",
+        "mode":          "incremental",
+        "rows":          rows,
+        "appended_rows": appended_rows,
+        "columns":       columns,
+        "dataset":       _dataset_handle(version),
+        # statistics describe the dataset as of the last full clean
+        "statistics":    meta.get("statistics", []),
+        # of the appended rows only
+        "memory":        memory,
+        "stale":         stale,
+    }
+
+
+
+@router.get("/cleaned-records", summary="Page through or stream the rows of the cleaned dataset")
+async def cleaned_records(
+    request: Request,
+    cursor: Optional[str] = Query(None, description="`next_cursor` of the previous page"),
+    limit: int = Query(RECORDS_PAGE_SIZE, ge=1, le=RECORDS_MAX_PAGE_SIZE),
+    fmt: str = Query("json", alias="format", enum=["json", *RECORD_FORMATS]),
+    version: Optional[str] = Query(None, description="Dataset version the rows must come from"),
+    user_id: int = Depends(verify_sanctum_token),
+):
+    """
+    `format=json` returns one page of `limit` records with the `next_cursor`
+    to pass for the following page (null on the last one). `format=ndjson`
+    or `format=csv` streams every row instead, a chunk at a time.
+
+    Cursors, like `version`, pin the dataset version; once the data is
+    cleaned again they get a 409 and paging has to start over.
+    """
+    try:
+        snapshot = await load_cleaned_snapshot(user_id)
+    except ValueError:
+        raise HTTPException(500, "Failed to parse cached cleaned data.")
+    if snapshot is None:
+        raise HTTPException(404, "No cleaned data found in cache. POST to /api/v1/clean-data first.")
+    df, current = snapshot
+
+    offset = 0
+    if cursor is not None and fmt == "json":
+        try:
+            cursor_version, offset = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        if version is not None and version != cursor_version:
+            raise HTTPException(400, "The cursor belongs to another dataset version.")
+        version = cursor_version
+    if version is not None and version != current:
+        raise HTTPException(409, "The cleaned dataset has changed; start again from the first page.")
+
+    if fmt == "json":
+        body = await thread_pool.run(records_page, df, current, offset, limit, request=request)
+        return Response(content=body, media_type="application/json")
+
+    return StreamingResponse(
+        stream_records(df, fmt),
+        media_type=RECORD_FORMATS[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="cleaned_data.{fmt}"',
+            "X-Dataset-Version": current,
+        },
+    )
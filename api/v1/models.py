@@ -0,0 +1,181 @@
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+
+from dependencies.auth import verify_sanctum_token
+from dependencies.workers import process_pool, thread_pool
+from services.dataset_store import load_cleaning_state
+from services.model_monitor import HISTORY_KINDS, MONITOR_HISTORY_SIZE, model_monitor
+from services.model_registry import model_registry
+from services.prediction_service import missing_features, prepare_scoring_rows, score_rows
+from services.upload_service import process_uploaded_file
+from utils.model_monitor import check_data_drift
+
+router = APIRouter()
+
+
+async def _get_user_model(user_id: int, model_id: Optional[str] = None):
+    meta = await model_registry.get(user_id, model_id)
+    if meta is None:
+        raise HTTPException(404, "Model not found. Train a model first." if model_id is None else "Model not found.")
+    return meta
+
+
+async def _model_features(request: Request, user_id: int, file: UploadFile, meta) -> pd.DataFrame:
+    """
+    The uploaded batch with the model's features. Rows in the cleaned layout
+    are used as they are; raw claim rows first get their features derived
+    with the statistics of the last /clean-data run.
+    """
+    try:
+        df = await process_uploaded_file(file)
+    except ValueError as e:
+        raise HTTPException(400, f"Failed to parse uploaded file: {e}")
+    if df.empty:
+        raise HTTPException(400, "The uploaded file has no rows.")
+
+    if missing_features(df, meta["feature_columns"]):
+        state, row_index = await load_cleaning_state(user_id)
+        if state is None:
+            raise HTTPException(
+                422, "The rows lack the model's features and there is no cleaning state to derive them from. "
+                     "POST to /api/v1/clean-data first."
+            )
+        try:
+            df = await process_pool.run(prepare_scoring_rows, df, state, row_index, request=request)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(422, f"Could not derive the model's features: {e}")
+        missing = missing_features(df, meta["feature_columns"])
+        if missing:
+            raise HTTPException(422, f"The rows lack the model's features: {missing}")
+    return df
+
+
+@router.get(
+    "/models",
+    summary="Models registered by training runs, newest first",
+)
+async def list_models(user_id: int = Depends(verify_sanctum_token)):
+    # reference profiles are only needed for drift checks; GET /models/{id} has them
+    return [
+        {key: value for key, value in meta.items() if key != "reference_profile"}
+        for meta in await model_registry.list(user_id)
+    ]
+
+
+@router.get(
+    "/models/{model_id}",
+    summary="Metadata of a registered model",
+)
+async def get_model(model_id: str, user_id: int = Depends(verify_sanctum_token)):
+    return await _get_user_model(user_id, model_id)
+
+
+@router.delete(
+    "/models/{model_id}",
+    summary="Delete a registered model",
+)
+async def delete_model(model_id: str, user_id: int = Depends(verify_sanctum_token)):
+    meta = await _get_user_model(user_id, model_id)
+    await model_registry.delete(user_id, model_id)
+    return meta
+
+
+@router.post(
+    "/predict",
+    summary="Score a batch of claims with a registered model",
+)
+async def predict(
+    request: Request,
+    file: UploadFile = File(...),
+    model_id: Optional[str] = None,
+    user_id: int = Depends(verify_sanctum_token),
+):
+    """
+    Scores an uploaded CSV/Excel batch with a registered model (default: the
+    newest). Rows in the cleaned layout are scored as they are; raw claim
+    rows first get their features derived with the statistics of the last
+    /clean-data run. Returns one prediction per row, plus fraud scores and
+    flags when the model has a fraud model.
+    """
+    meta = await _get_user_model(user_id, model_id)
+    df = await _model_features(request, user_id, file, meta)
+
+    model = await model_registry.load(user_id, meta)
+    if model is None:
+        raise HTTPException(404, "Model not found.")
+    try:
+        scored = await thread_pool.run(score_rows, model, df, request=request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(422, f"Scoring failed: {e}")
+
+    return {
+        "model_id": meta["model_id"],
+        "version": meta["version"],
+        "model": meta["model"],
+        "target_variable": meta["target_variable"],
+        "rows": len(df),
+        **scored,
+    }
+
+
+@router.post(
+    "/drift",
+    summary="Compare a batch of claims with a model's training data",
+)
+async def check_drift(
+    request: Request,
+    file: UploadFile = File(...),
+    model_id: Optional[str] = None,
+    user_id: int = Depends(verify_sanctum_token),
+):
+    """
+    Compares an uploaded CSV/Excel batch, feature by feature, with the
+    reference profile stored when the model (default: the newest) was
+    trained. Numeric features get a KS statistic and PSI, categorical ones a
+    PSI; features whose PSI exceeds DRIFT_PSI_THRESHOLD are flagged. Each
+    check is logged to the drift history.
+    """
+    meta = await _get_user_model(user_id, model_id)
+    profile = meta.get("reference_profile")
+    if profile is None:
+        raise HTTPException(409, "This model has no reference profile; retrain it to check drift.")
+    df = await _model_features(request, user_id, file, meta)
+
+    drift_metrics = await thread_pool.run(check_data_drift, df, profile, request=request)
+    await model_monitor.log_drift(user_id, meta, len(df), drift_metrics)
+    return {
+        "model_id": meta["model_id"],
+        "version": meta["version"],
+        "rows": len(df),
+        "reference_rows": profile["rows"],
+        "drifted": sorted(col for col, metrics in drift_metrics.items() if metrics["drifted"]),
+        "features": drift_metrics,
+    }
+
+
+@router.get(
+    "/monitoring/history",
+    summary="Performance or drift history, newest first",
+)
+async def monitoring_history(
+    kind: str = "performance",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=MONITOR_HISTORY_SIZE),
+    user_id: int = Depends(verify_sanctum_token),
+):
+    """
+    `kind` is "performance" (the metrics of every registered model) or
+    "drift" (every drift check). `since` and `until` bound the entries'
+    timestamps; naive times are taken as UTC.
+    """
+    if kind not in HISTORY_KINDS:
+        raise HTTPException(400, f"kind must be one of {list(HISTORY_KINDS)}")
+    return await model_monitor.history(user_id, kind, since, until, limit)
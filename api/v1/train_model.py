@@ -1,11 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Optional
 from dependencies.auth import verify_sanctum_token
-from dependencies.cache import cache
-import json
-import pandas as pd
-from utils.train_model_formula import train_model_formula
+from dependencies.workers import process_pool
+from services.dataset_store import load_cleaned_snapshot
+from services.model_registry import model_registry, train_and_package
+from services.training_jobs import training_jobs
 import traceback
 
 router = APIRouter()
@@ -16,48 +16,75 @@ class TrainResult(BaseModel):
     RMSE: float
     R2: float
 
+class TrainJobRequest(BaseModel):
+    model_algorithm: str = "Gradient Boosting"
+    target_variable: str = "Claim_Amount_KES"
+    test_set_size: float = 0.2
+    cross_validation_folds: int = 5
+    enable_hyperparameter_tuning: bool = False
+    max_iter: int = 20
+    core_budget: Optional[int] = None
+    prune_candidates: bool = False
+
 @router.get(
     "/train-model",
     summary="Train a regression model",
 )
 async def train_model(
+    request: Request,
+    response: Response,
     model_algorithm: str = "Gradient Boosting",
     target_variable: str = "Claim_Amount_KES",
     test_set_size: float = 0.2,
     cross_validation_folds: int = 5,
     enable_hyperparameter_tuning: bool = False,
     max_iter: int = 20,
+    core_budget: Optional[int] = None,
+    prune_candidates: bool = False,
     user_id: int = Depends(verify_sanctum_token),
 ):
-    cache_key = f"cleaned_data:user:{user_id}"
-    raw = cache.get(cache_key)
-    if not raw:
-        raise HTTPException(404, "No cleaned data found in cache.")
+    """
+    `core_budget` cores (default TRAINING_CORE_BUDGET, 0 = sequential) are
+    shared by the candidate models, which then train concurrently, and their
+    CV folds. `prune_candidates` skips candidates whose quick fit on a
+    sample clearly trails the best one.
+    """
     try:
-        payload = json.loads(raw)
-    except json.JSONDecodeError:
+        snapshot = await load_cleaned_snapshot(user_id)
+    except ValueError:
         raise HTTPException(500, "Failed to parse cached data.")
+    if snapshot is None:
+        raise HTTPException(404, "No cleaned data found in cache.")
+    records, dataset_version = snapshot
 
-    records = payload.get("data", [])
-    records = pd.DataFrame(records)
+    params = {
+        "model_algorithm": model_algorithm,
+        "target_variable": target_variable,
+        "test_set_size": test_set_size/100,
+        "cross_validation_folds": cross_validation_folds,
+        "enable_hyperparameter_tuning": enable_hyperparameter_tuning,
+        "max_iter": max_iter,
+        "core_budget": core_budget,
+        "prune_candidates": prune_candidates,
+    }
 
-    # Kick off the training
+    # Kick off the training in a worker process
     try:
-        results_df = train_model_formula(
-            model_algorithm=model_algorithm,
-            target_variable=target_variable,
-            test_set_size=test_set_size/100,
-            cross_validation_folds=cross_validation_folds,
-            enable_hyperparameter_tuning=enable_hyperparameter_tuning,
-            max_iter=max_iter,
-            records=records
+        results_df, model_meta, model_blob = await process_pool.run(
+            train_and_package, params, records, dataset_scope=(user_id, dataset_version), request=request,
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Training failed: {e}")
 
     if results_df is False or results_df is None:
         raise HTTPException(status_code=400, detail="No Result")
 
+    # keep the fitted model for /predict; the id comes back in a header so the body is unchanged
+    model_meta = await model_registry.register(user_id, model_meta, model_blob, dataset_version)
+    response.headers["X-Model-Id"] = model_meta["model_id"]
+
     # Convert to JSON-able list of dicts
     try:
         recs = results_df.to_dict(orient="records")
@@ -65,4 +92,76 @@ async def train_model(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Return results failed: {e}")
 
-    return recs
\ No newline at end of file
+    return recs
+
+
+@router.post(
+    "/train-jobs",
+    status_code=202,
+    summary="Submit a background training job",
+)
+async def submit_train_job(
+    body: TrainJobRequest,
+    user_id: int = Depends(verify_sanctum_token),
+):
+    """
+    Queue a training run on the cleaned dataset and return its job record.
+    An identical job already in flight for this user and dataset is returned
+    instead of starting a new one.
+    """
+    try:
+        snapshot = await load_cleaned_snapshot(user_id)
+    except ValueError:
+        raise HTTPException(500, "Failed to parse cached data.")
+    if snapshot is None:
+        raise HTTPException(404, "No cleaned data found in cache.")
+    records, dataset_version = snapshot
+
+    params = body.model_dump()
+    # same percentage convention as GET /train-model
+    params["test_set_size"] = params["test_set_size"] / 100
+
+    job, created = await training_jobs.submit(user_id, params, records, dataset_version)
+    return {**job, "deduplicated": not created}
+
+
+async def _get_user_job(job_id: str, user_id: int) -> Dict[str, Any]:
+    job = await training_jobs.get(job_id)
+    if job is None or job["user_id"] != user_id:
+        raise HTTPException(404, "Training job not found.")
+    return job
+
+
+@router.get(
+    "/train-jobs/{job_id}",
+    summary="Status and result of a training job",
+)
+async def get_train_job(
+    job_id: str,
+    user_id: int = Depends(verify_sanctum_token),
+):
+    return await _get_user_job(job_id, user_id)
+
+
+@router.get(
+    "/train-jobs/{job_id}/progress",
+    summary="Progress of a training job",
+)
+async def get_train_job_progress(
+    job_id: str,
+    user_id: int = Depends(verify_sanctum_token),
+):
+    job = await _get_user_job(job_id, user_id)
+    return {"id": job["id"], "status": job["status"], "progress": job["progress"]}
+
+
+@router.delete(
+    "/train-jobs/{job_id}",
+    summary="Cancel a training job",
+)
+async def cancel_train_job(
+    job_id: str,
+    user_id: int = Depends(verify_sanctum_token),
+):
+    await _get_user_job(job_id, user_id)
+    return await training_jobs.cancel(job_id)
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
 from dependencies.auth import verify_sanctum_token
-from dependencies.cache import cache, CACHE_TTL
-from utils.file_parser import parse_uploaded_file
+from services.dataset_store import raw_data_key
+from services.upload_service import ingest_uploaded_file
 import logging
 import traceback
 
@@ -12,29 +13,37 @@ router = APIRouter()
 @router.post("/upload-data", summary="Upload raw data and cache it in Redis")
 async def upload_data(
     file: UploadFile = File(...),
+    mode: str = Query("replace", enum=["replace", "append"]),
+    sheet: Optional[str] = Query(None, description="Excel sheet to read, by name or 0-based position; the first by default"),
+    columns: str = Query("all", enum=["all", "pipeline"]),
     user_id: int = Depends(verify_sanctum_token),
 ):
     """
-    Reads the uploaded file into memory, parses it to a DataFrame,
-    then caches the raw JSON records under `raw_data:user:{user_id}`.
+    Streams the spooled upload through the parser chunk by chunk and caches
+    each chunk as a columnar row group under `raw_data:user:{user_id}`.
+    `mode=append` adds the rows to the stored upload (e.g. a weekly delta)
+    instead of replacing it; the next /clean-data then cleans only them.
+    `columns=pipeline` keeps only the columns the cleaning pipeline reads;
+    rows that differ only in a dropped column then count as duplicates.
+    Parsed Excel sheets are cached by the workbook's content hash, so
+    uploading the same workbook again skips parsing.
     """
     try:
-        contents = await file.read()
-        # parse into DataFrame (same parser used in clean.py)
-        df = parse_uploaded_file(contents, file.filename)
-
-        # serialize to JSON records
-        json_str = df.reset_index(drop=True) \
-                     .to_json(orient="records", date_format="iso")
-        
-        cache_key = f"raw_data:user:{user_id}"
-        cache.set(cache_key, json_str, ex=CACHE_TTL)
+        summary = await ingest_uploaded_file(
+            file, raw_data_key(user_id), append=mode == "append",
+            sheet=int(sheet) if sheet is not None and sheet.isdigit() else sheet, columns=columns,
+        )
 
         return {
             "message": "Uploaded data cached successfully",
-            "columns": df.columns.tolist(),
+            "mode": mode,
+            "rows": summary["rows"],
+            "total_rows": summary["total_rows"],
+            "columns": summary["columns"],
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         # 1) log full traceback to console
         tb = traceback.format_exc()
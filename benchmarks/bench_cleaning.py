@@ -0,0 +1,53 @@
+"""
+Times the vectorized cleaning pipeline against the original row-wise one.
+
+    python -m benchmarks.bench_cleaning --rows 10000 100000 1000000
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.legacy_cleaning import legacy_clean_and_prepare_data
+from benchmarks.synthetic_claims import generate_claims
+from services.cleaning_service import clean_and_prepare_data
+
+
+def _best_of(fn, df: pd.DataFrame, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(df.copy())
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-legacy", action="store_true", help="only time the vectorized pipeline")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'legacy (s)':>11}  {'vectorized (s)':>15}  {'speedup':>8}  output")
+    for rows in args.rows:
+        raw = generate_claims(rows, seed=args.seed)
+        new_time, new_df = _best_of(clean_and_prepare_data, raw, args.repeat)
+
+        if args.skip_legacy:
+            print(f"{rows:>10}  {'-':>11}  {new_time:>15.3f}  {'-':>8}  -")
+            continue
+
+        # the row-wise baseline is slow enough that one run is representative
+        old_time, old_df = _best_of(legacy_clean_and_prepare_data, raw, 1)
+        try:
+            pd.testing.assert_frame_equal(old_df, new_df)
+            output = "identical"
+        except AssertionError:
+            output = "DIFFERS"
+        print(f"{rows:>10}  {old_time:>11.3f}  {new_time:>15.3f}  {old_time / new_time:>7.1f}x  {output}")
+
+
+if __name__ == "__main__":
+    main()
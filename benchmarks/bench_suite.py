@@ -0,0 +1,213 @@
+"""
+Times the hot paths on seeded synthetic claims and measures their peak
+memory, then writes the results as JSON. A later run given that file as
+--baseline flags every benchmark that got slower or hungrier than the
+threshold allows, and exits with status 1 if any did.
+
+    python -m benchmarks.bench_suite --rows 10000 100000 --output before.json
+    python -m benchmarks.bench_suite --rows 10000 100000 --baseline before.json
+    python -m benchmarks.bench_suite --only tier_density claims_hierarchy
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import sklearn
+import xgboost
+
+from benchmarks.synthetic_claims import generate_claims
+from services.aggregates import (
+    compute_claims_hierarchy, compute_correlation, compute_employee_totals, compute_rollup, compute_tier_density,
+    day_counts, monthly_ci,
+)
+from services.cleaning_service import clean_and_prepare_data, clean_raw_dataset
+from services.dataset_store import decode_frame, encode_frame
+from utils.train_model_formula import train_model_formula
+
+RESULTS_FORMAT = 1
+
+
+class Inputs:
+    """
+    The frames benchmarks run on, built once per row count: the raw upload,
+    the cleaned frame in its stored dtypes, its encoded blob and its per-day
+    rollup.
+    """
+
+    def __init__(self, rows: int, seed: int):
+        self.rows = rows
+        self.raw = generate_claims(rows, seed=seed)
+        self.raw_blob = encode_frame(self.raw)
+        self.cleaned = clean_raw_dataset([self.raw_blob])[0]
+        self.blob = encode_frame(self.cleaned)
+        self.rollup = compute_rollup(self.cleaned)
+
+
+def _train(cleaned: pd.DataFrame):
+    return train_model_formula("XGBoost", "Claim_Amount_KES", 0.2, 3, False, 100, cleaned)
+
+
+# name -> (setup, run): `setup` builds a benchmark's arguments outside the
+# measurement (copies of frames the function modifies), `run` is measured
+BENCHMARKS: Dict[str, Any] = {
+    "clean_and_prepare_data": (lambda inputs: (inputs.raw.copy(),), clean_and_prepare_data),
+    "clean_raw_dataset": (lambda inputs: ([inputs.raw_blob],), clean_raw_dataset),
+    "encode_frame": (lambda inputs: (inputs.cleaned,), encode_frame),
+    "decode_frame": (lambda inputs: (inputs.blob,), decode_frame),
+    "tier_density": (lambda inputs: (inputs.cleaned,), compute_tier_density),
+    "claims_hierarchy": (lambda inputs: (inputs.cleaned,), compute_claims_hierarchy),
+    "employee_totals": (lambda inputs: (inputs.cleaned,), compute_employee_totals),
+    "correlation": (lambda inputs: (inputs.cleaned,), compute_correlation),
+    "rollup": (lambda inputs: (inputs.cleaned,), compute_rollup),
+    "temporal_analysis": (lambda inputs: (inputs.rollup,), lambda partials: (day_counts(partials), monthly_ci(partials))),
+    "train_model_formula": (lambda inputs: (inputs.cleaned,), _train),
+}
+
+
+def _time(setup: Callable, run: Callable, inputs: Inputs, repeat: int) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        args = setup(inputs)
+        gc.collect()
+        start = time.perf_counter()
+        run(*args)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _peak_memory(setup: Callable, run: Callable, inputs: Inputs) -> int:
+    """
+    Peak bytes allocated while `run` executes, over what was allocated when
+    it started; numpy and pandas buffers are traced along with Python objects,
+    native library buffers (XGBoost's) and child processes are not. Measured
+    in a separate run, since tracing slows the code down.
+    """
+    args = setup(inputs)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        run(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - start
+
+
+def run_benchmarks(rows: List[int], names: List[str], repeat: int, seed: int) -> Dict[str, Any]:
+    results = []
+    for count in rows:
+        inputs = Inputs(count, seed)
+        for name in names:
+            setup, run = BENCHMARKS[name]
+            times = _time(setup, run, inputs, repeat)
+            result = {
+                "benchmark": name,
+                "rows": count,
+                "min_s": min(times),
+                "median_s": statistics.median(times),
+                "peak_bytes": _peak_memory(setup, run, inputs),
+            }
+            results.append(result)
+            print(f"{name:>24}  {count:>9}  {result['min_s']:>9.4f}  {result['median_s']:>9.4f}  "
+                  f"{result['peak_bytes'] / 2 ** 20:>10.1f}", flush=True)
+        del inputs
+    return {
+        "format": RESULTS_FORMAT,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "scikit-learn": sklearn.__version__,
+            "xgboost": xgboost.__version__,
+        },
+        "seed": seed,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float,
+            memory_threshold: float) -> List[Dict[str, Any]]:
+    """
+    Ratios of every current result to the baseline result of the same
+    benchmark and row count. Times are compared by their minimum, the run
+    least disturbed by other load on the machine.
+    """
+    previous = {(r["benchmark"], r["rows"]): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        before = previous.get((result["benchmark"], result["rows"]))
+        if before is None:
+            continue
+        time_ratio = result["min_s"] / before["min_s"] if before["min_s"] else float("inf")
+        memory_ratio = result["peak_bytes"] / before["peak_bytes"] if before["peak_bytes"] > 0 else 1.0
+        rows.append({
+            "benchmark": result["benchmark"],
+            "rows": result["rows"],
+            "time_ratio": time_ratio,
+            "memory_ratio": memory_ratio,
+            "regressed": time_ratio > 1 + threshold or memory_ratio > 1 + memory_threshold,
+        })
+    return rows
+
+
+def _print_comparison(rows: List[Dict[str, Any]], baseline: Dict[str, Any]) -> None:
+    print(f"\nagainst the baseline of {baseline.get('created_at', '?')}:")
+    print(f"{'benchmark':>24}  {'rows':>9}  {'time':>8}  {'memory':>8}")
+    for row in rows:
+        flag = "  REGRESSED" if row["regressed"] else ""
+        print(f"{row['benchmark']:>24}  {row['rows']:>9}  {row['time_ratio']:>7.2f}x  {row['memory_ratio']:>7.2f}x{flag}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--skip", nargs="+", choices=list(BENCHMARKS), default=[], help="leave these benchmarks out")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown (0.2 = 20%%) past which a benchmark counts as regressed")
+    parser.add_argument("--memory-threshold", type=float, default=0.2,
+                        help="peak memory growth past which a benchmark counts as regressed")
+    args = parser.parse_args(argv)
+
+    names = [name for name in (args.only or BENCHMARKS) if name not in args.skip]
+    print(f"{'benchmark':>24}  {'rows':>9}  {'min (s)':>9}  {'median (s)':>9}  {'peak (MiB)':>10}")
+    current = run_benchmarks(args.rows, names, args.repeat, args.seed)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("format") != RESULTS_FORMAT:
+            raise SystemExit(f"Unsupported results format: {baseline.get('format')}")
+        rows = compare(current, baseline, args.threshold, args.memory_threshold)
+        _print_comparison(rows, baseline)
+        if any(row["regressed"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,438 @@
+"""
+Load test of one API worker. Starts `main.app` under uvicorn in a child
+process with local stand-ins (fakeredis or a local redis-server for Redis,
+a SQLite file holding `personal_access_tokens` for MySQL), has every
+virtual user upload and clean a synthetic claims file, then replays a mix
+of upload, clean, dashboard and training requests at each concurrency
+level. Reports throughput, p50/p95/p99 latency per route and the worker's
+peak RSS per level, and the highest level whose dashboard p99 stayed under
+--p99-limit.
+
+    python -m benchmarks.load_test --concurrency 1 4 16 32 --duration 30
+    python -m benchmarks.load_test --redis-url redis://localhost:6379/15 --output load.json
+    python -m benchmarks.load_test --mix claims_overview=3,temporal_analysis=1 --think-time 0.5
+
+Virtual users run closed loops: each sends its next request when the last
+one returned (plus --think-time, exponentially distributed, if given).
+Uploads replace the user's file with the same rows, so every level runs on
+datasets of the same size. RSS is read from /proc, so it is only reported
+on Linux. Needs the packages in requirements-dev.txt (httpx, fakeredis):
+
+    pip install -r requirements-dev.txt
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import secrets
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from benchmarks.synthetic_claims import generate_claims
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API = "/api/v1"
+
+# Routes the dashboards poll; the p99 limit is checked over these
+DASHBOARD_ACTIONS = ["claims_distribution", "claims_overview", "temporal_analysis", "cleaned_records"]
+ACTIONS = DASHBOARD_ACTIONS + ["upload", "clean", "train"]
+DEFAULT_MIX = "claims_distribution=30,claims_overview=30,temporal_analysis=20,cleaned_records=10,upload=4,clean=4,train=2"
+PERIODS = ["daily", "weekly", "monthly", "quarterly"]
+
+TOKENS_SCHEMA = """
+CREATE TABLE personal_access_tokens (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tokenable_type VARCHAR(255) NOT NULL,
+    tokenable_id INTEGER NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    token VARCHAR(64) NOT NULL UNIQUE,
+    abilities TEXT,
+    last_used_at DATETIME,
+    expires_at DATETIME,
+    created_at DATETIME,
+    updated_at DATETIME
+)
+"""
+
+
+# ====== Stand-ins ======
+
+def create_token_db(path: str, users: int) -> List[str]:
+    """
+    A SQLite `personal_access_tokens` table with one Sanctum token per user
+    (user ids 1..users). Returns the bearer tokens, `{id}|{plain text}`.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None).isoformat(sep=" ")
+    tokens = []
+    with sqlite3.connect(path) as conn:
+        conn.execute(TOKENS_SCHEMA)
+        for user_id in range(1, users + 1):
+            plain = secrets.token_hex(20)
+            cursor = conn.execute(
+                "INSERT INTO personal_access_tokens (tokenable_type, tokenable_id, name, token, abilities, created_at, updated_at)"
+                " VALUES ('App\\Models\\User', ?, 'load-test', ?, '[\"*\"]', ?, ?)",
+                (user_id, hashlib.sha256(plain.encode()).hexdigest(), now, now),
+            )
+            tokens.append(f"{cursor.lastrowid}|{plain}")
+    return tokens
+
+
+def serve(port: int, database: str) -> None:
+    """Child process: run `main.app` with its MySQL sessions swapped for the SQLite file."""
+    import uvicorn
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from dependencies.db import get_db
+    from main import app
+
+    engine = create_engine(f"sqlite:///{database}", connect_args={"check_same_thread": False, "timeout": 30})
+    sessions = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_sqlite_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_sqlite_db
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, database: str, redis_url: str) -> subprocess.Popen:
+    # load_dotenv never overrides variables already set, so the .env Redis is not used
+    env = {**os.environ, "REDIS_URL": redis_url}
+    return subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.load_test", "--serve", "--port", str(port), "--database", database],
+        cwd=REPO_ROOT, env=env,
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"The API server exited with status {server.returncode}.")
+        try:
+            if (await client.get("/openapi.json")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("The API server did not start in time.")
+
+
+# ====== Worker memory ======
+
+def _rss(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _descendants(pid: int) -> List[int]:
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        return []
+    return children + [grandchild for child in children for grandchild in _descendants(child)]
+
+
+class RssMonitor:
+    """
+    Samples the RSS of the API worker, and of the worker together with its
+    process pools, every `interval` seconds; keeps the peaks since the last
+    `reset`.
+    """
+
+    def __init__(self, pid: int, interval: float):
+        self.pid = pid
+        self.interval = interval
+        self.available = os.path.exists(f"/proc/{pid}/status")
+        self.reset()
+
+    def reset(self) -> None:
+        self.worker_peak = 0
+        self.total_peak = 0
+
+    def sample(self) -> None:
+        worker = _rss(self.pid)
+        total = worker + sum(_rss(child) for child in _descendants(self.pid))
+        self.worker_peak = max(self.worker_peak, worker)
+        self.total_peak = max(self.total_peak, total)
+
+    async def run(self) -> None:
+        while self.available:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def peaks(self) -> Optional[Dict[str, int]]:
+        if not self.available:
+            return None
+        return {"worker_peak_bytes": self.worker_peak, "with_pools_peak_bytes": self.total_peak}
+
+
+# ====== Virtual users ======
+
+class VirtualUser:
+    """One dashboard user: a bearer token and the claims file they upload."""
+
+    def __init__(self, client: httpx.AsyncClient, token: str, upload: bytes):
+        self.client = client
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.upload = upload
+
+    def _send(self, action: str, rng: random.Random):
+        if action == "upload":
+            return self.client.post(f"{API}/upload-data", files={"file": ("claims.csv", self.upload, "text/csv")},
+                                    headers=self.headers)
+        if action == "clean":
+            return self.client.get(f"{API}/clean-data", headers=self.headers)
+        if action == "claims_distribution":
+            return self.client.get(f"{API}/claims-distribution", headers=self.headers)
+        if action == "claims_overview":
+            return self.client.get(f"{API}/claims-overview", params={"period": rng.choice(PERIODS)}, headers=self.headers)
+        if action == "temporal_analysis":
+            return self.client.get(f"{API}/temporal-analysis", headers=self.headers)
+        if action == "cleaned_records":
+            return self.client.get(f"{API}/cleaned-records", params={"limit": 1000}, headers=self.headers)
+        if action == "train":
+            params = {"model_algorithm": "XGBoost", "test_set_size": 20, "cross_validation_folds": 3, "max_iter": 10}
+            return self.client.get(f"{API}/train-model", params=params, headers=self.headers)
+        raise ValueError(f"Unknown action: {action}")
+
+    async def call(self, action: str, rng: random.Random) -> Tuple[str, int, float]:
+        """(action, HTTP status or 0 on a transport error, seconds)."""
+        start = time.perf_counter()
+        try:
+            response = await self._send(action, rng)
+            await response.aread()
+            status = response.status_code
+        except httpx.TransportError:
+            status = 0
+        return action, status, time.perf_counter() - start
+
+
+async def setup_users(users: List[VirtualUser]) -> List[Tuple[str, int, float]]:
+    """Every user uploads and cleans their file, all at once."""
+    async def first_visit(user: VirtualUser):
+        rng = random.Random(0)
+        return [await user.call("upload", rng), await user.call("clean", rng)]
+    visits = await asyncio.gather(*(first_visit(user) for user in users))
+    return [sample for visit in visits for sample in visit]
+
+
+async def run_level(users: List[VirtualUser], mix: Dict[str, float], duration: float, think_time: float,
+                    seed: int) -> Tuple[List[Tuple[str, int, float]], float]:
+    """Samples of every request sent by `users` in `duration` seconds, and the seconds until the last returned."""
+    names, weights = list(mix), list(mix.values())
+    samples: List[Tuple[str, int, float]] = []
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def session(index: int, user: VirtualUser):
+        rng = random.Random(seed * 1_000_003 + index)
+        while time.perf_counter() < deadline:
+            samples.append(await user.call(rng.choices(names, weights)[0], rng))
+            if think_time:
+                await asyncio.sleep(rng.expovariate(1 / think_time))
+
+    await asyncio.gather(*(session(i, user) for i, user in enumerate(users)))
+    return samples, time.perf_counter() - start
+
+
+# ====== Reporting ======
+
+def _latency(seconds: List[float]) -> Dict[str, Optional[float]]:
+    if not seconds:
+        return {"p50_s": None, "p95_s": None, "p99_s": None, "max_s": None}
+    p50, p95, p99 = np.percentile(seconds, [50, 95, 99])
+    return {"p50_s": float(p50), "p95_s": float(p95), "p99_s": float(p99), "max_s": float(max(seconds))}
+
+
+def summarize(samples: List[Tuple[str, int, float]], elapsed: float) -> Dict[str, Any]:
+    """Request counts, errors (status 0 or >= 400) and latency percentiles per route and overall."""
+    groups: Dict[str, List[Tuple[str, int, float]]] = {}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+    groups["dashboard"] = [sample for sample in samples if sample[0] in DASHBOARD_ACTIONS]
+    groups["all"] = samples
+
+    routes = {}
+    for name, group in groups.items():
+        statuses: Dict[str, int] = {}
+        for _, status, _ in group:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        routes[name] = {
+            "requests": len(group),
+            "errors": sum(1 for _, status, _ in group if status == 0 or status >= 400),
+            "statuses": statuses,
+            **_latency([seconds for _, _, seconds in group]),
+        }
+    return {
+        "elapsed_s": elapsed,
+        "requests": len(samples),
+        "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+        "routes": routes,
+    }
+
+
+def _ms(seconds: Optional[float]) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+
+def print_level(level: Dict[str, Any]) -> None:
+    rss = level["rss"]
+    memory = "" if rss is None else (f", worker RSS {rss['worker_peak_bytes'] / 2 ** 20:.0f} MiB"
+                                     f" ({rss['with_pools_peak_bytes'] / 2 ** 20:.0f} MiB with pools)")
+    print(f"\n{level['name']}: {level['requests']} requests in {level['elapsed_s']:.1f}s, "
+          f"{level['throughput_rps']:.1f} req/s{memory}")
+    print(f"{'route':>20}  {'requests':>8}  {'errors':>6}  {'p50 ms':>7}  {'p95 ms':>7}  {'p99 ms':>7}  {'max ms':>7}")
+    for name, route in level["routes"].items():
+        print(f"{name:>20}  {route['requests']:>8}  {route['errors']:>6}  {_ms(route['p50_s']):>7}  "
+              f"{_ms(route['p95_s']):>7}  {_ms(route['p99_s']):>7}  {_ms(route['max_s']):>7}", flush=True)
+
+
+def sustained_concurrency(levels: List[Dict[str, Any]], p99_limit: float) -> Optional[int]:
+    """Highest concurrency up to which every level kept the dashboard p99 under `p99_limit` without errors."""
+    sustained = None
+    for level in levels:
+        dashboard = level["routes"]["dashboard"]
+        if dashboard["requests"] and (dashboard["errors"] or dashboard["p99_s"] > p99_limit):
+            break
+        sustained = level["concurrency"]
+    return sustained
+
+
+def _parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"Unknown action {name!r}; choose from {', '.join(ACTIONS)}")
+        mix[name] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError("The mix needs at least one action with a positive weight.")
+    return mix
+
+
+async def run(args) -> Dict[str, Any]:
+    users_needed = max(args.concurrency)
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    database = os.path.join(workdir, "tokens.sqlite")
+    tokens = create_token_db(database, users_needed)
+    uploads = [
+        generate_claims(args.rows, seed=args.seed + i).to_csv(index=False).encode()
+        for i in range(users_needed)
+    ]
+
+    port = _free_port()
+    server = start_server(port, database, args.redis_url)
+    limits = httpx.Limits(max_connections=users_needed, max_keepalive_connections=users_needed)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout, limits=limits) as client:
+            await wait_until_ready(client, server)
+            monitor = RssMonitor(server.pid, args.sample_interval)
+            sampler = asyncio.create_task(monitor.run())
+            users = [VirtualUser(client, token, upload) for token, upload in zip(tokens, uploads)]
+
+            start = time.perf_counter()
+            setup = summarize(await setup_users(users), time.perf_counter() - start)
+            setup.update(name=f"setup ({users_needed} users upload and clean)", concurrency=users_needed,
+                         rss=monitor.peaks())
+            print_level(setup)
+
+            levels = []
+            for concurrency in args.concurrency:
+                monitor.reset()
+                samples, elapsed = await run_level(users[:concurrency], args.mix, args.duration, args.think_time, args.seed)
+                level = summarize(samples, elapsed)
+                level.update(name=f"{concurrency} concurrent users", concurrency=concurrency, rss=monitor.peaks())
+                print_level(level)
+                levels.append(level)
+            sampler.cancel()
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    sustained = sustained_concurrency(levels, args.p99_limit)
+    print(f"\nhighest concurrency with dashboard p99 under {args.p99_limit * 1000:.0f} ms and no errors: "
+          f"{sustained if sustained is not None else 'none'}")
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "concurrency": args.concurrency, "duration": args.duration, "rows": args.rows, "mix": args.mix,
+            "think_time": args.think_time, "redis_url": args.redis_url.split("@")[-1], "seed": args.seed,
+        },
+        "cpu_count": os.cpu_count(),
+        "setup": setup,
+        "levels": levels,
+        "p99_limit_s": args.p99_limit,
+        "sustained_concurrency": sustained,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32],
+                        help="concurrent virtual users of each level, run in this order")
+    parser.add_argument("--duration", type=float, default=30, help="seconds each level sends requests for")
+    parser.add_argument("--rows", type=int, default=20_000, help="rows of each user's claims file")
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix(DEFAULT_MIX),
+                        help=f"action=weight pairs (default {DEFAULT_MIX})")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds a user waits between requests")
+    parser.add_argument("--redis-url", default="fakeredis://",
+                        help="fakeredis:// for an in-process fake, or the URL of a local redis-server")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds before a request counts as failed")
+    parser.add_argument("--p99-limit", type=float, default=1.0, help="dashboard p99 (seconds) a level must stay under")
+    parser.add_argument("--sample-interval", type=float, default=0.25, help="seconds between RSS samples")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.port, args.database)
+        return 0
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
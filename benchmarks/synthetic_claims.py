@@ -0,0 +1,68 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+EMPLOYERS = ["Safaricom PLC", "KCB Group", "Equity Bank", "Kenya Power", "Nation Media",
+             "EABL", "Bamburi Cement", "Kenya Airways", "Small Co", "Tiny Ltd"]
+EMPLOYER_WEIGHTS = [0.22, 0.18, 0.15, 0.12, 0.1, 0.09, 0.07, 0.04, 0.02, 0.01]
+CATEGORIES = ["Gold", "Platinum", "Silver", "Bronze"]
+CATEGORY_WEIGHTS = [0.3, 0.25, 0.42, 0.03]
+VISIT_TYPES = ["Outpatient", "Inpatient", "Dental", "Optical", "Maternity"]
+DIAGNOSES = ["Malaria", "Upper Respiratory Infection", "Hypertension", "Diabetes Type 2",
+             "Typhoid Fever", "Gastritis", "Fracture", "Dental Caries", "Myopia", "Pregnancy"]
+TREATMENTS = ["Medication", "Surgery", "Physiotherapy", "X-Ray", "Lab Tests", "Consultation"]
+COUNTIES = ["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret", "Nyeri"]
+GENDERS = ["Male", "Female"]
+
+
+def generate_claims(rows: int, seed: int = 42, employees: Optional[int] = None) -> pd.DataFrame:
+    """
+    Seeded synthetic claims with the raw upload schema the cleaning pipeline
+    expects, including a few percent of missing, malformed and outlying values.
+    `employees` (default one per 8 claims) sets how many distinct employees
+    file the claims.
+    """
+    rng = np.random.default_rng(seed)
+    employees = max(employees or rows // 8, 1)
+
+    employee_id = rng.integers(100000, 100000 + employees, rows)
+    submission = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 730, rows), unit="D")
+    service = submission - pd.to_timedelta(rng.integers(0, 30, rows), unit="D")
+    hire = pd.Timestamp("2005-01-01") + pd.to_timedelta(rng.integers(0, 6900, rows), unit="D")
+
+    claim_amount = np.round(rng.lognormal(8.5, 1.1, rows), 2)
+    claim_amount[rng.random(rows) < 0.01] *= 25  # heavy tail
+
+    df = pd.DataFrame({
+        "Claim_ID": np.char.add("CLM", np.arange(rows).astype(str)),
+        "Employee_ID": employee_id,
+        "Employee_Age": rng.integers(16, 75, rows),
+        "Employee_Gender": rng.choice(GENDERS, rows),
+        "Employer": rng.choice(EMPLOYERS, rows, p=EMPLOYER_WEIGHTS),
+        "Category": rng.choice(CATEGORIES, rows, p=CATEGORY_WEIGHTS),
+        "Visit_Type": rng.choice(VISIT_TYPES, rows),
+        "Diagnosis": rng.choice(DIAGNOSES, rows),
+        "Treatment": rng.choice(TREATMENTS, rows),
+        "Provider_Name": rng.choice([f"Provider {i:03d}" for i in range(60)], rows),
+        "Hospital_County": rng.choice(COUNTIES, rows),
+        "Claim_Amount_KES": claim_amount,
+        "Co_Payment_KES": np.round(claim_amount * rng.uniform(0, 0.2, rows), 2),
+        "Submission_Date": submission.strftime("%Y-%m-%d"),
+        "Service_Date": service.strftime("%Y-%m-%d"),
+        "Hire_Date": hire.strftime("%Y-%m-%d"),
+        "Pre_Authorization_Required": rng.choice(["Yes", "No"], rows, p=[0.3, 0.7]),
+        "Inpatient_Cap_KES": rng.choice([500000.0, 1000000.0, 2000000.0], rows),
+        "Outpatient_Cap_KES": rng.choice([50000.0, 100000.0, 150000.0], rows),
+    })
+
+    # a little mess, as real exports have
+    missing = rng.random(rows) < 0.02
+    df.loc[missing, "Employee_Gender"] = np.nan
+    df.loc[rng.random(rows) < 0.01, "Diagnosis"] = np.nan
+    df.loc[rng.random(rows) < 0.005, "Employer"] = "  " + df["Employer"].str.lower() + " "
+
+    # drawn last, so the columns above are the same as before it was added
+    salary = np.round(rng.lognormal(11.2, 0.5, employees), -2)
+    df["Salary"] = salary[employee_id - 100000]
+    return df
@@ -1,26 +1,45 @@
 import hashlib
 import hmac
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Optional, Tuple
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from dotenv import load_dotenv
+from dependencies.cache import cache
 from dependencies.db import get_db
+from dependencies.token_cache import token_cache, get_shared_token, put_shared_token
 from sqlalchemy import text
 
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Record token use in personal_access_tokens.last_used_at, as Sanctum does;
+# off by default, since this API only ever read the table and never wrote last_used_at
+SANCTUM_TOUCH_LAST_USED = os.getenv("SANCTUM_TOUCH_LAST_USED", "false").lower() in ("1", "true", "yes")
+# Least time (seconds) between two last_used_at writes for one token, across workers
+SANCTUM_TOUCH_INTERVAL = int(os.getenv("SANCTUM_TOUCH_INTERVAL", 300))
+
 security = HTTPBearer()
 
-def verify_sanctum_token(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db=Depends(get_db),
-) -> int:
-    raw = credentials.credentials
-    try:
-        token_id_str, plain = raw.split("|", 1)
-        token_id = int(token_id_str)
-    except Exception:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Malformed auth token")
+def _utc_timestamp(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        # Laravel writes timestamps in the app timezone, UTC by default
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
 
+def _lookup_token(db, token_id: int, digest: str):
+    """Verify a token against MySQL. Returns (user_id, expires_at epoch or None)."""
     row = db.execute(
         text("""
-            SELECT token, tokenable_id
+            SELECT token, tokenable_id, expires_at
             FROM personal_access_tokens
             WHERE id = :id
         """), {"id": token_id}
@@ -29,9 +48,63 @@ def verify_sanctum_token(
     if not row:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token not found")
 
-    hashed, user_id = row
-    digest = hashlib.sha256(plain.encode()).hexdigest()
+    hashed, user_id, expires_at = row
     if not hmac.compare_digest(digest, hashed):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    return user_id
\ No newline at end of file
+    expires_at = _utc_timestamp(expires_at)
+    if expires_at is not None and expires_at <= datetime.now(timezone.utc).timestamp():
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
+
+    return user_id, expires_at
+
+def token_touch_key(token_id: int) -> str:
+    return f"auth_token_touched:{token_id}"
+
+def _touch_last_used(db, token_id: int) -> None:
+    """Set last_used_at in a transaction of its own, not the request's session."""
+    try:
+        with db.get_bind().begin() as conn:
+            conn.execute(
+                text("UPDATE personal_access_tokens SET last_used_at = :now WHERE id = :id"),
+                {"now": datetime.now(timezone.utc).replace(tzinfo=None), "id": token_id},
+            )
+    except Exception:
+        logger.warning("Could not update last_used_at for token %s", token_id, exc_info=True)
+
+def parse_bearer_token(raw: str) -> Tuple[int, str]:
+    """Split a Sanctum bearer token `{id}|{plain text}` into its id and plain text."""
+    try:
+        token_id_str, plain = raw.split("|", 1)
+        return int(token_id_str), plain
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Malformed auth token")
+
+async def verify_sanctum_token(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db=Depends(get_db),
+) -> int:
+    """
+    Resolve a Sanctum bearer token to its user id. Verified tokens are served
+    from the per-worker token cache, then the shared Redis tier, and only
+    then looked up in MySQL.
+    """
+    token_id, plain = parse_bearer_token(credentials.credentials)
+    digest = hashlib.sha256(plain.encode()).hexdigest()
+
+    user_id = token_cache.get(token_id, digest)
+    if user_id is None:
+        user_id = await get_shared_token(token_id, digest)
+    if user_id is not None:
+        return user_id
+
+    # the session is synchronous; keep the query off the event loop
+    user_id, expires_at = await run_in_threadpool(_lookup_token, db, token_id, digest)
+    lapses = token_cache.put(token_id, digest, user_id, expires_at)
+    await put_shared_token(token_id, digest, user_id, lapses)
+
+    # the first worker to claim the interval writes; a burst of misses for one token writes once
+    if SANCTUM_TOUCH_LAST_USED and await cache.set(token_touch_key(token_id), 1, nx=True, ex=SANCTUM_TOUCH_INTERVAL):
+        await run_in_threadpool(_touch_last_used, db, token_id)
+
+    return user_id
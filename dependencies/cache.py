@@ -1,8 +1,16 @@
+import hashlib
+import json
+import lzma
 import os
-import redis
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
 from dotenv import load_dotenv
 from urllib.parse import urlparse
 
+from dependencies.workers import thread_pool
+
 load_dotenv()
 
 REDIS_HOST = os.getenv("REDIS_HOST")
@@ -10,7 +18,22 @@ REDIS_PORT = int(os.getenv("REDIS_PORT"))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
 REDIS_DB = int(os.getenv("REDIS_CACHE_DB", 1))
 
-CACHE_TTL = int(os.getenv("SESSION_LIFETIME", 120)) * 60 
+CACHE_TTL = int(os.getenv("SESSION_LIFETIME", 120)) * 60
+
+# Connection pool sizing and timeouts (seconds)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 32))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 10))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 30))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 5))
+
+# Codec of values written with `set_value`: zlib, lzma, lz4 (needs the lz4
+# package) or none, and its compression level
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "zlib")
+CACHE_COMPRESSION_LEVEL = int(os.getenv("CACHE_COMPRESSION_LEVEL", 1))
+# Largest single Redis value; compressed values past it are split into chunks
+CACHE_CHUNK_BYTES = int(os.getenv("CACHE_CHUNK_BYTES", 8 * 1024 * 1024))
+# Bytes requested per MGET when fetching chunks; the MGETs share one round trip
+CACHE_MGET_BYTES = int(os.getenv("CACHE_MGET_BYTES", 64 * 1024 * 1024))
 
 # cache = redis.Redis(
 #     host=REDIS_HOST,
@@ -20,5 +43,210 @@ CACHE_TTL = int(os.getenv("SESSION_LIFETIME", 120)) * 60
 #     decode_responses=True,
 # )
 
-url = urlparse(os.environ.get("REDIS_URL"))
-cache=redis.Redis(host=url.hostname, port=url.port, password=url.password, ssl=(url.scheme == "rediss"), ssl_cert_reqs=None)
\ No newline at end of file
+# In-process server behind every `fakeredis://` client
+_fake_server = None
+
+
+def create_cache(redis_url: str) -> redis.Redis:
+    """
+    Build the asyncio Redis client behind a bounded, blocking connection pool.
+    A `fakeredis://` URL returns an in-process fake for tests and local runs
+    (fakeredis is in requirements-dev.txt); every fake client of the process
+    shares one server, so they see the same data.
+    """
+    global _fake_server
+    url = urlparse(redis_url)
+    if url.scheme == "fakeredis":
+        from fakeredis import FakeAsyncRedis, FakeServer
+        if _fake_server is None:
+            _fake_server = FakeServer()
+        return FakeAsyncRedis(server=_fake_server)
+
+    options = {}
+    if url.scheme == "rediss":
+        options["ssl_cert_reqs"] = None
+
+    pool = redis.BlockingConnectionPool.from_url(
+        redis_url,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        health_check_interval=30,
+        **options,
+    )
+    return redis.Redis(connection_pool=pool)
+
+
+# ====== Large values ======
+# Values written with `set_value` are compressed and, once compressed past
+# CACHE_CHUNK_BYTES, split over chunk keys. The key itself then holds
+#   PACKED_MAGIC (4 bytes) | codec id (1 byte) | compressed value
+# or, for a chunked value, a manifest
+#   CHUNKED_MAGIC (4 bytes) | JSON {"codec", "size", "chunks"}
+# Chunk keys are named by the hash of their content, so rewriting a key never
+# changes a chunk a reader of the previous manifest may be fetching. Values
+# without either magic (written by plain SET) are returned as stored.
+PACKED_MAGIC = b"VCZ1"
+CHUNKED_MAGIC = b"VCC1"
+CODECS = {"none": 0, "zlib": 1, "lzma": 2, "lz4": 3}
+# Values smaller than this are not worth compressing
+_COMPRESS_MIN_BYTES = 1024
+# Attempts at reading a chunked value whose key was rewritten mid-read
+_READ_ATTEMPTS = 3
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(data, CACHE_COMPRESSION_LEVEL)
+    if codec == "lzma":
+        return lzma.compress(data, preset=CACHE_COMPRESSION_LEVEL)
+    if codec == "lz4":
+        import lz4.frame
+        return lz4.frame.compress(data, compression_level=CACHE_COMPRESSION_LEVEL)
+    if codec == "none":
+        return bytes(data)
+    raise ValueError(f"Unknown CACHE_COMPRESSION: {codec}")
+
+
+def _decompress(codec_id: int, data: bytes) -> bytes:
+    if codec_id == CODECS["zlib"]:
+        return zlib.decompress(data)
+    if codec_id == CODECS["lzma"]:
+        return lzma.decompress(data)
+    if codec_id == CODECS["lz4"]:
+        import lz4.frame
+        return lz4.frame.decompress(data)
+    if codec_id == CODECS["none"]:
+        return bytes(data)
+    raise ValueError(f"Unknown cache codec id: {codec_id}")
+
+
+def pack_value(key: str, value: bytes, codec: str = CACHE_COMPRESSION) -> Tuple[bytes, Dict[str, bytes]]:
+    """
+    Compress `value` for storage under `key`. Returns the bytes to store
+    under `key` and the chunk keys and values to store with it; write all of
+    them with the same TTL, in one transaction.
+    """
+    if len(value) < _COMPRESS_MIN_BYTES:
+        codec = "none"
+    data = _compress(codec, value)
+    if len(data) <= CACHE_CHUNK_BYTES:
+        return PACKED_MAGIC + bytes([CODECS[codec]]) + data, {}
+
+    chunks = {}
+    for start in range(0, len(data), CACHE_CHUNK_BYTES):
+        chunk = data[start:start + CACHE_CHUNK_BYTES]
+        chunks[f"{key}:chunk:{hashlib.blake2b(chunk, digest_size=8).hexdigest()}:{len(chunks)}"] = chunk
+    manifest = {"codec": CODECS[codec], "size": len(value), "chunks": list(chunks)}
+    return CHUNKED_MAGIC + json.dumps(manifest).encode("utf-8"), chunks
+
+
+def value_chunks(head: Optional[bytes]) -> List[str]:
+    """Chunk keys of a stored value, given what its key holds."""
+    if not head or bytes(head[:len(CHUNKED_MAGIC)]) != CHUNKED_MAGIC:
+        return []
+    return json.loads(bytes(head[len(CHUNKED_MAGIC):]))["chunks"]
+
+
+def unpack_value(head: bytes, chunks: Optional[List[bytes]] = None) -> bytes:
+    """The value stored as `head` (what its key holds) and its `chunks`, in order."""
+    magic = bytes(head[:len(PACKED_MAGIC)])
+    if magic == PACKED_MAGIC:
+        return _decompress(head[len(PACKED_MAGIC)], head[len(PACKED_MAGIC) + 1:])
+    if magic == CHUNKED_MAGIC:
+        manifest = json.loads(bytes(head[len(CHUNKED_MAGIC):]))
+        return _decompress(manifest["codec"], b"".join(chunks))
+    return head
+
+
+async def _mget_chunks(keys: List[str]) -> List[Optional[bytes]]:
+    """Fetch chunk keys with MGETs of about CACHE_MGET_BYTES each, pipelined in one round trip."""
+    if not keys:
+        return []
+    batch = max(1, CACHE_MGET_BYTES // max(CACHE_CHUNK_BYTES, 1))
+    async with cache.pipeline(transaction=False) as pipe:
+        for start in range(0, len(keys), batch):
+            pipe.mget(keys[start:start + batch])
+        results = await pipe.execute()
+    return [chunk for result in results for chunk in result]
+
+
+def _unpack_all(items: List[Tuple[bytes, List[bytes]]]) -> List[bytes]:
+    return [unpack_value(head, chunks) for head, chunks in items]
+
+
+async def get_values(keys: List[str]) -> List[Optional[bytes]]:
+    """
+    Values stored with `set_value` (or plain SET), None where a key is
+    missing or its chunks have expired. Heads come in one MGET and every
+    chunk in one pipelined round trip; decompression runs off the event loop.
+    """
+    heads = await cache.mget(keys) if keys else []
+    values: List[Optional[bytes]] = [None] * len(keys)
+    pending = [i for i, head in enumerate(heads) if head is not None]
+
+    for attempt in range(_READ_ATTEMPTS):
+        chunk_keys = {i: value_chunks(heads[i]) for i in pending}
+        fetched = iter(await _mget_chunks([k for i in pending for k in chunk_keys[i]]))
+        complete, retry = [], []
+        for i in pending:
+            chunks = [next(fetched) for _ in chunk_keys[i]]
+            if any(chunk is None for chunk in chunks):
+                retry.append(i)
+            else:
+                complete.append((i, chunks))
+
+        if complete:
+            unpacked = await thread_pool.run(_unpack_all, [(heads[i], chunks) for i, chunks in complete])
+            for (i, _), value in zip(complete, unpacked):
+                values[i] = value
+
+        if not retry or attempt == _READ_ATTEMPTS - 1:
+            break
+        # rewritten (or expired) between reading the key and its chunks
+        for i, head in zip(retry, await cache.mget([keys[i] for i in retry])):
+            heads[i] = head
+        pending = [i for i in retry if heads[i] is not None]
+    return values
+
+
+async def get_value(key: str) -> Optional[bytes]:
+    return (await get_values([key]))[0]
+
+
+async def set_value(key: str, value: bytes, ex: Optional[int] = CACHE_TTL) -> None:
+    """
+    Store `value` compressed, chunked when large. The key and its chunks are
+    written in one transaction with the same TTL; chunks of the value it
+    replaces are deleted afterwards.
+    """
+    head, chunks = await thread_pool.run(pack_value, key, value)
+    async with cache.pipeline(transaction=True) as pipe:
+        pipe.get(key)
+        for chunk_key, chunk in chunks.items():
+            pipe.set(chunk_key, chunk, ex=ex)
+        pipe.set(key, head, ex=ex)
+        previous = (await pipe.execute())[0]
+
+    stale = [k for k in value_chunks(previous) if k not in chunks]
+    if stale:
+        await cache.delete(*stale)
+
+
+async def value_keys(keys: List[str]) -> List[str]:
+    """`keys` followed by the chunk keys of their values, e.g. to renew or delete them together."""
+    heads = await cache.mget(keys) if keys else []
+    return list(keys) + [k for head in heads for k in value_chunks(head)]
+
+
+async def delete_values(*keys: str) -> None:
+    if keys:
+        await cache.delete(*await value_keys(list(keys)))
+
+
+async def close_cache() -> None:
+    await cache.aclose()
+
+
+cache = create_cache(os.environ.get("REDIS_URL"))
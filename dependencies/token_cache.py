@@ -0,0 +1,130 @@
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from dependencies.cache import cache
+
+load_dotenv()
+
+# How long (seconds) a verified token is trusted without asking MySQL again
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 60))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10_000))
+# Share verified tokens between workers through Redis
+AUTH_CACHE_REDIS = os.getenv("AUTH_CACHE_REDIS", "true").lower() in ("1", "true", "yes")
+
+
+def token_cache_key(token_id: int) -> str:
+    return f"auth_token:{token_id}"
+
+
+class TokenCache:
+    """
+    Per-worker LRU of verified Sanctum tokens, keyed by token id and SHA-256
+    digest. An entry lives for `ttl` seconds, or until the token's own
+    `expires_at` if that comes first.
+    """
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, token_id: int, digest: str) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get((token_id, digest))
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    del self._entries[(token_id, digest)]
+                self.misses += 1
+                return None
+            self._entries.move_to_end((token_id, digest))
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token_id: int, digest: str, user_id: int, expires_at: Optional[float] = None,
+            shared: bool = False) -> float:
+        """
+        Cache a verified token; returns when the entry lapses (epoch seconds).
+        `shared` counts the entry as a hit on the Redis tier.
+        """
+        lapses = time.time() + self.ttl
+        if expires_at is not None:
+            lapses = min(lapses, expires_at)
+        with self._lock:
+            if shared:
+                self.shared_hits += 1
+            self._entries[(token_id, digest)] = (user_id, lapses)
+            self._entries.move_to_end((token_id, digest))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return lapses
+
+    def revoke(self, token_id: int) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == token_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+            }
+
+
+token_cache = TokenCache()
+
+
+# ====== Shared tier ======
+
+async def get_shared_token(token_id: int, digest: str) -> Optional[int]:
+    """Look a token up in Redis and, on a hit, warm this worker's cache with it."""
+    if not AUTH_CACHE_REDIS:
+        return None
+    raw = await cache.get(token_cache_key(token_id))
+    if not raw:
+        return None
+    entry = json.loads(raw)
+    if not hmac.compare_digest(entry["digest"], digest) or entry["lapses"] <= time.time():
+        return None
+    token_cache.put(token_id, digest, entry["user_id"], entry["lapses"], shared=True)
+    return entry["user_id"]
+
+
+async def put_shared_token(token_id: int, digest: str, user_id: int, lapses: float) -> None:
+    if not AUTH_CACHE_REDIS:
+        return
+    remaining = int(lapses - time.time())
+    if remaining > 0:
+        entry = {"digest": digest, "user_id": user_id, "lapses": lapses}
+        await cache.set(token_cache_key(token_id), json.dumps(entry), ex=remaining)
+
+
+async def revoke_token(token_id: int) -> None:
+    """
+    Forget a token in this worker and in Redis; DELETE /api/v1/auth/token
+    calls it for the caller's token. Other workers drop their copy within
+    AUTH_CACHE_TTL. Apps that delete tokens without calling the API (the
+    Laravel app on logout or rotation) can delete `auth_token:{id}` from
+    Redis themselves, which has the same effect outside this worker.
+    """
+    token_cache.revoke(token_id)
+    if AUTH_CACHE_REDIS:
+        await cache.delete(token_cache_key(token_id))
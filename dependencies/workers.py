@@ -0,0 +1,144 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+
+load_dotenv()
+
+CPU_COUNT = os.cpu_count() or 1
+
+THREAD_POOL_WORKERS = int(os.getenv("THREAD_POOL_WORKERS", min(8, CPU_COUNT)))
+THREAD_POOL_QUEUE_DEPTH = int(os.getenv("THREAD_POOL_QUEUE_DEPTH", 32))
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", max(1, CPU_COUNT // 2)))
+PROCESS_POOL_QUEUE_DEPTH = int(os.getenv("PROCESS_POOL_QUEUE_DEPTH", 8))
+PROCESS_POOL_START_METHOD = os.getenv("PROCESS_POOL_START_METHOD", "spawn")
+TRAINING_JOB_WORKERS = int(os.getenv("TRAINING_JOB_WORKERS", 2))
+TRAINING_JOB_QUEUE_DEPTH = int(os.getenv("TRAINING_JOB_QUEUE_DEPTH", 16))
+
+# How often (seconds) a waiting request checks whether its client went away
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", 0.5))
+
+
+class WorkerPool:
+    """
+    Runs blocking callables off the event loop on a thread or process pool.
+
+    At most `max_workers` calls run at once; up to `queue_depth` more may wait
+    for a slot, beyond that callers get a 503. When a `request` is passed, the
+    call is abandoned as soon as the client disconnects: queued work never
+    starts, and running work is left to finish but its result is dropped.
+    """
+
+    def __init__(self, name: str, executor_factory: Callable[[], Executor], max_workers: int, queue_depth: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self._executor_factory = executor_factory
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+
+    @property
+    def executor(self) -> Executor:
+        # created lazily so importing this module never spawns workers
+        if self._executor is None:
+            self._executor = self._executor_factory()
+        return self._executor
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def saturated(self) -> bool:
+        return self._pending >= self.max_workers + self.queue_depth
+
+    def busy_error(self) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail=f"The {self.name} pool is busy; please retry shortly.",
+            headers={"Retry-After": "5"},
+        )
+
+    async def run(self, fn: Callable[..., Any], *args, request: Optional[Request] = None, **kwargs) -> Any:
+        if self.saturated:
+            raise self.busy_error()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+
+        self._pending += 1
+        disconnected = asyncio.Event()
+        watcher = None
+        try:
+            if request is not None:
+                watcher = asyncio.create_task(
+                    _cancel_on_disconnect(request, asyncio.current_task(), disconnected)
+                )
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                call = functools.partial(fn, *args, **kwargs)
+                return await loop.run_in_executor(self.executor, call)
+        except asyncio.CancelledError:
+            if disconnected.is_set():
+                raise HTTPException(status_code=499, detail="Client closed request")
+            raise
+        finally:
+            self._pending -= 1
+            if watcher is not None:
+                watcher.cancel()
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Drop queued calls and release the executor; with `wait`, block until running calls return."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+async def _cancel_on_disconnect(request: Request, task: asyncio.Task, disconnected: asyncio.Event) -> None:
+    while True:
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+        if await request.is_disconnected():
+            disconnected.set()
+            task.cancel()
+            return
+
+
+thread_pool = WorkerPool(
+    "thread",
+    lambda: ThreadPoolExecutor(max_workers=THREAD_POOL_WORKERS, thread_name_prefix="verse-worker"),
+    max_workers=THREAD_POOL_WORKERS,
+    queue_depth=THREAD_POOL_QUEUE_DEPTH,
+)
+
+process_pool = WorkerPool(
+    "process",
+    lambda: ProcessPoolExecutor(
+        max_workers=PROCESS_POOL_WORKERS,
+        mp_context=multiprocessing.get_context(PROCESS_POOL_START_METHOD),
+    ),
+    max_workers=PROCESS_POOL_WORKERS,
+    queue_depth=PROCESS_POOL_QUEUE_DEPTH,
+)
+
+# Background training jobs get their own processes so a long fit never
+# holds a slot needed by request-scoped work
+training_pool = WorkerPool(
+    "training",
+    lambda: ProcessPoolExecutor(
+        max_workers=TRAINING_JOB_WORKERS,
+        mp_context=multiprocessing.get_context(PROCESS_POOL_START_METHOD),
+    ),
+    max_workers=TRAINING_JOB_WORKERS,
+    queue_depth=TRAINING_JOB_QUEUE_DEPTH,
+)
+
+
+def shutdown_workers() -> None:
+    thread_pool.shutdown()
+    process_pool.shutdown()
+    training_pool.shutdown()
@@ -1,11 +1,25 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routers.v1_routers import v1_router 
+from dependencies.cache import close_cache
+from dependencies.workers import shutdown_workers
+from services.training_jobs import training_jobs
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # in-flight training jobs are recorded as failed while Redis is still open;
+    # then release pooled Redis connections and worker pools
+    await training_jobs.shutdown()
+    await close_cache()
+    shutdown_workers()
 
 app = FastAPI(
     title="Fund Management API",
     description="FastAPI application handling the fund management calculations",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -1,11 +1,16 @@
-from dependencies.cache import cache
+import asyncio
+from dependencies.cache import cache, close_cache
 
-def main():
+async def main():
     """
     Flush *only* the Redis DB defined by REDIS_CACHE_DB in your .env.
     """
-    count = cache.flushdb()
+    try:
+        count = await cache.dbsize()
+        await cache.flushdb()
+    finally:
+        await close_cache()
     print(f"✔️  Flushed Redis cache DB ({count} keys removed)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,303 @@
+import functools
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from fastapi import Request
+
+from dependencies.cache import cache, CACHE_TTL
+from dependencies.workers import thread_pool
+from services.dataset_store import get_cleaned_version, load_cleaned_dataset
+from utils.hierarchy import build_hierarchy
+from utils.kde import group_densities
+from utils.rollup import daily_partials, merge_partials, mean_std, period_ends, period_labels, rollup, weekdays
+
+load_dotenv()
+
+# Dashboard aggregates are computed from the cleaned dataset once per
+# version, stored as fields of one Redis hash per version, and served from
+# there. An aggregate missing from the hash is computed on first request.
+
+# Categories plotted by the claim-amount density; empty means every category
+DENSITY_TIERS = [t.strip() for t in os.getenv("DENSITY_TIERS", "Gold,Platinum,Silver").split(",") if t.strip()]
+# Points on the density curve, and the bandwidth rule: scott, silverman or a factor
+KDE_GRID_SIZE = int(os.getenv("KDE_GRID_SIZE", 200))
+KDE_BANDWIDTH = os.getenv("KDE_BANDWIDTH", "scott")
+DAY_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+# Decoded time rollups kept per worker (one per dataset version)
+ROLLUP_CACHE_SIZE = int(os.getenv("ROLLUP_CACHE_SIZE", 64))
+HIERARCHY_LEVELS = ["Visit_Type", "Diagnosis", "Treatment"]
+# Children kept per sunburst node, the rest folded into "Other": one number
+# for every level, or one per level ("5,10,"; blank = no limit). Empty keeps all.
+_top_k = [int(k) if k.strip() else None for k in os.getenv("HIERARCHY_TOP_K", "").split(",")]
+HIERARCHY_TOP_K = _top_k[0] if len(_top_k) == 1 else _top_k
+
+
+def aggregates_key(user_id: int, version: str) -> str:
+    return f"aggregates:user:{user_id}:{version}"
+
+
+# ====== Claims overview ======
+
+def _fill_label(values: pd.Series, label: str) -> pd.Series:
+    if isinstance(values.dtype, pd.CategoricalDtype) and label not in values.cat.categories:
+        values = values.cat.add_categories(label)
+    return values.fillna(label)
+
+
+def _overview_rows(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy(deep=False)
+    df['Claim_Amount_KES'] = df['Claim_Amount_KES'].fillna(0)
+
+    # Handle missing values in categorical columns
+    df['Visit_Type'] = _fill_label(df['Visit_Type'], 'Unknown')
+    df['Diagnosis'] = _fill_label(df['Diagnosis'], 'Unknown')
+    df['Treatment'] = _fill_label(df['Treatment'], 'Unknown')
+    return df
+
+
+def compute_employee_totals(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """The ten employees with the highest total claim amount."""
+    df = _overview_rows(df)
+    employee_group = df.groupby('Employee_ID')['Claim_Amount_KES'].sum().sort_values(ascending=False)
+    top_10_employees = employee_group.head(10)
+    return [
+        {"Employee_ID": employee_id, "Claim Amount": int(amount)}
+        for employee_id, amount in top_10_employees.items()
+    ]
+
+
+def compute_claims_hierarchy(df: pd.DataFrame) -> Dict[str, Any]:
+    """Sunburst tree of claim counts: Visit_Type -> Diagnosis -> Treatment."""
+    df = _overview_rows(df)
+    return build_hierarchy(df, HIERARCHY_LEVELS, top_k=HIERARCHY_TOP_K, root_id="Claims")
+
+
+# ====== Time rollup ======
+
+def compute_rollup(df: pd.DataFrame) -> Dict[str, list]:
+    """Per-day partials of the claim amounts (see utils.rollup)."""
+    if "Submission_Date" not in df.columns:
+        return daily_partials([])
+    amounts = df["Claim_Amount_KES"] if "Claim_Amount_KES" in df.columns else None
+    return daily_partials(df["Submission_Date"], amounts)
+
+
+def claim_trend(partials: Dict[str, list], period: str) -> List[Dict[str, Any]]:
+    """Claim counts per day, week (by start date), month or quarter."""
+    rolled = rollup(partials, period)
+    return [
+        {"x": label, "y": int(count)}
+        for label, count in zip(period_labels(rolled["start"], period), rolled["rows"].tolist())
+    ]
+
+
+def day_counts(partials: Dict[str, list]) -> List[Dict[str, Any]]:
+    """Claim counts per day of the week, Monday first."""
+    if not len(partials["day"]):
+        return []
+    counts = np.bincount(weekdays(partials), weights=partials["rows"], minlength=7)
+    return [{"day": day, "count": int(count)} for day, count in zip(DAY_ORDER, counts)]
+
+
+def monthly_ci(partials: Dict[str, list]) -> List[Dict[str, Any]]:
+    """Monthly mean claim amount with its 95% confidence interval, every month from first to last."""
+    if not np.sum(partials["count"]):
+        return []
+    rolled = rollup(partials, "monthly", fill=True)
+    mean, std = mean_std(rolled)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margin = 1.96 * std / np.sqrt(rolled["count"])
+
+    return [
+        {"name": end.strftime("%d %B %Y"), "a": [lower, upper], "b": centre}
+        for end, lower, upper, centre in zip(
+            period_ends(rolled["start"], "monthly").tolist(),
+            (mean - margin).tolist(), (mean + margin).tolist(), mean.tolist(),
+        )
+    ]
+
+
+# ====== Claims distribution ======
+
+def _tier_rows(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns={"Category": "category", "Claim_Amount_KES": "claim_amount"})
+    if "category" not in df.columns:
+        return df.iloc[0:0]
+    if not DENSITY_TIERS:
+        return df
+    return df[df["category"].isin(DENSITY_TIERS)]
+
+
+def _bandwidth_rule(value: str):
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def compute_tier_density(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Claim-amount KDE per tier, sampled on a shared KDE_GRID_SIZE-point grid."""
+    df = _tier_rows(df)
+    if df.empty:
+        return []
+
+    # binned FFT estimate; its cost barely depends on the row count (see utils.kde)
+    xs, densities = group_densities(
+        df["claim_amount"].to_numpy(dtype=float),
+        df["category"].to_numpy(dtype=object),
+        tiers=DENSITY_TIERS or None,
+        grid_size=KDE_GRID_SIZE,
+        bw_method=_bandwidth_rule(KDE_BANDWIDTH),
+    )
+
+    return [
+        {
+            "claim_amount": float(x),
+            **{ tier: float(densities[tier][i]) for tier in densities }
+        }
+        for i, x in enumerate(xs)
+    ]
+
+
+def compute_correlation(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Correlation heat map of the numeric columns over the tiered claims."""
+    df = _tier_rows(df)
+    if df.empty:
+        return []
+
+    # whatever width the dtype plan stored them in
+    numeric_cols = [
+        col for col in df.select_dtypes(include="number").columns
+        if not pd.api.types.is_bool_dtype(df[col])
+    ]
+    heat_map_distribution: List[Dict[str, Any]] = []
+    if len(numeric_cols) > 1:
+        corr = df[numeric_cols].corr().stack().reset_index(name="correlation")
+        corr.columns = ["row", "col", "correlation"]
+        for row_var in numeric_cols:
+            subset = corr[corr["row"] == row_var]
+            heat_map_distribution.append({
+                "id": row_var,
+                "data": [
+                    {"x": col_var, "y": corr_val}
+                    for col_var, corr_val in zip(subset["col"], subset["correlation"])
+                ]
+            })
+    return heat_map_distribution
+
+
+AGGREGATES: Dict[str, Callable[[pd.DataFrame], Any]] = {
+    "rows": len,
+    # claim trends, day-of-week counts and the monthly CI table derive from it
+    "rollup": compute_rollup,
+    "employee_totals": compute_employee_totals,
+    "hierarchy": compute_claims_hierarchy,
+    "tier_density": compute_tier_density,
+    "correlation": compute_correlation,
+}
+
+# Columns each aggregate reads, so computing it fetches and decodes only
+# those; None reads every column
+OVERVIEW_COLUMNS = ["Claim_Amount_KES", "Visit_Type", "Diagnosis", "Treatment"]
+AGGREGATE_COLUMNS: Dict[str, Optional[List[str]]] = {
+    "rows": [],
+    "rollup": ["Submission_Date", "Claim_Amount_KES"],
+    "employee_totals": ["Employee_ID", *OVERVIEW_COLUMNS],
+    "hierarchy": OVERVIEW_COLUMNS,
+    "tier_density": ["Category", "Claim_Amount_KES"],
+    # every numeric column
+    "correlation": None,
+}
+
+
+def aggregate_columns(names: List[str]) -> Optional[List[str]]:
+    """Columns the named aggregates read between them, or None for all."""
+    columns: List[str] = []
+    for name in names:
+        needed = AGGREGATE_COLUMNS[name]
+        if needed is None:
+            return None
+        columns.extend(col for col in needed if col not in columns)
+    return columns
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def materialize_aggregates(df: pd.DataFrame, names: Optional[List[str]] = None) -> Dict[str, bytes]:
+    """Compute the named aggregates (all by default), JSON-encoded for storage."""
+    return {
+        name: json.dumps(AGGREGATES[name](df), default=_json_default).encode("utf-8")
+        for name in names or AGGREGATES
+    }
+
+
+@functools.lru_cache(maxsize=ROLLUP_CACHE_SIZE)
+def _decode_rollup(blob: bytes) -> Dict[str, np.ndarray]:
+    """
+    Rollups decoded to arrays, by their stored bytes. Parsing the per-day
+    floats costs far more than summing them, so each version is parsed once
+    per worker and switching periods only re-sums. Treat the arrays as read-only.
+    """
+    return {field: np.asarray(values) for field, values in json.loads(blob).items()}
+
+
+# ====== Redis access ======
+
+async def save_aggregates(user_id: int, version: str, encoded: Dict[str, bytes],
+                          replaces: Optional[str] = None) -> None:
+    """Store aggregates of `version`, dropping those of the `replaces` version."""
+    key = aggregates_key(user_id, version)
+    async with cache.pipeline(transaction=True) as pipe:
+        if encoded:
+            pipe.hset(key, mapping=encoded)
+            pipe.expire(key, CACHE_TTL)
+        if replaces and replaces != version:
+            pipe.delete(aggregates_key(user_id, replaces))
+        await pipe.execute()
+
+
+async def save_appended_aggregates(user_id: int, version: str, previous_version: Optional[str],
+                                   appended: pd.DataFrame) -> None:
+    """
+    Start the aggregates of a `version` made by appending rows. Most span
+    every row and are computed on first request, but the time rollup is
+    additive, so the appended rows' partials merge into the previous one.
+    """
+    encoded: Dict[str, bytes] = {}
+    if previous_version:
+        previous = await cache.hget(aggregates_key(user_id, previous_version), "rollup")
+        if previous is not None:
+            merged = merge_partials(json.loads(previous), compute_rollup(appended))
+            encoded["rollup"] = json.dumps(merged).encode("utf-8")
+    await save_aggregates(user_id, version, encoded, replaces=previous_version)
+
+
+async def get_aggregates(user_id: int, names: List[str], request: Optional[Request] = None) -> Optional[Dict[str, Any]]:
+    """
+    Return the named aggregates of the user's current cleaned dataset, or None
+    when there is none. Aggregates not stored for this version yet are
+    computed from the dataset and stored.
+    """
+    version = await get_cleaned_version(user_id)
+    stored = await cache.hmget(aggregates_key(user_id, version), names) if version else [None] * len(names)
+    found = dict(zip(names, stored))
+
+    missing = [name for name, blob in found.items() if blob is None]
+    if missing:
+        df = await load_cleaned_dataset(user_id, aggregate_columns(missing))
+        if df is None:
+            return None
+        computed = await thread_pool.run(materialize_aggregates, df, missing, request=request)
+        if version:
+            await save_aggregates(user_id, version, computed)
+        found.update(computed)
+
+    return {name: _decode_rollup(blob) if name == "rollup" else json.loads(blob) for name, blob in found.items()}
@@ -1,9 +1,203 @@
+import copy
+import json
+import math
+from typing import Optional, Tuple
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from services.dataset_store import decode_frames
+from services.aggregates import materialize_aggregates
 
-def clean_and_prepare_data(df: pd.DataFrame) -> pd.DataFrame:
-    # ====== Data Type Validation ======
+CATEGORICAL_COLS = ['Visit_Type', 'Provider_Name', 'Hospital_County', 'Employee_Gender', 'Category', 'Employer', 'Department']
+CAP_COLS = ['Inpatient_Cap_KES', 'Outpatient_Cap_KES', 'Optical_Cap_KES', 'Dental_Cap_KES', 'Maternity_Cap_KES']
+DAY_NAMES = np.array(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'], dtype=object)
+MONTH_NAMES = np.array(['January', 'February', 'March', 'April', 'May', 'June', 'July',
+                        'August', 'September', 'October', 'November', 'December'], dtype=object)
+# Labels at or below this share of rows are bucketed into 'Other'
+RARE_CATEGORY_THRESHOLD = 0.05
+# Points kept per quantile sketch in the incremental cleaning state
+SKETCH_POINTS = 1024
+# String columns with at most this share of distinct values are stored as categories
+CATEGORY_MAX_SHARE = 0.5
+# Derived label columns with a fixed set of values, stored with those as categories
+CALENDAR_CATEGORIES = {'Claim_Weekday': DAY_NAMES.tolist(), 'Claim_Month': MONTH_NAMES.tolist()}
+# Raw upload columns the cleaning steps read by name; besides these, every
+# '_KES' amount and date column is format-corrected
+PIPELINE_COLUMNS = frozenset(CATEGORICAL_COLS + CAP_COLS + [
+    'Employee_ID', 'Employee_Age', 'Division', 'Hire_Date', 'Salary', 'Claim_Amount_KES', 'Co_Payment_KES',
+    'Submission_Date', 'Service_Date', 'Pre_Authorization_Required', 'Diagnosis', 'Treatment',
+])
+
+def is_pipeline_column(name) -> bool:
+    """Whether the cleaning pipeline uses raw column `name`; usable as a `usecols` callable."""
+    name = str(name)
+    return name in PIPELINE_COLUMNS or '_KES' in name or 'date' in name.lower()
+
+def _factorize_strings(series: pd.Series):
+    """
+    Codes and unique values of `series.astype(str)`. Factorizing first means
+    string work only touches the distinct values, not every row.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    if pd.api.types.infer_dtype(uniques, skipna=True) not in ('string', 'empty'):
+        # mixed values (1 vs 1.0 vs True) could share a code; stringify rows first
+        codes, uniques = pd.factorize(series.astype(str), use_na_sentinel=False)
+    return codes, pd.Index(uniques, dtype=object).astype(str)
+
+def _label_counts(series: pd.Series):
+    """
+    Title-case and strip values. Returns each row's label code, the distinct
+    labels and how many rows carry each one.
+    """
+    codes, uniques = _factorize_strings(series)
+    normalized = uniques.str.title().str.strip()
+
+    # distinct raw values can normalise to the same label
+    label_codes, labels = pd.factorize(normalized)
+    row_codes = label_codes[codes]
+    counts = np.bincount(row_codes, minlength=len(labels))
+    return row_codes, labels.to_numpy(dtype=object), counts
+
+def _bucket_labels(series: pd.Series, row_codes, labels, counts, total: int) -> pd.Series:
+    """Replace labels at or below RARE_CATEGORY_THRESHOLD of `total` rows with 'Other'."""
+    lookup = np.where(counts / total > RARE_CATEGORY_THRESHOLD, labels, 'Other').astype(object)
+    return pd.Series(lookup[row_codes], index=series.index, name=series.name)
+
+def _frequent_labels(counts: dict, total: int) -> set:
+    return {label for label, count in counts.items() if total and count / total > RARE_CATEGORY_THRESHOLD}
+
+def _extract_group(series: pd.Series) -> pd.Series:
+    """Leading letters of each value, or 'Other' when that is 3 characters or fewer."""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    extracted = pd.Series(uniques, dtype=object).str.extract(r'([A-Za-z\\s]+)')[0].str.strip()
+    grouped = extracted.where(extracted.astype(str).str.len() > 3, 'Other')
+    return pd.Series(grouped.to_numpy(dtype=object)[codes], index=series.index)
+
+def _name_lookup(values: pd.Series, names: np.ndarray) -> pd.Series:
+    """Map integer positions to names, keeping NaN where the position is missing."""
+    result = np.full(len(values), np.nan, dtype=object)
+    present = values.notna().to_numpy()
+    result[present] = names[values[present].to_numpy(dtype=np.int64)]
+    return pd.Series(result, index=values.index)
+
+def _column_stats(df: pd.DataFrame, cols) -> pd.DataFrame:
+    """Quartiles, median, mean and std of every column in one frame-level pass each."""
+    frame = df[cols]
+    quartiles = frame.quantile([0.25, 0.75])
+    return pd.DataFrame({
+        'q1': quartiles.loc[0.25],
+        'q3': quartiles.loc[0.75],
+        'median': frame.median(),
+        'mean': frame.mean(),
+        'std': frame.std(),
+    })
+
+# ====== Incremental statistics ======
+# Mergeable summaries kept in the cleaning state, so appended rows can be
+# cleaned against the whole dataset without re-reading it.
+
+def _finite(values) -> np.ndarray:
+    values = np.asarray(values, dtype=float)
+    return values[~np.isnan(values)]
+
+def _sketch(values) -> dict:
+    """Quantile sketch: the sorted values while they are few, else SKETCH_POINTS evenly spaced quantiles."""
+    values = np.sort(_finite(values))
+    count = len(values)
+    if count > SKETCH_POINTS:
+        values = np.quantile(values, np.linspace(0, 1, SKETCH_POINTS))
+    return {'count': count, 'points': values.tolist()}
+
+def _merge_sketch(sketch: dict, values) -> dict:
+    new = _finite(values)
+    points = np.asarray(sketch['points'], dtype=float)
+    count = sketch['count'] + len(new)
+    if count <= SKETCH_POINTS:
+        # still small enough to keep every value, so quantiles stay exact
+        return {'count': count, 'points': np.sort(np.concatenate([points, new])).tolist()}
+
+    # each sketch point stands for count / len(points) of the values seen so far
+    merged = np.concatenate([points, new])
+    weights = np.concatenate([np.full(len(points), sketch['count'] / max(len(points), 1)), np.ones(len(new))])
+    order = np.argsort(merged, kind='stable')
+    merged, weights = merged[order], weights[order]
+    positions = np.cumsum(weights) - weights / 2
+    positions = (positions - positions[0]) / (positions[-1] - positions[0])
+    return {'count': count, 'points': np.interp(np.linspace(0, 1, SKETCH_POINTS), positions, merged).tolist()}
+
+def _sketch_quantile(sketch: dict, q: float) -> float:
+    return float(np.quantile(sketch['points'], q)) if sketch['points'] else np.nan
+
+def _quartile_bins(sketch: dict) -> list:
+    """Open-ended bin edges at the sketch's quartiles, for pd.cut in place of pd.qcut."""
+    return [-np.inf] + [_sketch_quantile(sketch, q) for q in (0.25, 0.5, 0.75)] + [np.inf]
+
+def _moments(values) -> list:
+    """[count, mean, sum of squared deviations] of the non-missing values."""
+    values = _finite(values)
+    if not len(values):
+        return [0, 0.0, 0.0]
+    mean = values.mean()
+    return [len(values), float(mean), float(((values - mean) ** 2).sum())]
+
+def _merge_moments(a: list, b: list) -> list:
+    # Chan et al. pairwise update
+    count = a[0] + b[0]
+    if not count:
+        return [0, 0.0, 0.0]
+    delta = b[1] - a[1]
+    return [count, a[1] + delta * b[0] / count, a[2] + b[2] + delta * delta * a[0] * b[0] / count]
+
+def _moments_mean(moments: list) -> float:
+    return moments[1] if moments[0] else np.nan
+
+def _moments_std(moments: list) -> float:
+    # sample std, as pandas computes it
+    return math.sqrt(moments[2] / (moments[0] - 1)) if moments[0] > 1 else np.nan
+
+def _group_moments(values: pd.Series, labels: np.ndarray) -> dict:
+    frame = pd.DataFrame({'label': labels, 'value': np.asarray(values, dtype=float)})
+    grouped = frame.groupby('label')['value']
+    count, mean, var = grouped.count(), grouped.mean(), grouped.var(ddof=0)
+    return {
+        label: [int(count[label]), float(mean[label]), float(var[label] * count[label])] if count[label] else [0, 0.0, 0.0]
+        for label in count.index
+    }
+
+def _key_columns(columns) -> list:
+    """
+    Columns identifying a row across uploads: the deduplication columns minus
+    tenure, which moves with the clock, and the salary band, which depends on
+    the statistics of the batch a row arrived in.
+    """
+    return [c for c in columns if c not in ['Claim_Amount_KES', 'Submission_Date', 'Tenure', 'Tenure_Group', 'Salary_Band']]
+
+def _row_keys(frame: pd.DataFrame) -> np.ndarray:
+    """64-bit hash per row, insensitive to int/float and categorical/object dtype differences."""
+    normalized = {}
+    for col in frame.columns:
+        values = frame[col]
+        if pd.api.types.is_datetime64_dtype(values):
+            values = values.astype('int64')
+        elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            values = values.astype(float)
+        else:
+            values = values.astype(object)
+        normalized[col] = values.to_numpy()
+    return pd.util.hash_pandas_object(pd.DataFrame(normalized), index=False).to_numpy()
+
+def encode_row_index(row_index: np.ndarray) -> bytes:
+    return np.ascontiguousarray(row_index, dtype='<u8').tobytes()
+
+def decode_row_index(blob: Optional[bytes]) -> np.ndarray:
+    """Row keys of cleaned rows: column 0 identifies the row, column 1 its (employee, submission day)."""
+    return np.frombuffer(blob or b'', dtype='<u8').reshape(-1, 2)
+
+# ====== Shared cleaning steps ======
+# Steps that only look at a row's own values; the full and the incremental
+# clean run them identically.
+
+def _coerce_types(df: pd.DataFrame) -> None:
     type_conversions = {
         'Employee_Age': 'int',
         'Claim_Amount_KES': 'float',
@@ -22,7 +216,7 @@ def clean_and_prepare_data(df: pd.DataFrame) -> pd.DataFrame:
                 else:
                     df[col] = pd.to_numeric(df[col].astype(str).str.extract(r'(\\d+\\.?\\d*)')[0], errors='coerce')
 
-    # ====== Group-Specific Features ======
+def _add_group_features(df: pd.DataFrame, salary_bins=None) -> None:
     if 'Employer' in df.columns:
         df['Employer'] = df['Employer'].str.upper().str.strip()
 
@@ -36,93 +230,399 @@ def clean_and_prepare_data(df: pd.DataFrame) -> pd.DataFrame:
         df['Tenure_Group'] = pd.cut(df['Tenure'], bins=[0, 1, 5, 100], labels=['<1yr', '1-5yrs', '5+yrs'])
 
     if 'Salary' in df.columns:
-        df['Salary_Band'] = pd.qcut(df['Salary'], q=4, labels=['Q1', 'Q2', 'Q3', 'Q4'])
+        labels = ['Q1', 'Q2', 'Q3', 'Q4']
+        if salary_bins is None:
+            df['Salary_Band'] = pd.qcut(df['Salary'], q=4, labels=labels)
+        else:
+            df['Salary_Band'] = pd.cut(df['Salary'], bins=salary_bins, labels=labels)
+
+def _correct_formats(df: pd.DataFrame) -> None:
+    for col in df.columns:
+        if '_KES' in col:
+            if pd.api.types.is_numeric_dtype(df[col]):
+                # the digit-only regex cannot change numbers
+                df[col] = df[col].astype(float)
+            else:
+                df[col] = df[col].replace('[^\\d.]', '', regex=True).astype(float)
+        if ('Date' in col or 'date' in col.lower()) and not pd.api.types.is_datetime64_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+
+def _add_row_features(df: pd.DataFrame, claim_bins=None) -> None:
+    if 'Pre_Authorization_Required' in df.columns:
+        df['Is_Pre_Authorized'] = df['Pre_Authorization_Required'].map({'Yes': 1, 'No': 0})
+
+    for col in CAP_COLS:
+        if col in df.columns:
+            df[f'{col}_Utilization'] = df['Claim_Amount_KES'] / df[col].replace(0, np.nan)
+
+    if 'Diagnosis' in df.columns:
+        df['Diagnosis_Group'] = _extract_group(df['Diagnosis'])
+
+    if 'Treatment' in df.columns:
+        df['Treatment_Type'] = _extract_group(df['Treatment'])
+
+    if 'Employee_Age' in df.columns:
+        df['Age_Group'] = pd.cut(df['Employee_Age'], bins=[0, 25, 35, 45, 55, 65, 100], labels=['<25', '25-35', '35-45', '45-55', '55-65', '65+'])
+
+    if 'Claim_Amount_KES' in df.columns:
+        labels = ['Small', 'Medium', 'Large', 'Very Large']
+        if claim_bins is None:
+            df['Claim_Size'] = pd.qcut(df['Claim_Amount_KES'], q=4, labels=labels)
+        else:
+            df['Claim_Size'] = pd.cut(df['Claim_Amount_KES'], bins=claim_bins, labels=labels)
+
+    if 'Submission_Date' in df.columns:
+        submitted = df['Submission_Date'].dt
+        df['Claim_Weekday'] = _name_lookup(submitted.dayofweek, DAY_NAMES)
+        df['Claim_Month'] = _name_lookup(submitted.month - 1, MONTH_NAMES)
+        df['Claim_Quarter'] = submitted.quarter
+
+def clean_and_prepare_data(df: pd.DataFrame, state: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Clean a full raw dataset. When `state` is a dict, the statistics an
+    incremental clean needs (see `clean_delta`) are recorded into it.
+    """
+    # ====== Data Type Validation ======
+    _coerce_types(df)
+
+    # ====== Group-Specific Features ======
+    _add_group_features(df)
+    if state is not None:
+        # keyed on values no statistic has touched yet, so resent rows match
+        state['key_columns'] = _key_columns(df.columns)
+        row_keys = _row_keys(df[state['key_columns']])
 
     # ====== Missing Values ======
-    missing_report = pd.DataFrame(df.isnull().sum(), columns=['Missing Values'])
-    missing_report['% Missing'] = (missing_report['Missing Values'] / len(df)) * 100
-    cols_to_drop = missing_report[missing_report['% Missing'] > 70].index.tolist()
+    missing = df.isnull().sum()
+    cols_to_drop = missing[(missing / len(df)) * 100 > 70].index.tolist()
     df.drop(columns=cols_to_drop, inplace=True, errors='ignore')
 
-    for col in df.columns:
+    # only columns that actually have gaps need filling
+    gaps = [col for col in df.columns if missing[col] > 0]
+    numeric_gaps = [col for col in gaps if df[col].dtype in ['int64', 'float64']]
+    medians = df[numeric_gaps].median() if numeric_gaps else {}
+    for col in gaps:
         if df[col].dtype == 'object':
             df[col] = df[col].fillna('Unknown')
-        elif df[col].dtype in ['int64', 'float64']:
-            df[col] = df[col].fillna(df[col].median())
+        elif col in medians:
+            df[col] = df[col].fillna(medians[col])
 
     # ====== Outlier Handling ======
-    numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns
-    for col in numeric_cols:
-        if col in ['Employee_ID']: continue
-        Q1 = df[col].quantile(0.25)
-        Q3 = df[col].quantile(0.75)
-        IQR = Q3 - Q1
-        lower, upper = Q1 - 1.5 * IQR, Q3 + 1.5 * IQR
-        z_scores = (df[col] - df[col].mean()) / df[col].std()
-        outliers = (df[col] < lower) | (df[col] > upper) | (z_scores.abs() > 3)
-        if outliers.any():
-            df[f'{col}_outlier'] = outliers.astype(int)
-            df[col] = np.where(outliers, df[col].median(), df[col])
+    numeric_cols = [c for c in df.select_dtypes(include=['int64', 'float64']).columns if c not in ['Employee_ID']]
+    if state is not None:
+        state['dropped_columns'] = cols_to_drop
+        state['numeric'] = {
+            col: {'sketch': _sketch(df[col]), 'moments': _moments(df[col])} for col in numeric_cols
+        }
+    if numeric_cols:
+        stats = _column_stats(df, numeric_cols)
+        iqr = stats['q3'] - stats['q1']
+        lower, upper = stats['q1'] - 1.5 * iqr, stats['q3'] + 1.5 * iqr
+        for col in numeric_cols:
+            values = df[col]
+            z_scores = (values - stats.at[col, 'mean']) / stats.at[col, 'std']
+            outliers = (values < lower[col]) | (values > upper[col]) | (z_scores.abs() > 3)
+            if outliers.any():
+                df[f'{col}_outlier'] = outliers.astype(int)
+                df[col] = np.where(outliers, stats.at[col, 'median'], values)
 
     # ====== Value Corrections ======
     if 'Claim_Amount_KES' in df.columns:
         df['Claim_Amount_KES'] = df['Claim_Amount_KES'].abs()
     if 'Employee_Age' in df.columns:
-        df['Employee_Age'] = df['Employee_Age'].apply(lambda x: x if 18 <= x <= 100 else np.nan).fillna(df['Employee_Age'].median())
+        age = df['Employee_Age']
+        in_range = age.between(18, 100)
+        if not in_range.all():
+            df['Employee_Age'] = age.where(in_range).astype(float).fillna(age.median())
 
     # ====== Deduplication ======
     dup_cols = [c for c in df.columns if c not in ['Claim_Amount_KES', 'Submission_Date']]
-    df = df.drop_duplicates(subset=dup_cols, keep='first')
+    duplicated = df.duplicated(subset=dup_cols, keep='first').to_numpy()
+    if duplicated.any():
+        # a copy, not a view: the steps below assign columns
+        df = df.loc[~duplicated].copy()
+        if state is not None:
+            row_keys = row_keys[~duplicated]
 
     # ====== Categorical Normalization ======
-    categorical_cols = ['Visit_Type', 'Provider_Name', 'Hospital_County', 'Employee_Gender', 'Category', 'Employer', 'Department']
-    for col in categorical_cols:
+    employer_labels = None
+    for col in CATEGORICAL_COLS:
         if col in df.columns:
-            df[col] = df[col].astype(str).str.title().str.strip()
-            freq = df[col].value_counts(normalize=True)
-            df[col] = df[col].apply(lambda x: x if freq.get(x, 0) > 0.05 else 'Other')
+            row_codes, labels, counts = _label_counts(df[col])
+            if state is not None:
+                state.setdefault('categories', {})[col] = dict(zip(labels.tolist(), counts.tolist()))
+                if col == 'Employer':
+                    employer_labels = labels[row_codes]
+            df[col] = _bucket_labels(df[col], row_codes, labels, counts, len(df))
 
     # ====== Format Corrections ======
-    for col in df.columns:
-        if '_KES' in col:
-            df[col] = df[col].replace('[^\\d.]', '', regex=True).astype(float)
-        if 'Date' in col or 'date' in col.lower():
-            df[col] = pd.to_datetime(df[col], errors='coerce')
+    _correct_formats(df)
 
     # ====== Feature Engineering ======
-    if 'Pre_Authorization_Required' in df.columns:
-        df['Is_Pre_Authorized'] = df['Pre_Authorization_Required'].map({'Yes': 1, 'No': 0})
+    _add_row_features(df)
 
-    for col in ['Inpatient_Cap_KES', 'Outpatient_Cap_KES', 'Optical_Cap_KES', 'Dental_Cap_KES', 'Maternity_Cap_KES']:
-        if col in df.columns:
-            df[f'{col}_Utilization'] = df['Claim_Amount_KES'] / df[col].replace(0, np.nan)
+    df['Claim_Amount_to_Mean'] = df['Claim_Amount_KES'] / df['Claim_Amount_KES'].mean()
+    df['Same_Day_Claims'] = df.duplicated(subset=['Employee_ID', 'Submission_Date'], keep=False).astype(int)
 
-    if 'Diagnosis' in df.columns:
-        df['Diagnosis_Group'] = df['Diagnosis'].str.extract(r'([A-Za-z\\s]+)')[0].str.strip()
-        df['Diagnosis_Group'] = df['Diagnosis_Group'].apply(lambda x: x if len(str(x)) > 3 else 'Other')
+    if 'Employer' in df.columns:
+        # positional index, as the employer-stats merge used to produce
+        df = df.reset_index(drop=True)
+        claims_by_employer = df.groupby('Employer')['Claim_Amount_KES']
+        df['Employer_Mean_Claim'] = claims_by_employer.transform('mean')
+        df['Employer_Std_Claim'] = claims_by_employer.transform('std')
+        df['Employer_Z_Score'] = (df['Claim_Amount_KES'] - df['Employer_Mean_Claim']) / df['Employer_Std_Claim']
 
-    if 'Treatment' in df.columns:
-        df['Treatment_Type'] = df['Treatment'].str.extract(r'([A-Za-z\\s]+)')[0].str.strip()
-        df['Treatment_Type'] = df['Treatment_Type'].apply(lambda x: x if len(str(x)) > 3 else 'Other')
+    if state is not None:
+        claims = df['Claim_Amount_KES']
+        state['claims'] = {'sketch': _sketch(claims), 'moments': _moments(claims)}
+        if employer_labels is not None:
+            state['employers'] = _group_moments(claims, employer_labels)
+        state['columns'] = [str(c) for c in df.columns]
+        state['rows'] = len(df)
+        day_keys = _row_keys(df[['Employee_ID', 'Submission_Date']])
+        # handed back to the caller, which stores it apart from the JSON state
+        state['row_index'] = np.column_stack([row_keys, day_keys])
 
-    if 'Employee_Age' in df.columns:
-        df['Age_Group'] = pd.cut(df['Employee_Age'], bins=[0, 25, 35, 45, 55, 65, 100], labels=['<25', '25-35', '35-45', '45-55', '55-65', '65+'])
+    return df
+
+def clean_delta(df: pd.DataFrame, state: dict, row_index: np.ndarray, dedupe: bool = True):
+    """
+    Clean rows appended after a full clean, using and updating the statistics
+    that clean recorded in `state` instead of re-reading the stored rows.
+
+    Group statistics are updated incrementally: moments and quantile sketches
+    for numeric columns, label counts for rare-category bucketing, and
+    per-employer claim moments for the employer features. New rows are
+    deduplicated against `row_index`, the row keys of everything already
+    cleaned. Rows cleaned earlier keep the derived values they were given;
+    the names of columns and stored aggregates those values have drifted
+    from are returned as `stale`. The output has the column layout of the
+    last full clean. With `dedupe=False` every row is kept, as scoring needs.
+
+    Returns (cleaned rows, updated state, row keys of the new rows, stale).
+    """
+    state = copy.deepcopy(state)
+    numeric = state['numeric']
+    stale = set()
+
+    _coerce_types(df)
+    salary_bins = _quartile_bins(numeric['Salary']['sketch']) if 'Salary' in numeric else None
+    _add_group_features(df, salary_bins=salary_bins)
+    keys = _row_keys(df.reindex(columns=state['key_columns']))
+    df.drop(columns=state['dropped_columns'], inplace=True, errors='ignore')
+
+    # ====== Missing Values ======
+    for col in df.columns[df.isnull().any().to_numpy()]:
+        if df[col].dtype == 'object':
+            df[col] = df[col].fillna('Unknown')
+        elif df[col].dtype in ['int64', 'float64']:
+            median = _sketch_quantile(numeric[col]['sketch'], 0.5) if col in numeric else df[col].median()
+            df[col] = df[col].fillna(median)
 
+    # ====== Outlier Handling ======
+    for col, col_stats in numeric.items():
+        if col not in df.columns:
+            continue
+        values = df[col]
+        col_stats['sketch'] = _merge_sketch(col_stats['sketch'], values)
+        col_stats['moments'] = _merge_moments(col_stats['moments'], _moments(values))
+        q1, median, q3 = (_sketch_quantile(col_stats['sketch'], q) for q in (0.25, 0.5, 0.75))
+        mean, std = _moments_mean(col_stats['moments']), _moments_std(col_stats['moments'])
+        iqr = q3 - q1
+        outliers = (values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr) | (((values - mean) / std).abs() > 3)
+        df[f'{col}_outlier'] = outliers.astype(int)
+        df[col] = np.where(outliers, median, values)
+
+    # ====== Value Corrections ======
     if 'Claim_Amount_KES' in df.columns:
-        df['Claim_Size'] = pd.qcut(df['Claim_Amount_KES'], q=4, labels=['Small', 'Medium', 'Large', 'Very Large'])
+        df['Claim_Amount_KES'] = df['Claim_Amount_KES'].abs()
+    if 'Employee_Age' in df.columns:
+        age = df['Employee_Age']
+        in_range = age.between(18, 100)
+        if not in_range.all():
+            df['Employee_Age'] = age.where(in_range).astype(float).fillna(
+                _sketch_quantile(numeric['Employee_Age']['sketch'], 0.5) if 'Employee_Age' in numeric else age.median()
+            )
 
-    if 'Submission_Date' in df.columns:
-        df['Claim_Weekday'] = df['Submission_Date'].dt.day_name()
-        df['Claim_Month'] = df['Submission_Date'].dt.month_name()
-        df['Claim_Quarter'] = df['Submission_Date'].dt.quarter
+    # ====== Deduplication ======
+    # against earlier rows by key, and within the delta itself
+    if dedupe:
+        fresh = ~(np.isin(keys, row_index[:, 0]) | pd.Series(keys).duplicated().to_numpy())
+        df, keys = df[fresh].copy(), keys[fresh]
+    if df.empty:
+        return pd.DataFrame(columns=state['columns']), state, np.empty((0, 2), dtype=np.uint64), []
+    total_rows = state['rows'] + len(df)
 
-    df['Claim_Amount_to_Mean'] = df['Claim_Amount_KES'] / df['Claim_Amount_KES'].mean()
-    df['Same_Day_Claims'] = df.duplicated(subset=['Employee_ID', 'Submission_Date'], keep=False).astype(int)
+    # ====== Categorical Normalization ======
+    employer_labels = None
+    categories = state.setdefault('categories', {})
+    for col in CATEGORICAL_COLS:
+        if col not in df.columns:
+            continue
+        row_codes, labels, counts = _label_counts(df[col])
+        known = categories.setdefault(col, {})
+        kept_before = _frequent_labels(known, state['rows'])
+        for label, count in zip(labels.tolist(), counts.tolist()):
+            known[label] = known.get(label, 0) + count
+        if _frequent_labels(known, total_rows) != kept_before:
+            stale.add(col)
+        if col == 'Employer':
+            employer_labels = labels[row_codes]
+        merged_counts = np.array([known[label] for label in labels.tolist()], dtype=float)
+        df[col] = _bucket_labels(df[col], row_codes, labels, merged_counts, total_rows)
 
-    if 'Employer' in df.columns:
-        stats = df.groupby('Employer')['Claim_Amount_KES'].agg(['mean', 'std']).reset_index()
-        stats.columns = ['Employer', 'Employer_Mean_Claim', 'Employer_Std_Claim']
-        df = pd.merge(df, stats, on='Employer', how='left')
+    # ====== Format Corrections ======
+    _correct_formats(df)
+
+    # ====== Feature Engineering ======
+    claims = state['claims']
+    claims['sketch'] = _merge_sketch(claims['sketch'], df['Claim_Amount_KES'])
+    claims['moments'] = _merge_moments(claims['moments'], _moments(df['Claim_Amount_KES']))
+    _add_row_features(df, claim_bins=_quartile_bins(claims['sketch']))
+
+    df['Claim_Amount_to_Mean'] = df['Claim_Amount_KES'] / _moments_mean(claims['moments'])
+    day_keys = _row_keys(df[['Employee_ID', 'Submission_Date']])
+    earlier_same_day = np.isin(day_keys, row_index[:, 1])
+    df['Same_Day_Claims'] = (pd.Series(day_keys).duplicated(keep=False).to_numpy() | earlier_same_day).astype(int)
+    if earlier_same_day.any():
+        stale.add('Same_Day_Claims')
+
+    df = df.reset_index(drop=True)
+    if employer_labels is not None and 'employers' in state:
+        employers = state['employers']
+        for label, moments in _group_moments(df['Claim_Amount_KES'], employer_labels).items():
+            employers[label] = _merge_moments(employers.get(label, [0, 0.0, 0.0]), moments)
+
+        # bucket totals are the merge of the labels that fall into them
+        kept = _frequent_labels(categories['Employer'], total_rows)
+        buckets = {}
+        for label, moments in employers.items():
+            bucket = label if label in kept else 'Other'
+            buckets[bucket] = _merge_moments(buckets.get(bucket, [0, 0.0, 0.0]), moments)
+        df['Employer_Mean_Claim'] = df['Employer'].map({b: _moments_mean(m) for b, m in buckets.items()})
+        df['Employer_Std_Claim'] = df['Employer'].map({b: _moments_std(m) for b, m in buckets.items()})
         df['Employer_Z_Score'] = (df['Claim_Amount_KES'] - df['Employer_Mean_Claim']) / df['Employer_Std_Claim']
 
-    return df
\ No newline at end of file
+    if len(df):
+        stale.update(['statistics', 'Claim_Amount_to_Mean', 'Claim_Size'])
+        if salary_bins is not None:
+            stale.add('Salary_Band')
+        if employer_labels is not None:
+            stale.update(['Employer_Mean_Claim', 'Employer_Std_Claim', 'Employer_Z_Score'])
+
+    state['rows'] = total_rows
+    return df.reindex(columns=state['columns']), state, np.column_stack([keys, day_keys]), sorted(stale)
+
+# ====== Dtype plan ======
+# Cleaned frames are stored, cached and shipped to workers in the smallest
+# dtypes that hold their values exactly.
+
+def _category_columns(df: pd.DataFrame) -> list:
+    """String columns with few enough distinct values to store as categories."""
+    columns = []
+    for col in df.columns:
+        values = df[col]
+        if values.dtype == 'object' and len(values) \
+                and pd.api.types.infer_dtype(values, skipna=True) == 'string' \
+                and values.nunique() <= CATEGORY_MAX_SHARE * len(values):
+            columns.append(col)
+    return columns
+
+def _compact_column(values: pd.Series, categorical: bool) -> pd.Series:
+    if categorical:
+        categories = CALENDAR_CATEGORIES.get(values.name)
+        return values.astype(pd.CategoricalDtype(categories) if categories else 'category')
+
+    dtype = values.dtype
+    if not isinstance(dtype, np.dtype) or dtype.kind not in 'iuf' or not len(values):
+        # bools, datetimes, categories and strings are kept as they are
+        return values
+    if values.isin([0, 1]).all():
+        return values.astype(np.uint8)
+    if dtype.kind in 'iu':
+        return pd.to_numeric(values, downcast='unsigned' if values.min() >= 0 else 'integer')
+    narrow = values.astype(np.float32)
+    # only when no value loses precision, so amounts with cents stay float64
+    if np.array_equal(narrow.to_numpy(dtype=float), values.to_numpy(), equal_nan=True):
+        return narrow
+    return values
+
+def compact_dtypes(df: pd.DataFrame, categorical: list) -> Tuple[pd.DataFrame, dict]:
+    """
+    `df` in memory-compact dtypes: the `categorical` columns as categories,
+    0/1 columns as uint8 flags, other integers and floats downcast as far as
+    their values allow. Dates are datetime64 already. Returns the frame and
+    its memory use (bytes, strings included) before and after, in total and
+    per column.
+    """
+    before = df.memory_usage(index=False, deep=True)
+    compact = pd.DataFrame(
+        {col: _compact_column(df[col], col in categorical) for col in df.columns}, index=df.index
+    )
+    after = compact.memory_usage(index=False, deep=True)
+    report = {
+        'bytes_before': int(before.sum()),
+        'bytes_after': int(after.sum()),
+        'columns': [
+            {
+                'column': str(col),
+                'dtype_before': str(df[col].dtype),
+                'dtype_after': str(compact[col].dtype),
+                'bytes_before': int(before[col]),
+                'bytes_after': int(after[col]),
+            }
+            for col in df.columns
+        ],
+    }
+    return compact, report
+
+def describe_cleaned_data(cleaned: pd.DataFrame) -> list:
+    """Per-column summary statistics as JSON-ready records."""
+    # float32 columns of the dtype plan are summed in float64, as pandas sums float64 ones
+    widened = {col: 'float64' for col in cleaned.columns if cleaned[col].dtype == np.float32}
+    desc = cleaned.astype(widened).describe(include="all").T
+    stats_json = (
+        desc.reset_index()
+            .rename(columns={"index": "column"})
+            .to_json(
+                orient="records",
+                date_format="iso",
+                date_unit="s",
+                default_handler=str,
+            )
+    )
+    return json.loads(stats_json)
+
+def clean_raw_dataset(raw_blobs: list):
+    """
+    Decode the row groups of a stored raw dataset, clean it into compact
+    dtypes and summarise it. Runs in a worker process, so it takes and
+    returns plain picklable values. Also returns the memory report of the
+    dtype plan, the dashboard aggregates of the cleaned data, and the
+    cleaning state and encoded row index an incremental clean of later
+    appends starts from. Records are served from storage by /cleaned-records,
+    so none are serialized here.
+    """
+    df = decode_frames(raw_blobs)
+    state = {}
+    cleaned = clean_and_prepare_data(df, state=state)
+    row_index = encode_row_index(state.pop('row_index'))
+    # appended rows are stored with the same category columns
+    state['categorical'] = _category_columns(cleaned)
+    cleaned, memory = compact_dtypes(cleaned, state['categorical'])
+    aggregates = materialize_aggregates(cleaned)
+
+    return cleaned, describe_cleaned_data(cleaned), memory, aggregates, state, row_index
+
+def clean_delta_dataset(delta_blobs: list, state: dict, row_index: Optional[bytes]):
+    """
+    Worker-process wrapper around `clean_delta` for appended row groups.
+    Returns the cleaned new rows in the dtypes of the last full clean, their
+    memory report, the updated state, the encoded row index of the new rows
+    and the stale column/aggregate names.
+    """
+    df = decode_frames(delta_blobs)
+    cleaned, state, delta_index, stale = clean_delta(df, state, decode_row_index(row_index))
+    cleaned, memory = compact_dtypes(cleaned, state.get('categorical', []))
+
+    return cleaned, memory, state, encode_row_index(delta_index), stale
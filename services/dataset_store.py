@@ -0,0 +1,694 @@
+import hashlib
+import json
+import struct
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from redis.exceptions import WatchError
+
+from dependencies.cache import (
+    cache, CACHE_TTL, delete_values, get_value, get_values, pack_value, set_value, value_keys,
+)
+from dependencies.workers import thread_pool
+from services.frame_cache import frame_cache
+
+# Binary layout of a stored dataset:
+#   MAGIC (4 bytes) | header length (uint32 LE) | header JSON | column buffers
+# The header lists every column with its kind, dtype and the byte range of
+# its buffer, so a reader can restore typed columns without parsing rows.
+FORMAT_MAGIC = b"VDS1"
+FORMAT_VERSION = 1
+_HEADER_LEN = struct.Struct("<I")
+
+# A dataset written in row groups (streamed uploads, appends) is stored as a manifest
+#   MANIFEST_MAGIC (4 bytes) | JSON {"format", "rows", "columns", "parts", ...}
+# where every part key holds one columnar frame, compressed and chunked by
+# dependencies.cache.set_value. Raw manifests also carry the "base" write
+# id, kept across appends and renewed by a replacing upload; cleaned
+# manifests carry the dataset "meta".
+MANIFEST_MAGIC = b"VDSM"
+
+# A cleaned row group is stored column by column, so readers fetch and decode
+# only the columns they ask for:
+#   COLUMN_PART_MAGIC (4 bytes) | JSON {"format", "rows", "columns"}
+# where each column entry is the column's header entry from the frame format
+# plus the "key" holding its buffer (compressed and chunked by set_value).
+COLUMN_PART_MAGIC = b"VDSP"
+
+
+def raw_data_key(user_id: int) -> str:
+    return f"raw_data:user:{user_id}"
+
+
+def cleaned_data_key(user_id: int) -> str:
+    return f"cleaned_data:user:{user_id}"
+
+
+def cleaned_version_key(user_id: int) -> str:
+    return f"cleaned_data_version:user:{user_id}"
+
+
+def cleaning_state_key(user_id: int) -> str:
+    return f"cleaning_state:user:{user_id}"
+
+
+def cleaned_row_index_key(user_id: int) -> str:
+    return f"cleaned_row_index:user:{user_id}"
+
+
+# ====== Column encoding ======
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return value.isoformat()
+    return str(value)
+
+
+def _encode_values(values) -> bytes:
+    return json.dumps(list(values), default=_json_default).encode("utf-8")
+
+
+def _encode_column(series: pd.Series) -> Tuple[Dict[str, Any], bytes]:
+    dtype = series.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        categories = dtype.categories
+        meta = {
+            "kind": "category",
+            "dtype": codes.dtype.str,
+            "ordered": bool(dtype.ordered),
+            "categories_dtype": str(categories.dtype),
+        }
+        payload = codes.tobytes()
+        meta["codes_length"] = len(payload)
+        return meta, payload + _encode_values(categories.tolist())
+
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        values = series.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy("datetime64[ns]")
+        return {"kind": "datetime", "dtype": "<i8", "tz": str(dtype.tz)}, values.view("<i8").tobytes()
+
+    if pd.api.types.is_datetime64_dtype(dtype):
+        values = series.to_numpy("datetime64[ns]")
+        return {"kind": "datetime", "dtype": "<i8"}, values.view("<i8").tobytes()
+
+    if pd.api.types.is_timedelta64_dtype(dtype):
+        values = series.to_numpy("timedelta64[ns]")
+        return {"kind": "timedelta", "dtype": "<i8"}, values.view("<i8").tobytes()
+
+    if isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+        values = np.ascontiguousarray(series.to_numpy())
+        return {"kind": "numeric", "dtype": values.dtype.str}, values.tobytes()
+
+    # object / string / anything else: dictionary-encode the values
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    codes = codes.astype("<i4", copy=False)
+    payload = codes.tobytes()
+    meta = {
+        "kind": "dictionary",
+        "dtype": codes.dtype.str,
+        "codes_length": len(payload),
+        "pandas_dtype": str(dtype),
+    }
+    return meta, payload + _encode_values(uniques.tolist())
+
+
+def _decode_column(meta: Dict[str, Any], buf: memoryview, rows: int) -> pd.Series:
+    kind = meta["kind"]
+    name = meta["name"]
+
+    if kind == "numeric":
+        return pd.Series(np.frombuffer(buf, dtype=meta["dtype"], count=rows), name=name)
+
+    if kind == "datetime":
+        values = np.frombuffer(buf, dtype="<i8", count=rows).view("datetime64[ns]")
+        series = pd.Series(values, name=name)
+        if meta.get("tz"):
+            series = series.dt.tz_localize("UTC").dt.tz_convert(meta["tz"])
+        return series
+
+    if kind == "timedelta":
+        values = np.frombuffer(buf, dtype="<i8", count=rows).view("timedelta64[ns]")
+        return pd.Series(values, name=name)
+
+    codes_length = meta["codes_length"]
+    codes = np.frombuffer(buf[:codes_length], dtype=meta["dtype"], count=rows)
+    uniques = json.loads(bytes(buf[codes_length:]).decode("utf-8"))
+
+    if kind == "category":
+        categories = pd.Index(uniques)
+        if meta.get("categories_dtype") not in (None, "object"):
+            try:
+                categories = categories.astype(meta["categories_dtype"])
+            except (TypeError, ValueError):
+                pass
+        dtype = pd.CategoricalDtype(categories, ordered=meta.get("ordered", False))
+        return pd.Series(pd.Categorical.from_codes(codes, dtype=dtype), name=name)
+
+    # dictionary-encoded object column; code -1 marks a missing value
+    lookup = np.empty(len(uniques) + 1, dtype=object)
+    lookup[:-1] = uniques
+    lookup[-1] = np.nan
+    series = pd.Series(lookup[codes], name=name)
+    pandas_dtype = meta.get("pandas_dtype", "object")
+    if pandas_dtype != "object":
+        try:
+            series = series.astype(pandas_dtype)
+        except (TypeError, ValueError):
+            pass
+    return series
+
+
+# ====== Frame encoding ======
+
+def encode_frame(df: pd.DataFrame, meta: Optional[Dict[str, Any]] = None) -> bytes:
+    """Serialize a DataFrame into the typed columnar format."""
+    df = df.reset_index(drop=True)
+    columns: List[Dict[str, Any]] = []
+    buffers: List[bytes] = []
+    offset = 0
+
+    for name in df.columns:
+        col_meta, payload = _encode_column(df[name])
+        col_meta.update({"name": str(name), "offset": offset, "length": len(payload)})
+        columns.append(col_meta)
+        buffers.append(payload)
+        offset += len(payload)
+
+    header = json.dumps({
+        "format": FORMAT_VERSION,
+        "rows": len(df),
+        "columns": columns,
+        "meta": meta or {},
+    }, default=_json_default).encode("utf-8")
+
+    return b"".join([FORMAT_MAGIC, _HEADER_LEN.pack(len(header)), header, *buffers])
+
+
+def _read_header(blob: bytes) -> Tuple[Dict[str, Any], int]:
+    (header_len,) = _HEADER_LEN.unpack_from(blob, len(FORMAT_MAGIC))
+    start = len(FORMAT_MAGIC) + _HEADER_LEN.size
+    header = json.loads(bytes(blob[start:start + header_len]).decode("utf-8"))
+    if header.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported dataset format version: {header.get('format')}")
+    return header, start + header_len
+
+
+def is_columnar(blob: bytes) -> bool:
+    return bytes(blob[:len(FORMAT_MAGIC)]) == FORMAT_MAGIC
+
+
+def decode_frame(blob: bytes) -> pd.DataFrame:
+    """Restore a DataFrame from the columnar format or the legacy JSON records."""
+    if not is_columnar(blob):
+        return _decode_legacy_json(blob)
+
+    header, data_start = _read_header(blob)
+    rows = header["rows"]
+    # one writable copy of the payload; every column is a zero-copy view into it
+    data = memoryview(bytearray(blob[data_start:]))
+
+    series = {}
+    for col in header["columns"]:
+        buf = data[col["offset"]:col["offset"] + col["length"]]
+        series[col["name"]] = _decode_column(col, buf, rows)
+
+    if not series:
+        return pd.DataFrame(index=pd.RangeIndex(rows))
+    return pd.DataFrame(series, copy=False)
+
+
+def _unify_categories(frames: List[pd.DataFrame]) -> None:
+    """
+    Give a column that is categorical in every row group the union of their
+    categories, so concatenating keeps it categorical instead of object.
+    """
+    for name in frames[0].columns:
+        dtypes = [frame[name].dtype if name in frame.columns else None for frame in frames]
+        if not all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes) or all(d == dtypes[0] for d in dtypes):
+            continue
+        categories = dtypes[0].categories
+        for dtype in dtypes[1:]:
+            categories = categories.append(dtype.categories[~dtype.categories.isin(categories)])
+        for frame in frames:
+            frame[name] = frame[name].cat.set_categories(categories)
+
+
+def decode_frames(blobs: List[bytes]) -> pd.DataFrame:
+    """Decode the row groups of a multi-part dataset into one frame."""
+    frames = [decode_frame(blob) for blob in blobs]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    _unify_categories(frames)
+    return pd.concat(frames, ignore_index=True)
+
+
+# ====== Column-split row groups ======
+
+def pack_column_part(key: str, df: pd.DataFrame) -> Tuple[str, Dict[str, bytes]]:
+    """
+    Encode a row group of the dataset under `key` column by column. Returns
+    its content-addressed part key and every key and value to store for it:
+    the part header and each column's packed buffer and chunks.
+    """
+    df = df.reset_index(drop=True)
+    columns: List[Dict[str, Any]] = []
+    buffers: List[bytes] = []
+    digest = hashlib.blake2b(digest_size=8)
+    for name in df.columns:
+        col_meta, payload = _encode_column(df[name])
+        col_meta["name"] = str(name)
+        columns.append(col_meta)
+        buffers.append(payload)
+        digest.update(json.dumps(col_meta, default=_json_default).encode("utf-8"))
+        digest.update(payload)
+
+    # identical row groups get identical keys, so rewriting one leaves nothing behind
+    part_key = f"{key}:part:{digest.hexdigest()}"
+    values: Dict[str, bytes] = {}
+    for i, (col_meta, payload) in enumerate(zip(columns, buffers)):
+        col_meta["key"] = f"{part_key}:col:{i}"
+        head, chunks = pack_value(col_meta["key"], payload)
+        values.update(chunks)
+        values[col_meta["key"]] = head
+
+    header = {"format": FORMAT_VERSION, "rows": len(df), "columns": columns}
+    values[part_key] = COLUMN_PART_MAGIC + json.dumps(header, default=_json_default).encode("utf-8")
+    return part_key, values
+
+
+def is_column_part(blob: bytes) -> bool:
+    return bytes(blob[:len(COLUMN_PART_MAGIC)]) == COLUMN_PART_MAGIC
+
+
+def decode_column_part(blob: bytes) -> Dict[str, Any]:
+    return json.loads(bytes(blob[len(COLUMN_PART_MAGIC):]).decode("utf-8"))
+
+
+def _project_frames(heads: List[bytes], buffers: Dict[str, bytes], columns: List[str]) -> pd.DataFrame:
+    """Decode `columns` of every row group, in order, into one frame."""
+    frames = []
+    for head in heads:
+        if not is_column_part(head):
+            # a row group stored whole, before columns were split
+            frame = decode_frame(head)
+            frames.append(frame[[col for col in columns if col in frame.columns]])
+            continue
+        header = decode_column_part(head)
+        rows = header["rows"]
+        series = {
+            col["name"]: _decode_column(col, memoryview(bytearray(buffers[col["key"]])), rows)
+            for col in header["columns"] if col["name"] in columns
+        }
+        frames.append(pd.DataFrame(series, copy=False) if series else pd.DataFrame(index=pd.RangeIndex(rows)))
+
+    if len(frames) == 1:
+        return frames[0]
+    _unify_categories(frames)
+    return pd.concat(frames, ignore_index=True)
+
+
+async def load_columns(parts: List[str], columns: List[str]) -> pd.DataFrame:
+    """
+    `columns` of the row groups stored under `parts`. Only the headers and
+    those columns' buffers are transferred and decoded.
+    """
+    heads = await get_values(parts)
+    if any(head is None for head in heads):
+        raise ValueError("Stored dataset is incomplete; some row groups have expired.")
+
+    wanted = [
+        col["key"] for head in heads if is_column_part(head)
+        for col in decode_column_part(head)["columns"] if col["name"] in columns
+    ]
+    fetched = await get_values(wanted)
+    if any(buffer is None for buffer in fetched):
+        raise ValueError("Stored dataset is incomplete; some columns have expired.")
+    return await thread_pool.run(_project_frames, heads, dict(zip(wanted, fetched)), columns)
+
+
+async def part_keys(parts: List[str]) -> List[str]:
+    """Every key a list of row groups is stored under: parts, columns and chunks."""
+    heads = await cache.mget(parts) if parts else []
+    columns = [
+        col["key"] for head in heads if head and is_column_part(head)
+        for col in decode_column_part(head)["columns"]
+    ]
+    return await value_keys(list(parts)) + await value_keys(columns)
+
+
+def is_manifest(blob: bytes) -> bool:
+    return bytes(blob[:len(MANIFEST_MAGIC)]) == MANIFEST_MAGIC
+
+
+def decode_manifest(blob: bytes) -> Dict[str, Any]:
+    return json.loads(bytes(blob[len(MANIFEST_MAGIC):]).decode("utf-8"))
+
+
+def encode_manifest(manifest: Dict[str, Any]) -> bytes:
+    return MANIFEST_MAGIC + json.dumps({"format": FORMAT_VERSION, **manifest}, default=_json_default).encode("utf-8")
+
+
+def decode_meta(blob: bytes) -> Dict[str, Any]:
+    """Return the metadata stored alongside a dataset, without decoding columns."""
+    if is_manifest(blob):
+        return decode_manifest(blob).get("meta", {})
+    if not is_columnar(blob):
+        payload = json.loads(blob)
+        if isinstance(payload, dict):
+            return {k: v for k, v in payload.items() if k != "data"}
+        return {}
+    header, _ = _read_header(blob)
+    return header.get("meta", {})
+
+
+# ====== Legacy JSON records ======
+
+def _decode_legacy_json(blob) -> pd.DataFrame:
+    """
+    Datasets written before the columnar format were stored as JSON records,
+    either bare (raw uploads) or wrapped in the clean payload under "data".
+    """
+    payload = json.loads(blob)
+    records = payload.get("data", []) if isinstance(payload, dict) else payload
+    df = pd.DataFrame(records)
+
+    for col in df.columns:
+        if "date" in col.lower():
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    if "Claim_Amount_KES" in df.columns:
+        df["Claim_Amount_KES"] = pd.to_numeric(df["Claim_Amount_KES"], errors="coerce")
+    return df
+
+
+# ====== Redis access ======
+
+async def save_dataset(key: str, df: pd.DataFrame, meta: Optional[Dict[str, Any]] = None, ttl: int = CACHE_TTL) -> None:
+    blob = await thread_pool.run(encode_frame, df, meta)
+    await set_value(key, blob, ex=ttl)
+
+
+async def fetch_row_groups(parts: List[str]) -> List[bytes]:
+    """Fetch row-group blobs by key, with their chunks, in two round trips."""
+    blobs = await get_values(parts)
+    if any(part is None for part in blobs):
+        raise ValueError("Stored dataset is incomplete; some row groups have expired.")
+    return blobs
+
+
+async def fetch_dataset_blobs(blob: bytes) -> List[bytes]:
+    """Resolve a stored value into the frame blobs it is made of."""
+    if not is_manifest(blob):
+        return [blob]
+    return await fetch_row_groups(decode_manifest(blob)["parts"])
+
+
+async def load_dataset(key: str) -> Optional[pd.DataFrame]:
+    blob = await get_value(key)
+    if not blob:
+        return None
+    blobs = await fetch_dataset_blobs(blob)
+    return await thread_pool.run(decode_frames, blobs)
+
+
+class DatasetWriter:
+    """
+    Writes a dataset to Redis one row group at a time, so the caller only ever
+    holds a single chunk in memory. Readers keep seeing the previous dataset
+    until `commit` swaps the manifest in.
+
+    With `append=True` the new row groups are added after those of the stored
+    dataset instead of replacing them.
+    """
+
+    def __init__(self, key: str, ttl: int = CACHE_TTL, append: bool = False):
+        self.key = key
+        self.ttl = ttl
+        self.appending = append
+        self.write_id = uuid.uuid4().hex[:12]
+        self.parts: List[str] = []
+        self.rows = 0
+        self.total_rows = 0
+        self.columns: List[str] = []
+
+    async def append(self, df: pd.DataFrame) -> None:
+        blob = await thread_pool.run(encode_frame, df)
+        part_key = f"{self.key}:part:{self.write_id}:{len(self.parts)}"
+        await set_value(part_key, blob, ex=self.ttl)
+        self.parts.append(part_key)
+        self.rows += len(df)
+        if not self.columns:
+            self.columns = [str(c) for c in df.columns]
+
+    async def commit(self) -> None:
+        async with cache.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    # retried if another upload swaps the manifest meanwhile
+                    await pipe.watch(self.key)
+                    previous = await pipe.get(self.key)
+                    manifest = self._manifest(previous)
+                    earlier = manifest["parts"][:len(manifest["parts"]) - len(self.parts)] if self.appending else []
+                    renewed = await value_keys(earlier)
+
+                    pipe.multi()
+                    pipe.set(self.key, encode_manifest(manifest), ex=self.ttl)
+                    # earlier row groups (and their chunks) live as long as the manifest pointing at them
+                    for part in renewed:
+                        pipe.expire(part, self.ttl)
+                    await pipe.execute()
+                    break
+                except WatchError:
+                    continue
+
+        self.total_rows = manifest["rows"]
+
+        # drop the row groups of the dataset we just replaced
+        if previous and is_manifest(previous):
+            stale = [k for k in decode_manifest(previous)["parts"] if k not in manifest["parts"]]
+            await delete_values(*stale)
+
+    def _manifest(self, previous: Optional[bytes]) -> Dict[str, Any]:
+        manifest = {"base": self.write_id, "rows": self.rows, "columns": self.columns, "parts": self.parts}
+        if not self.appending or not previous:
+            return manifest
+        if not is_manifest(previous):
+            raise ValueError("The stored dataset predates append uploads; upload it again in replace mode first.")
+
+        current = decode_manifest(previous)
+        if self.parts and set(current["columns"]) != set(self.columns):
+            raise ValueError("Appended data must have the same columns as the stored dataset.")
+        return {
+            "base": current.get("base", self.write_id),
+            "rows": current["rows"] + self.rows,
+            "columns": current["columns"],
+            "parts": current["parts"] + self.parts,
+        }
+
+    async def abort(self) -> None:
+        await delete_values(*self.parts)
+        self.parts = []
+
+
+def dataset_lineage(blob: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    """The base write id and row-group keys of a stored raw dataset, if it has any."""
+    if not blob or not is_manifest(blob):
+        return None
+    manifest = decode_manifest(blob)
+    if "base" not in manifest:
+        return None
+    return {"base": manifest["base"], "parts": manifest["parts"]}
+
+
+def appended_row_groups(blob: Optional[bytes], lineage: Optional[Dict[str, Any]]) -> Optional[List[str]]:
+    """
+    Row-group keys added to a stored raw dataset since `lineage` was taken,
+    or None when the dataset has since been replaced and must be read whole.
+    """
+    current = dataset_lineage(blob)
+    if current is None or not lineage or current["base"] != lineage["base"]:
+        return None
+    seen = set(lineage["parts"])
+    if not seen.issubset(current["parts"]):
+        return None
+    return [part for part in current["parts"] if part not in seen]
+
+
+def dataset_version(blob: bytes) -> str:
+    """Content hash of a stored dataset; identical data maps to the same version."""
+    return hashlib.blake2b(blob, digest_size=8).hexdigest()
+
+
+async def save_cleaned_dataset(user_id: int, df: pd.DataFrame, meta: Optional[Dict[str, Any]] = None,
+                               state: Optional[Dict[str, Any]] = None, row_index: Optional[bytes] = None) -> str:
+    """
+    Store a cleaned dataset together with its version and return the version.
+    Workers holding an older decoded copy notice the version change on their
+    next read. `state` and `row_index`, when given, are what a later
+    incremental clean of appended rows starts from; otherwise any stored
+    state is dropped.
+    """
+    key = cleaned_data_key(user_id)
+    # content-addressed, so identical cleaned data gets an identical manifest and version
+    part_key, values = await thread_pool.run(pack_column_part, key, df)
+    manifest = encode_manifest({
+        "rows": len(df),
+        "columns": [str(c) for c in df.columns],
+        "parts": [part_key],
+        "meta": meta or {},
+    })
+    version = dataset_version(manifest)
+
+    previous = await cache.get(key)
+    async with cache.pipeline(transaction=True) as pipe:
+        for value_key, value in values.items():
+            pipe.set(value_key, value, ex=CACHE_TTL)
+        pipe.set(key, manifest, ex=CACHE_TTL)
+        pipe.set(cleaned_version_key(user_id), version, ex=CACHE_TTL)
+        if state is not None:
+            pipe.set(cleaning_state_key(user_id), json.dumps(state, default=_json_default), ex=CACHE_TTL)
+            pipe.set(cleaned_row_index_key(user_id), row_index or b"", ex=CACHE_TTL)
+        else:
+            pipe.delete(cleaning_state_key(user_id), cleaned_row_index_key(user_id))
+        await pipe.execute()
+
+    if previous and is_manifest(previous):
+        stale = [k for k in decode_manifest(previous)["parts"] if k != part_key]
+        if stale:
+            await cache.delete(*await part_keys(stale))
+
+    frame_cache.invalidate(key)
+    return version
+
+
+async def append_cleaned_dataset(user_id: int, df: pd.DataFrame, state: Dict[str, Any], row_index: bytes,
+                                 stale: Optional[List[str]] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Add cleaned rows to the stored cleaned dataset as a new row group, and
+    replace the cleaning state and extend the row index in the same
+    transaction. Only the new rows are encoded and sent. `stale` names are
+    merged into the dataset's metadata. Returns the new version and metadata.
+    """
+    key = cleaned_data_key(user_id)
+    part_key, values = await thread_pool.run(pack_column_part, key, df)
+
+    async with cache.pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                await pipe.watch(key)
+                current = await pipe.get(key)
+                if not current or not is_manifest(current):
+                    raise ValueError("No cleaned dataset to append to; run a full clean first.")
+                manifest = decode_manifest(current)
+                meta = manifest.get("meta", {})
+                meta["stale"] = sorted(set(meta.get("stale", [])) | set(stale or []))
+                new_parts = [part_key] if len(df) and part_key not in manifest["parts"] else []
+                parts = manifest["parts"] + new_parts
+                renewed = await part_keys(manifest["parts"])
+                updated = encode_manifest({
+                    "rows": manifest["rows"] + len(df),
+                    "columns": manifest["columns"],
+                    "parts": parts,
+                    "meta": meta,
+                })
+                version = dataset_version(updated)
+
+                pipe.multi()
+                if new_parts:
+                    for value_key, value in values.items():
+                        pipe.set(value_key, value, ex=CACHE_TTL)
+                pipe.set(key, updated, ex=CACHE_TTL)
+                for part in renewed:
+                    pipe.expire(part, CACHE_TTL)
+                pipe.set(cleaned_version_key(user_id), version, ex=CACHE_TTL)
+                pipe.set(cleaning_state_key(user_id), json.dumps(state, default=_json_default), ex=CACHE_TTL)
+                pipe.append(cleaned_row_index_key(user_id), row_index)
+                pipe.expire(cleaned_row_index_key(user_id), CACHE_TTL)
+                await pipe.execute()
+                break
+            except WatchError:
+                continue
+
+    frame_cache.invalidate(key)
+    return version, meta
+
+
+async def load_cleaning_state(user_id: int) -> Tuple[Optional[Dict[str, Any]], Optional[bytes]]:
+    """The state and row index recorded by the last clean, if both survive."""
+    state, row_index = await cache.mget([cleaning_state_key(user_id), cleaned_row_index_key(user_id)])
+    if state is None or row_index is None:
+        return None, None
+    return json.loads(state), row_index
+
+
+async def get_dataset_info(key: str) -> Optional[Dict[str, Any]]:
+    """Rows, columns and metadata of a stored multi-part dataset, without reading its rows."""
+    blob = await cache.get(key)
+    if not blob or not is_manifest(blob):
+        return None
+    manifest = decode_manifest(blob)
+    return {"rows": manifest["rows"], "columns": manifest["columns"], "meta": manifest.get("meta", {})}
+
+
+async def get_cleaned_version(user_id: int) -> Optional[str]:
+    version = await cache.get(cleaned_version_key(user_id))
+    return version.decode() if isinstance(version, bytes) else version
+
+
+async def load_cleaned_snapshot(user_id: int, columns: Optional[List[str]] = None
+                                ) -> Optional[Tuple[pd.DataFrame, str]]:
+    """
+    Return the user's cleaned dataset with the version it was read from.
+    With `columns`, only those (of the ones it has) are returned, and only
+    they are fetched and decoded. Decoded columns are kept per worker and
+    version, so each is decoded at most once per version per worker.
+
+    The returned frame is a shallow copy: adding or replacing columns is
+    safe, in-place edits of existing values are not.
+    """
+    key = cleaned_data_key(user_id)
+    blob = await cache.get(key)
+    if not blob:
+        return None
+    version = dataset_version(blob)
+
+    if not is_manifest(blob):
+        # a dataset stored whole, before row groups
+        df = frame_cache.get(key, version)
+        if df is None:
+            df = await thread_pool.run(decode_frames, [blob])
+            frame_cache.put(key, version, df)
+        needed = list(df.columns) if columns is None else [col for col in df.columns if col in columns]
+    else:
+        manifest = decode_manifest(blob)
+        stored = manifest["columns"]
+        needed = stored if columns is None else [col for col in stored if col in columns]
+        df = frame_cache.get(key, version)
+        missing = [col for col in needed if df is None or col not in df.columns]
+        if missing:
+            loaded = await load_columns(manifest["parts"], missing)
+            if df is not None:
+                # the columns decoded earlier are kept as they are, not copied
+                decoded = {**{col: df[col] for col in df.columns}, **{col: loaded[col] for col in loaded.columns}}
+                loaded = pd.DataFrame({col: decoded[col] for col in stored if col in decoded}, copy=False)
+            df = loaded
+            frame_cache.put(key, version, df)
+        if df is None:
+            # no columns asked for and none cached
+            df = pd.DataFrame(index=pd.RangeIndex(manifest["rows"]))
+
+    if needed == list(df.columns):
+        return df.copy(deep=False), version
+    return pd.DataFrame({col: df[col] for col in needed}, index=df.index, copy=False), version
+
+
+async def load_cleaned_dataset(user_id: int, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+    """The user's cleaned dataset, or `columns` of it; see `load_cleaned_snapshot`."""
+    snapshot = await load_cleaned_snapshot(user_id, columns)
+    return None if snapshot is None else snapshot[0]
@@ -0,0 +1,88 @@
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from dependencies.cache import cache
+
+load_dotenv()
+
+# Entries kept per user and kind of history; older ones are trimmed
+MONITOR_HISTORY_SIZE = int(os.getenv("MONITOR_HISTORY_SIZE", 1000))
+# Lifetime (seconds) of a user's history after its last entry
+MONITOR_HISTORY_TTL = int(os.getenv("MONITOR_HISTORY_TTL", 90 * 24 * 60 * 60))
+
+HISTORY_KINDS = ("performance", "drift")
+
+
+def monitor_history_key(user_id: int, kind: str) -> str:
+    return f"monitor:{kind}:user:{user_id}"
+
+
+def _stream_id(moment: datetime) -> int:
+    # naive times are taken as UTC, like the timestamps this history returns
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+class ModelMonitor:
+    """
+    Per-user time series of model performance (one entry per registered
+    model) and of drift checks, kept as Redis streams trimmed to
+    MONITOR_HISTORY_SIZE entries. Entry ids are their millisecond
+    timestamps, so time ranges are read without scanning.
+    """
+
+    def __init__(self, size: int = MONITOR_HISTORY_SIZE, ttl: int = MONITOR_HISTORY_TTL):
+        self.size = size
+        self.ttl = ttl
+
+    async def log(self, user_id: int, kind: str, record: Dict[str, Any]) -> None:
+        key = monitor_history_key(user_id, kind)
+        async with cache.pipeline(transaction=True) as pipe:
+            pipe.xadd(key, {"data": json.dumps(record)}, maxlen=self.size, approximate=False)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def log_performance(self, user_id: int, meta: Dict[str, Any]) -> None:
+        await self.log(user_id, "performance", {
+            "model_id": meta["model_id"],
+            "version": meta["version"],
+            "model": meta["model"],
+            "target_variable": meta["target_variable"],
+            "dataset_version": meta["dataset_version"],
+            "metrics": meta["metrics"],
+        })
+
+    async def log_drift(self, user_id: int, meta: Dict[str, Any], rows: int,
+                        drift_metrics: Dict[str, Dict[str, Any]]) -> None:
+        await self.log(user_id, "drift", {
+            "model_id": meta["model_id"],
+            "version": meta["version"],
+            "rows": rows,
+            "drifted": sorted(col for col, metrics in drift_metrics.items() if metrics["drifted"]),
+            "psi": {col: metrics["psi"] for col, metrics in drift_metrics.items()},
+        })
+
+    async def history(self, user_id: int, kind: str, since: Optional[datetime] = None,
+                      until: Optional[datetime] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Entries between `since` and `until` (inclusive), newest first."""
+        entries = await cache.xrevrange(
+            monitor_history_key(user_id, kind),
+            max=_stream_id(until) if until is not None else "+",
+            min=_stream_id(since) if since is not None else "-",
+            count=limit,
+        )
+        history = []
+        for entry_id, fields in entries:
+            entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+            data = fields.get(b"data", fields.get("data"))
+            timestamp = datetime.fromtimestamp(int(entry_id.split("-")[0]) / 1000, tz=timezone.utc)
+            history.append({"timestamp": timestamp.isoformat(), **json.loads(data)})
+        return history
+
+
+model_monitor = ModelMonitor()
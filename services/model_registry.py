@@ -0,0 +1,315 @@
+import asyncio
+import json
+import os
+import pickle
+import re
+import threading
+import uuid
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from dependencies.cache import cache
+from dependencies.workers import thread_pool
+from services.model_monitor import model_monitor
+from utils.train_model_formula import train_model_formula
+
+load_dotenv()
+
+# Where fitted models are kept: "disk" (under MODEL_REGISTRY_DIR) or "redis"
+MODEL_REGISTRY_BACKEND = os.getenv("MODEL_REGISTRY_BACKEND", "disk")
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "model_registry")
+# Models kept per user; registering another evicts the oldest
+MODEL_REGISTRY_MAX_VERSIONS = int(os.getenv("MODEL_REGISTRY_MAX_VERSIONS", 5))
+# Lifetime (seconds) of models kept in Redis; 0 keeps them until evicted
+MODEL_REGISTRY_TTL = int(os.getenv("MODEL_REGISTRY_TTL", 30 * 24 * 60 * 60))
+# Per-worker budget for unpickled models, measured by their pickled size
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Feature importances kept in a model's metadata
+FEATURE_IMPORTANCE_TOP = 20
+
+_MODEL_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def model_meta_key(user_id: int) -> str:
+    return f"models:user:{user_id}"
+
+
+def model_blob_key(user_id: int, model_id: str) -> str:
+    return f"model:user:{user_id}:{model_id}"
+
+
+# ====== Packaging (worker process) ======
+
+def package_model(artifacts: Dict[str, Any], params: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+    """
+    Split the artifacts of a training run into JSON metadata and the pickled
+    estimators. Runs where the model was trained, so the fitted pipeline is
+    pickled once rather than shipped back to the API worker first.
+    """
+    importance = artifacts["feature_importance"]
+    meta = {
+        "model": artifacts["model"],
+        "params": params,
+        "target_variable": artifacts["target_variable"],
+        "feature_columns": list(artifacts["feature_columns"]),
+        "metrics": artifacts["metrics"],
+        "feature_importance": [] if importance is None
+            else importance.head(FEATURE_IMPORTANCE_TOP).to_dict(orient="records"),
+        "fraud_model": artifacts["fraud_model"] is not None,
+        "fraud_threshold": artifacts["fraud_threshold"],
+        "skipped_candidates": artifacts["skipped_candidates"],
+        "reference_profile": artifacts["reference_profile"],
+        "trained_at": artifacts["trained_at"].isoformat(),
+    }
+    blob = pickle.dumps({
+        "pipeline": artifacts["pipeline"],
+        "feature_columns": meta["feature_columns"],
+        "fraud_model": artifacts["fraud_model"],
+        "fraud_threshold": artifacts["fraud_threshold"],
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+    meta["size_bytes"] = len(blob)
+    return meta, blob
+
+
+def train_and_package(params: Dict[str, Any], records, progress_callback=None, dataset_scope=None):
+    """
+    Worker-process entry point: run `train_model_formula` and package its
+    model. Returns (results, metadata, pickled model), or (False, None, None)
+    when there is nothing to train on.
+    """
+    trained = train_model_formula(
+        records=records, progress_callback=progress_callback, return_model=True, dataset_scope=dataset_scope, **params
+    )
+    if trained is False or trained is None:
+        return False, None, None
+    results_df, artifacts = trained
+    meta, blob = package_model(artifacts, params)
+    return results_df, meta, blob
+
+
+# ====== Storage backends ======
+
+class DiskModelStore:
+    """Models as `{root}/{user_id}/{model_id}.pkl`, each with a `.json` of its metadata."""
+
+    def __init__(self, root: str = MODEL_REGISTRY_DIR):
+        self.root = Path(root)
+
+    def _path(self, user_id: int, model_id: str, suffix: str) -> Path:
+        return self.root / str(user_id) / f"{model_id}{suffix}"
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def _put(self, user_id: int, meta: Dict[str, Any], blob: bytes) -> None:
+        # metadata last: a model is listed only once its pickle is complete
+        self._write(self._path(user_id, meta["model_id"], ".pkl"), blob)
+        self._write(self._path(user_id, meta["model_id"], ".json"), json.dumps(meta).encode("utf-8"))
+
+    def _list(self, user_id: int) -> List[Dict[str, Any]]:
+        metas = []
+        for path in (self.root / str(user_id)).glob("*.json"):
+            try:
+                metas.append(json.loads(path.read_bytes()))
+            except (OSError, ValueError):
+                continue
+        return metas
+
+    def _load(self, user_id: int, model_id: str) -> Optional[bytes]:
+        try:
+            return self._path(user_id, model_id, ".pkl").read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _delete(self, user_id: int, model_id: str) -> None:
+        for suffix in (".json", ".pkl"):
+            self._path(user_id, model_id, suffix).unlink(missing_ok=True)
+
+    async def put(self, user_id: int, meta: Dict[str, Any], blob: bytes) -> None:
+        await thread_pool.run(self._put, user_id, meta, blob)
+
+    async def list(self, user_id: int) -> List[Dict[str, Any]]:
+        return await thread_pool.run(self._list, user_id)
+
+    async def load(self, user_id: int, model_id: str) -> Optional[bytes]:
+        return await thread_pool.run(self._load, user_id, model_id)
+
+    async def delete(self, user_id: int, model_id: str) -> None:
+        await thread_pool.run(self._delete, user_id, model_id)
+
+
+class RedisModelStore:
+    """Pickled models under `model:user:{id}:{model_id}`, metadata in the hash `models:user:{id}`."""
+
+    def __init__(self, ttl: int = MODEL_REGISTRY_TTL):
+        self.ttl = ttl or None
+
+    async def put(self, user_id: int, meta: Dict[str, Any], blob: bytes) -> None:
+        async with cache.pipeline(transaction=True) as pipe:
+            pipe.set(model_blob_key(user_id, meta["model_id"]), blob, ex=self.ttl)
+            pipe.hset(model_meta_key(user_id), meta["model_id"], json.dumps(meta))
+            if self.ttl:
+                pipe.expire(model_meta_key(user_id), self.ttl)
+            await pipe.execute()
+
+    async def list(self, user_id: int) -> List[Dict[str, Any]]:
+        return [json.loads(raw) for raw in (await cache.hgetall(model_meta_key(user_id))).values()]
+
+    async def load(self, user_id: int, model_id: str) -> Optional[bytes]:
+        blob = await cache.get(model_blob_key(user_id, model_id))
+        if blob is None:
+            # the pickle expired before its metadata entry
+            await cache.hdel(model_meta_key(user_id), model_id)
+        return blob
+
+    async def delete(self, user_id: int, model_id: str) -> None:
+        async with cache.pipeline(transaction=True) as pipe:
+            pipe.hdel(model_meta_key(user_id), model_id)
+            pipe.delete(model_blob_key(user_id, model_id))
+            await pipe.execute()
+
+
+def create_model_store(backend: str = MODEL_REGISTRY_BACKEND):
+    if backend == "disk":
+        return DiskModelStore()
+    if backend == "redis":
+        return RedisModelStore()
+    raise ValueError(f"Unknown MODEL_REGISTRY_BACKEND: {backend}")
+
+
+# ====== Registry ======
+
+class ModelCache:
+    """
+    Per-worker LRU of unpickled models, keyed by user and model id. Entries
+    are evicted least-recently-used first once their pickled sizes add up
+    to more than `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = MODEL_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, model: Dict[str, Any], nbytes: int) -> None:
+        with self._lock:
+            self._discard(key)
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (model, nbytes)
+            self._size += nbytes
+            while self._size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._discard(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1]
+
+
+class ModelRegistry:
+    """
+    Versioned fitted models per user. Each registration gets a random model
+    id and the version after the highest one in the store (so numbering
+    survives a Redis flush when models are kept on disk); past
+    MODEL_REGISTRY_MAX_VERSIONS the oldest versions are deleted. Registrations
+    are serialised per user within a worker. Every registration is also logged to
+    the user's performance history. Models are unpickled on first use and
+    kept in the worker's ModelCache.
+
+    Pickles are only ever read back from this registry's own storage; never
+    point it at storage other parties can write to.
+    """
+
+    def __init__(self, store, max_versions: int = MODEL_REGISTRY_MAX_VERSIONS):
+        self.store = store
+        self.max_versions = max_versions
+        self.models = ModelCache()
+        self._locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def register(self, user_id: int, meta: Dict[str, Any], blob: bytes,
+                       dataset_version: Optional[str] = None) -> Dict[str, Any]:
+        async with self._locks[user_id]:
+            existing = await self.list(user_id)
+            meta = {
+                "model_id": uuid.uuid4().hex,
+                "version": existing[0]["version"] + 1 if existing else 1,
+                "user_id": user_id,
+                "dataset_version": dataset_version or "",
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                **meta,
+            }
+            await self.store.put(user_id, meta, blob)
+            await model_monitor.log_performance(user_id, meta)
+            for stale in (await self.list(user_id))[self.max_versions:]:
+                await self.delete(user_id, stale["model_id"])
+        return meta
+
+    async def list(self, user_id: int) -> List[Dict[str, Any]]:
+        """Metadata of the user's models, newest first (by creation time between equal versions)."""
+        return sorted(await self.store.list(user_id), key=lambda meta: (meta["version"], meta["created_at"]),
+                      reverse=True)
+
+    async def get(self, user_id: int, model_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Metadata of one model, or of the newest one when `model_id` is None."""
+        if model_id is not None and not _MODEL_ID.match(model_id):
+            return None
+        for meta in await self.list(user_id):
+            if model_id is None or meta["model_id"] == model_id:
+                return meta
+        return None
+
+    async def load(self, user_id: int, meta: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The fitted estimators of a registered model, or None if its pickle is gone."""
+        key = (user_id, meta["model_id"])
+        model = self.models.get(key)
+        if model is not None:
+            return model
+        blob = await self.store.load(user_id, meta["model_id"])
+        if blob is None:
+            return None
+        model = await thread_pool.run(pickle.loads, blob)
+        self.models.put(key, model, len(blob))
+        return model
+
+    async def delete(self, user_id: int, model_id: str) -> None:
+        await self.store.delete(user_id, model_id)
+        self.models.invalidate((user_id, model_id))
+
+
+model_registry = ModelRegistry(create_model_store())
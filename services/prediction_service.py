@@ -0,0 +1,56 @@
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from services.cleaning_service import clean_delta, decode_row_index
+
+load_dotenv()
+
+# Rows transformed and scored per step; bounds the size of the feature matrix
+PREDICT_CHUNK_ROWS = int(os.getenv("PREDICT_CHUNK_ROWS", 10_000))
+
+
+def missing_features(df: pd.DataFrame, feature_columns: List[str]) -> List[str]:
+    return [col for col in feature_columns if col not in df.columns]
+
+
+def prepare_scoring_rows(df: pd.DataFrame, state: Dict[str, Any], row_index: Optional[bytes]) -> pd.DataFrame:
+    """
+    Derive the model features of raw claim rows the way the incremental
+    clean does, with the statistics of the user's last clean. Nothing is
+    stored and no row is dropped as a duplicate.
+    """
+    cleaned, _, _, _ = clean_delta(df, state, decode_row_index(row_index), dedupe=False)
+    return cleaned
+
+
+def score_rows(model: Dict[str, Any], df: pd.DataFrame, chunk_rows: int = PREDICT_CHUNK_ROWS) -> Dict[str, Any]:
+    """
+    Predict the target for every row and, when the model has one, score it
+    with the fraud model. Rows are transformed once per chunk and both
+    estimators reuse the feature matrix.
+    """
+    pipeline = model["pipeline"]
+    preprocessor = pipeline.named_steps["preprocessor"]
+    regressor = pipeline.named_steps["regressor"]
+    fraud_model = model.get("fraud_model")
+
+    features = df[model["feature_columns"]]
+    predictions = np.empty(len(features))
+    fraud_scores = np.empty(len(features)) if fraud_model is not None else None
+    for start in range(0, len(features), chunk_rows):
+        matrix = preprocessor.transform(features.iloc[start:start + chunk_rows])
+        stop = start + matrix.shape[0]
+        predictions[start:stop] = regressor.predict(matrix)
+        if fraud_scores is not None:
+            fraud_scores[start:stop] = fraud_model.decision_function(matrix)
+
+    scored = {"predictions": predictions.tolist(), "fraud_scores": None, "fraud_flags": None}
+    if fraud_scores is not None:
+        scored["fraud_scores"] = fraud_scores.tolist()
+        # the threshold is the 1st percentile of the training scores
+        scored["fraud_flags"] = (fraud_scores <= model["fraud_threshold"]).tolist()
+    return scored
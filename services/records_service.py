@@ -0,0 +1,94 @@
+import base64
+import binascii
+import json
+import os
+from typing import AsyncIterator, Tuple
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from dependencies.workers import thread_pool
+
+load_dotenv()
+
+# Rows per page of /cleaned-records when the client does not ask, and the most it may ask for
+RECORDS_PAGE_SIZE = int(os.getenv("RECORDS_PAGE_SIZE", 1000))
+RECORDS_MAX_PAGE_SIZE = int(os.getenv("RECORDS_MAX_PAGE_SIZE", 10_000))
+# Rows serialized per chunk of a streamed NDJSON or CSV export
+RECORDS_STREAM_ROWS = int(os.getenv("RECORDS_STREAM_ROWS", 5000))
+
+RECORD_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+# ====== Cursors ======
+# A cursor names the dataset version it was issued for and the row the next
+# page starts at, so a page never mixes rows of two versions.
+
+def encode_cursor(version: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """(version, offset) of a cursor; ValueError when it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        version, offset = raw.rsplit(":", 1)
+        offset = int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Malformed cursor.")
+    if offset < 0:
+        raise ValueError("Malformed cursor.")
+    return version, offset
+
+
+# ====== Serialization ======
+
+def encode_records(df: pd.DataFrame, start: int, stop: int, fmt: str = "json", header: bool = True) -> bytes:
+    """
+    Rows `start:stop` of `df` as a JSON array of records, NDJSON lines or CSV,
+    in the date format the clean payload used to carry. Only the slice is
+    ever turned into text.
+    """
+    rows = df.iloc[start:stop]
+    if fmt == "json":
+        return rows.to_json(orient="records", date_format="iso").encode("utf-8")
+    if fmt == "ndjson":
+        if rows.empty:
+            return b""
+        text = rows.to_json(orient="records", date_format="iso", lines=True)
+        return (text if text.endswith("\n") else text + "\n").encode("utf-8")
+    if fmt == "csv":
+        return rows.to_csv(index=False, header=header, date_format="%Y-%m-%dT%H:%M:%S").encode("utf-8")
+    raise ValueError(f"Unknown records format: {fmt}")
+
+
+def records_page(df: pd.DataFrame, version: str, offset: int, limit: int) -> bytes:
+    """
+    One page of records as a JSON document, with the cursor of the next page
+    (null on the last one). The records are spliced in as serialized, not
+    parsed and dumped again.
+    """
+    stop = min(offset + limit, len(df))
+    head = {
+        "version": version,
+        "rows": len(df),
+        "offset": offset,
+        "next_cursor": encode_cursor(version, stop) if stop < len(df) else None,
+    }
+    return b"".join([json.dumps(head)[:-1].encode("utf-8"), b', "data": ', encode_records(df, offset, stop), b"}"])
+
+
+async def stream_records(df: pd.DataFrame, fmt: str, chunk_rows: int = RECORDS_STREAM_ROWS) -> AsyncIterator[bytes]:
+    """
+    NDJSON or CSV of every row, serialized `chunk_rows` at a time off the
+    event loop. The streaming response stops iterating when the client
+    disconnects, so no disconnect watch is needed here.
+    """
+    if fmt == "csv" and df.empty:
+        yield await thread_pool.run(encode_records, df, 0, 0, fmt)
+        return
+    for start in range(0, len(df), chunk_rows):
+        yield await thread_pool.run(encode_records, df, start, start + chunk_rows, fmt, start == 0)
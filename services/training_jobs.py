@@ -0,0 +1,287 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from dependencies.cache import cache
+from dependencies.workers import training_pool, PROCESS_POOL_START_METHOD
+from services.model_registry import model_registry, train_and_package
+
+load_dotenv()
+
+TRAINING_JOB_TTL = int(os.getenv("TRAINING_JOB_TTL", 24 * 60 * 60))
+# How often (seconds) a running job publishes its progress and checks for cancellation
+TRAINING_JOB_SYNC_INTERVAL = float(os.getenv("TRAINING_JOB_SYNC_INTERVAL", 1.0))
+# Lifetime (seconds) of the heartbeat an owning worker renews on every sync; a
+# queued or running job whose heartbeat lapsed lost its worker and counts as failed
+TRAINING_JOB_HEARTBEAT_TTL = float(os.getenv("TRAINING_JOB_HEARTBEAT_TTL", 3 * TRAINING_JOB_SYNC_INTERVAL))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = {SUCCEEDED, FAILED, CANCELLED}
+
+
+class TrainingCancelled(BaseException):
+    """
+    Raised inside a training run once its job has been cancelled. Derives
+    from BaseException so scikit-learn's per-fit error handling
+    (`error_score`) cannot swallow it.
+    """
+
+
+def job_key(job_id: str) -> str:
+    return f"train_job:{job_id}"
+
+
+def job_cancel_key(job_id: str) -> str:
+    return f"train_job_cancel:{job_id}"
+
+
+def job_heartbeat_key(job_id: str) -> str:
+    return f"train_job_heartbeat:{job_id}"
+
+
+def job_dedupe_key(digest: str) -> str:
+    return f"train_job_dedupe:{digest}"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def run_training_job(params: Dict[str, Any], records: pd.DataFrame, progress, cancel_event, dataset_scope=None):
+    """
+    Worker-process entry point. `progress` and `cancel_event` are
+    multiprocessing manager proxies shared with the API worker. Returns the
+    result records with the packaged model for the registry.
+    """
+    def on_progress(update):
+        if cancel_event.is_set():
+            raise TrainingCancelled()
+        progress["current"] = update
+
+    on_progress({"stage": "starting"})
+    progress["started_at"] = _now()
+
+    results_df, model_meta, model_blob = train_and_package(
+        params, records, progress_callback=on_progress, dataset_scope=dataset_scope
+    )
+    if results_df is False or results_df is None:
+        raise ValueError("No Result")
+    return results_df.to_dict(orient="records"), model_meta, model_blob
+
+
+class TrainingJob:
+    def __init__(self, job_id: str, user_id: int, params: Dict[str, Any], dataset_version: str, digest: str):
+        self.id = job_id
+        self.user_id = user_id
+        self.params = params
+        self.dataset_version = dataset_version
+        self.digest = digest
+        self.status = QUEUED
+        self.result = None
+        self.model_id = None
+        self.error = None
+        self.created_at = _now()
+        self.finished_at = None
+        self.progress = None
+        self.cancel_event = None
+        self.task: Optional[asyncio.Task] = None
+
+    def _shared_progress(self) -> Dict[str, Any]:
+        try:
+            return dict(self.progress) if self.progress is not None else {}
+        except (EOFError, OSError, BrokenPipeError):
+            return {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        shared = self._shared_progress()
+        status = self.status
+        if status == QUEUED and "started_at" in shared:
+            status = RUNNING
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "status": status,
+            "params": self.params,
+            "dataset_version": self.dataset_version,
+            "progress": shared.get("current", {}),
+            "result": self.result,
+            "model_id": self.model_id,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": shared.get("started_at"),
+            "finished_at": self.finished_at,
+        }
+
+
+class TrainingJobManager:
+    """
+    Runs `train_model_formula` as background jobs on the training pool.
+
+    Job state lives in this worker while the job runs and is mirrored to
+    Redis under `train_job:{id}`, so any API worker can report status and
+    request cancellation. Identical submissions (same user, dataset version
+    and parameters) share one in-flight job. The owning worker renews a
+    heartbeat while the job is in flight; when it dies, the heartbeat lapses
+    and the job reads as failed, so a resubmission starts a new one.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, TrainingJob] = {}
+        self._manager = None
+        self._closing = False
+
+    def _sync_manager(self):
+        if self._manager is None:
+            self._manager = multiprocessing.get_context(PROCESS_POOL_START_METHOD).Manager()
+        return self._manager
+
+    async def submit(self, user_id: int, params: Dict[str, Any], records: pd.DataFrame,
+                     dataset_version: Optional[str]) -> Tuple[Dict[str, Any], bool]:
+        """Start a job, or return the matching in-flight job. The flag tells which."""
+        dataset_version = dataset_version or ""
+        digest = hashlib.sha256(json.dumps(
+            {"user_id": user_id, "dataset_version": dataset_version, "params": params},
+            sort_keys=True, default=str,
+        ).encode()).hexdigest()
+
+        if training_pool.saturated:
+            raise training_pool.busy_error()
+
+        job = TrainingJob(uuid.uuid4().hex, user_id, params, dataset_version, digest)
+        dedupe_key = job_dedupe_key(digest)
+        if not await cache.set(dedupe_key, job.id, nx=True, ex=TRAINING_JOB_TTL):
+            existing_id = await cache.get(dedupe_key)
+            if existing_id:
+                existing = await self.get(existing_id.decode() if isinstance(existing_id, bytes) else existing_id)
+                if existing is not None and existing["status"] not in FINISHED:
+                    return existing, False
+            await cache.set(dedupe_key, job.id, ex=TRAINING_JOB_TTL)
+
+        manager = self._sync_manager()
+        job.progress = manager.dict()
+        job.cancel_event = manager.Event()
+        self._jobs[job.id] = job
+        await self._beat(job)
+        await self._persist(job)
+
+        job.task = asyncio.create_task(self._run(job, records))
+        return job.snapshot(), True
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.snapshot()
+        raw = await cache.get(job_key(job_id))
+        if not raw:
+            return None
+        record = json.loads(raw)
+        if record["status"] not in FINISHED and not await cache.exists(job_heartbeat_key(job_id)):
+            record = await self._fail_orphan(record)
+        return record
+
+    async def _fail_orphan(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a job whose owning worker stopped renewing its heartbeat as failed."""
+        record.update(status=FAILED, error="The API worker running this job stopped.", finished_at=_now())
+        await cache.set(job_key(record["id"]), json.dumps(record, default=str), ex=TRAINING_JOB_TTL)
+        return record
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.cancel_event.set()
+            # a job still waiting for a worker can be dropped right away
+            if job.snapshot()["status"] == QUEUED and job.task is not None:
+                job.task.cancel()
+            return job.snapshot()
+
+        record = await self.get(job_id)
+        if record is not None and record["status"] not in FINISHED:
+            # owned by another API worker; it picks the flag up on its next sync
+            await cache.set(job_cancel_key(job_id), 1, ex=TRAINING_JOB_TTL)
+        return record
+
+    async def _run(self, job: TrainingJob, records: pd.DataFrame) -> None:
+        syncer = asyncio.create_task(self._sync(job))
+        try:
+            job.result, model_meta, model_blob = await training_pool.run(
+                run_training_job, job.params, records, job.progress, job.cancel_event,
+                (job.user_id, job.dataset_version),
+            )
+            model_meta = await model_registry.register(job.user_id, model_meta, model_blob, job.dataset_version)
+            job.model_id = model_meta["model_id"]
+            job.status = SUCCEEDED
+        except (TrainingCancelled, asyncio.CancelledError):
+            if self._closing:
+                job.status = FAILED
+                job.error = "The API worker shut down before the job finished."
+            else:
+                job.status = CANCELLED
+        except HTTPException as e:
+            job.status = FAILED
+            job.error = e.detail
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+        finally:
+            syncer.cancel()
+            job.finished_at = _now()
+            await self._persist(job)
+            await self._release(job)
+            self._jobs.pop(job.id, None)
+
+    async def _sync(self, job: TrainingJob) -> None:
+        while True:
+            await asyncio.sleep(TRAINING_JOB_SYNC_INTERVAL)
+            if await cache.get(job_cancel_key(job.id)):
+                await self.cancel(job.id)
+            await self._beat(job)
+            await self._persist(job)
+
+    async def _beat(self, job: TrainingJob) -> None:
+        await cache.set(job_heartbeat_key(job.id), 1, px=max(1, int(TRAINING_JOB_HEARTBEAT_TTL * 1000)))
+
+    async def _persist(self, job: TrainingJob) -> None:
+        await cache.set(job_key(job.id), json.dumps(job.snapshot(), default=str), ex=TRAINING_JOB_TTL)
+
+    async def _release(self, job: TrainingJob) -> None:
+        dedupe_key = job_dedupe_key(job.digest)
+        owner = await cache.get(dedupe_key)
+        if owner is not None and (owner.decode() if isinstance(owner, bytes) else owner) == job.id:
+            await cache.delete(dedupe_key)
+        await cache.delete(job_cancel_key(job.id), job_heartbeat_key(job.id))
+
+    async def shutdown(self) -> None:
+        """
+        Record every in-flight job as failed, then stop the training pool and
+        the multiprocessing manager. Needs Redis, so it runs before the cache
+        is closed. Fits already handed to a pool process see their cancel
+        event at their next progress report; the pool is drained before the
+        manager goes, since those processes still connect to it.
+        """
+        self._closing = True
+        jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel_event.set()
+            job.task.cancel()
+        await asyncio.gather(*(job.task for job in jobs), return_exceptions=True)
+
+        training_pool.shutdown(wait=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+training_jobs = TrainingJobManager()
@@ -1,20 +1,123 @@
-from typing import Union
+import hashlib
+import os
+from typing import Any, BinaryIO, Dict, Optional, Tuple, Union
 from pathlib import Path
-from fastapi import UploadFile
-from utils.file_parser import parse_uploaded_file
+from starlette.datastructures import UploadFile
+from dotenv import load_dotenv
+from dependencies.cache import get_value, set_value
+from dependencies.workers import thread_pool
+from services.cleaning_service import is_pipeline_column
+from services.dataset_store import DatasetWriter, decode_frame, encode_frame
+from utils.file_parser import excel_engine, parse_uploaded_file, iter_csv_chunks
 import pandas as pd
 
-async def process_uploaded_file(file: Union[UploadFile, Path]) -> pd.DataFrame:
+load_dotenv()
+
+# Rows per parsed chunk / stored row group, and rows used to plan CSV dtypes
+UPLOAD_CHUNK_ROWS = int(os.getenv("UPLOAD_CHUNK_ROWS", 50_000))
+UPLOAD_SAMPLE_ROWS = int(os.getenv("UPLOAD_SAMPLE_ROWS", 1_000))
+# Lifetime (seconds) of parsed Excel sheets, reused when the same workbook is uploaded again; 0 disables
+PARSED_UPLOAD_TTL = int(os.getenv("PARSED_UPLOAD_TTL", 24 * 60 * 60))
+
+# Column selections an upload can ask for: every column, or those the cleaning pipeline reads
+UPLOAD_COLUMNS = {"all": None, "pipeline": is_pipeline_column}
+
+_HASH_BLOCK = 1024 * 1024
+
+def parsed_upload_key(key: str, digest: str, sheet: Union[int, str], columns: str) -> str:
+    return f"parsed:{key}:{digest}:{excel_engine() or 'default'}:{sheet}:{columns}"
+
+def _open_source(file: Union[UploadFile, Path]) -> Tuple[str, BinaryIO]:
     if isinstance(file, UploadFile):
-        filename = file.filename
-        contents = await file.read()
+        # Starlette already spooled the upload to a temporary file
+        file.file.seek(0)
+        return file.filename, file.file
     elif isinstance(file, Path):
-        filename = file.name
-        contents = file.read_bytes()
+        return file.name, file.open("rb")
     else:
         raise ValueError(f"Unsupported file type: {type(file)}")
 
+def _check_extension(filename: str) -> None:
     if not filename.lower().endswith((".xlsx", ".xls", ".csv")):
         raise ValueError("Only CSV and Excel files are supported.")
 
-    return parse_uploaded_file(contents, filename)
\ No newline at end of file
+def _content_digest(source: BinaryIO) -> str:
+    """Hash of the file's bytes, read block by block; the file is rewound afterwards."""
+    start = source.tell()
+    digest = hashlib.blake2b(digest_size=16)
+    for block in iter(lambda: source.read(_HASH_BLOCK), b""):
+        digest.update(block)
+    source.seek(start)
+    return digest.hexdigest()
+
+async def _parse_workbook(source: BinaryIO, filename: str, key: str, sheet: Union[int, str],
+                          columns: str) -> pd.DataFrame:
+    """
+    Parse one sheet of an uploaded workbook, or reuse the frame parsed from
+    a workbook with the same bytes, sheet and column selection. Parsed
+    sheets are cached under the dataset key, so they are never shared
+    between users.
+    """
+    usecols = UPLOAD_COLUMNS[columns]
+    if not PARSED_UPLOAD_TTL:
+        return await thread_pool.run(parse_uploaded_file, source, filename, sheet, usecols)
+
+    digest = await thread_pool.run(_content_digest, source)
+    cache_key = parsed_upload_key(key, digest, sheet, columns)
+    blob = await get_value(cache_key)
+    if blob is not None:
+        return await thread_pool.run(decode_frame, blob)
+
+    df = await thread_pool.run(parse_uploaded_file, source, filename, sheet, usecols)
+    blob = await thread_pool.run(encode_frame, df)
+    await set_value(cache_key, blob, ex=PARSED_UPLOAD_TTL)
+    return df
+
+async def process_uploaded_file(file: Union[UploadFile, Path]) -> pd.DataFrame:
+    filename, source = _open_source(file)
+    try:
+        _check_extension(filename)
+        return await thread_pool.run(parse_uploaded_file, source, filename)
+    finally:
+        if isinstance(file, Path):
+            source.close()
+
+async def ingest_uploaded_file(file: Union[UploadFile, Path], key: str, append: bool = False,
+                               sheet: Optional[Union[int, str]] = None, columns: str = "all") -> Dict[str, Any]:
+    """
+    Parse an upload and store it under `key` one row group at a time. CSV
+    files are parsed in chunks, so peak memory follows UPLOAD_CHUNK_ROWS
+    rather than the file size; Excel workbooks are parsed whole (one
+    `sheet`, the first by default) and then written in chunks. With
+    `append`, the rows are added to the dataset already stored under `key`
+    rather than replacing it. `columns` is a key of UPLOAD_COLUMNS.
+    """
+    if columns not in UPLOAD_COLUMNS:
+        raise ValueError(f"Unknown column selection: {columns}")
+    filename, source = _open_source(file)
+    writer = DatasetWriter(key, append=append)
+    try:
+        _check_extension(filename)
+
+        if filename.lower().endswith(".csv"):
+            chunks = iter_csv_chunks(source, UPLOAD_CHUNK_ROWS, UPLOAD_SAMPLE_ROWS, UPLOAD_COLUMNS[columns])
+            while True:
+                chunk = await thread_pool.run(next, chunks, None)
+                if chunk is None:
+                    break
+                await writer.append(chunk)
+        else:
+            df = await _parse_workbook(source, filename, key, 0 if sheet is None else sheet, columns)
+            for start in range(0, max(len(df), 1), UPLOAD_CHUNK_ROWS):
+                await writer.append(df.iloc[start:start + UPLOAD_CHUNK_ROWS])
+            del df
+
+        await writer.commit()
+    except BaseException:
+        await writer.abort()
+        raise
+    finally:
+        if isinstance(file, Path):
+            source.close()
+
+    return {"rows": writer.rows, "total_rows": writer.total_rows, "columns": writer.columns}
@@ -0,0 +1,163 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.model_selection import KFold
+
+load_dotenv()
+
+# Per-worker budget for the feature matrices of recent training runs
+FEATURE_CACHE_MAX_BYTES = int(os.getenv("FEATURE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# (matrix the model is fitted on, its target, matrix it is scored on, its target)
+Split = Tuple[object, np.ndarray, object, np.ndarray]
+
+
+def _nbytes(matrix) -> int:
+    if sparse.issparse(matrix):
+        return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+    return matrix.nbytes
+
+
+def _fit_split(preprocessor, X_fit: pd.DataFrame, y_fit: pd.Series, X_valid: pd.DataFrame, y_valid: pd.Series) -> Split:
+    fitted = clone(preprocessor).fit(X_fit, y_fit)
+    return fitted.transform(X_fit), y_fit.to_numpy(), fitted.transform(X_valid), y_valid.to_numpy()
+
+
+class FeatureMatrices:
+    """
+    The model features of one train/test split: a preprocessor fitted once on
+    the training rows and the matrices it produced. CV folds and holdout
+    splits of the training rows are built on first use, each with its own
+    preprocessor fitted once, and kept for every candidate and trial.
+    """
+
+    def __init__(self, template, preprocessor, X_train, y_train: np.ndarray, X_test, y_test: np.ndarray,
+                 rows: Optional[Tuple[pd.DataFrame, pd.Series]] = None):
+        self.template = template
+        self.preprocessor = preprocessor
+        self.X_train, self.y_train = X_train, y_train
+        self.X_test, self.y_test = X_test, y_test
+        # untransformed training rows, which folds and holdouts are built from
+        self._rows = rows
+        self._folds: Dict[int, List[Split]] = {}
+        self._holdouts: Dict[float, Split] = {}
+
+    def folds(self, n_splits: int) -> List[Split]:
+        """The splits RandomizedSearchCV(cv=n_splits) would make of the training rows."""
+        if n_splits not in self._folds:
+            X, y = self._rows
+            self._folds[n_splits] = [
+                _fit_split(self.template, X.iloc[fit], y.iloc[fit], X.iloc[valid], y.iloc[valid])
+                for fit, valid in KFold(n_splits).split(X)
+            ]
+        return self._folds[n_splits]
+
+    def holdout(self, fraction: float) -> Split:
+        """The training rows split into leading rows and the trailing `fraction` of them."""
+        if fraction not in self._holdouts:
+            X, y = self._rows
+            split = int(len(X) * (1 - fraction))
+            self._holdouts[fraction] = _fit_split(self.template, X.iloc[:split], y.iloc[:split], X.iloc[split:], y.iloc[split:])
+        return self._holdouts[fraction]
+
+    def sample(self, rows: np.ndarray) -> "FeatureMatrices":
+        """Some of the training rows (by position), sharing the fitted preprocessor; no folds or holdouts."""
+        return FeatureMatrices(
+            self.template, self.preprocessor, self.X_train[rows], self.y_train[rows], self.X_test, self.y_test
+        )
+
+    def all_rows(self):
+        """Training and test rows in one matrix."""
+        if sparse.issparse(self.X_train):
+            return sparse.vstack([self.X_train, self.X_test], format="csr")
+        return np.vstack([self.X_train, self.X_test])
+
+    @property
+    def nbytes(self) -> int:
+        splits = [(self.X_train, self.y_train, self.X_test, self.y_test), *self._holdouts.values()]
+        for folds in self._folds.values():
+            splits.extend(folds)
+        return sum(_nbytes(part) for split in splits for part in split)
+
+
+def build_feature_matrices(preprocessor, X_train: pd.DataFrame, y_train: pd.Series,
+                           X_test: pd.DataFrame, y_test: pd.Series) -> FeatureMatrices:
+    """Fit `preprocessor` (a clone of it) on the training rows and transform both sides of the split."""
+    fitted = clone(preprocessor).fit(X_train, y_train)
+    return FeatureMatrices(
+        preprocessor, fitted,
+        fitted.transform(X_train), y_train.to_numpy(), fitted.transform(X_test), y_test.to_numpy(),
+        rows=(X_train, y_train),
+    )
+
+
+class FeatureCache:
+    """
+    Per-worker LRU of FeatureMatrices, keyed by user and split and tagged
+    with the dataset version they were built from.
+
+    Each key holds at most one version; storing a new version replaces the
+    old one. Entries are evicted least-recently-used first once their total
+    size exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = FEATURE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[str, FeatureMatrices, int]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: Optional[str]) -> Optional[FeatureMatrices]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or version is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, version: str, features: FeatureMatrices) -> None:
+        # re-put after building folds or holdouts so their size is counted
+        nbytes = features.nbytes
+        with self._lock:
+            self._discard(key)
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (version, features, nbytes)
+            self._size += nbytes
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[2]
+
+
+feature_cache = FeatureCache()
@@ -1,15 +1,88 @@
+import os
 import pandas as pd
+import numpy as np
 import io
+from importlib.util import find_spec
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Union
+from dotenv import load_dotenv
 
-def parse_uploaded_file(file_bytes: bytes, filename: str) -> pd.DataFrame:
+load_dotenv()
+
+# Reader for Excel workbooks: "calamine" (python-calamine, several times faster
+# than openpyxl), "openpyxl", "xlrd", or "auto" for calamine when it is installed
+EXCEL_ENGINE = os.getenv("EXCEL_ENGINE", "auto")
+
+Usecols = Optional[Callable[[str], bool]]
+
+def excel_engine() -> Optional[str]:
+    """The pd.read_excel engine to use; None lets pandas pick by file extension."""
+    if EXCEL_ENGINE == "auto":
+        return "calamine" if find_spec("python_calamine") is not None else None
+    return EXCEL_ENGINE
+
+def parse_excel(file: BinaryIO, sheet: Union[int, str] = 0, usecols: Usecols = None) -> pd.DataFrame:
+    """
+    One sheet of a workbook, by position or name. `usecols` is called with
+    each header and keeps only the columns it accepts, so the others are
+    never converted into a frame.
+    """
+    return pd.read_excel(file, sheet_name=sheet, usecols=usecols, engine=excel_engine())
+
+def parse_uploaded_file(file: Union[bytes, BinaryIO], filename: str, sheet: Union[int, str] = 0,
+                        usecols: Usecols = None) -> pd.DataFrame:
     try:
+        source = io.BytesIO(file) if isinstance(file, (bytes, bytearray)) else file
         if filename.endswith(".csv"):
-            df = pd.read_csv(io.BytesIO(file_bytes))
+            df = pd.read_csv(source, usecols=usecols)
         elif filename.endswith((".xlsx", ".xls")):
-            df = pd.read_excel(io.BytesIO(file_bytes))
+            df = parse_excel(source, sheet, usecols)
         else:
             raise ValueError("Unsupported file format. Only .csv, .xlsx, and .xls are allowed.")
         return df
     
     except Exception as e:
-        raise ValueError(f"Failed to parse file: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"Failed to parse file: {str(e)}")
+
+def infer_csv_dtypes(file: BinaryIO, sample_rows: int, usecols: Usecols = None) -> Dict[str, np.dtype]:
+    """Infer column dtypes from the first `sample_rows` rows, then rewind the file."""
+    start = file.tell()
+    sample = pd.read_csv(file, nrows=sample_rows, usecols=usecols)
+    file.seek(start)
+    return dict(sample.dtypes)
+
+def _align_chunk(chunk: pd.DataFrame, plan: Dict[str, np.dtype]) -> pd.DataFrame:
+    """
+    Cast a chunk to the planned dtypes. A column whose values no longer fit
+    (floats in an int column, text in a numeric one) widens the plan for
+    every later chunk, the way a whole-file read would have typed it.
+    """
+    for col in chunk.columns:
+        current = chunk[col].dtype
+        target = plan.get(col)
+        if target is None:
+            plan[col] = current
+            continue
+        if current == target:
+            continue
+        if pd.api.types.is_numeric_dtype(current) and pd.api.types.is_numeric_dtype(target) \
+                and not pd.api.types.is_bool_dtype(current) and not pd.api.types.is_bool_dtype(target):
+            plan[col] = np.result_type(current, target)
+        else:
+            plan[col] = np.dtype(object)
+        chunk[col] = chunk[col].astype(plan[col])
+    return chunk
+
+def iter_csv_chunks(file: BinaryIO, chunk_rows: int, sample_rows: int, usecols: Usecols = None) -> Iterator[pd.DataFrame]:
+    """
+    Parse a CSV file in chunks of `chunk_rows` rows with dtypes planned from a
+    sample, so memory use is bounded by the chunk size rather than the file.
+    """
+    try:
+        plan = infer_csv_dtypes(file, sample_rows, usecols)
+        # text columns in the sample stay text in every chunk
+        text_cols = {col: object for col, dtype in plan.items() if dtype == object}
+        reader = pd.read_csv(file, chunksize=chunk_rows, dtype=text_cols, usecols=usecols)
+        for chunk in reader:
+            yield _align_chunk(chunk, plan)
+    except Exception as e:
+        raise ValueError(f"Failed to parse file: {str(e)}")
@@ -0,0 +1,90 @@
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+
+def _prune_level(counts: pd.DataFrame, columns: List[str], depth: int, k: int, other_label: str) -> pd.DataFrame:
+    """Relabel all but the `k` largest nodes under each parent at `depth` as `other_label`."""
+    col = columns[depth]
+    parents = columns[:depth]
+    totals = counts.groupby(columns[:depth + 1], sort=False, dropna=False, observed=True)["value"].sum().reset_index()
+    if parents:
+        rank = totals.groupby(parents, sort=False, dropna=False, observed=True)["value"].rank(method="first", ascending=False)
+    else:
+        rank = totals["value"].rank(method="first", ascending=False)
+    pruned = totals.loc[rank > k, columns[:depth + 1]]
+    if pruned.empty:
+        return counts
+
+    marker = counts[columns[:depth + 1]].merge(pruned.assign(_pruned=True), how="left", on=columns[:depth + 1])["_pruned"]
+    counts = counts.copy()
+    counts[col] = counts[col].astype(object).where(marker.isna().to_numpy(), other_label)
+    return counts.groupby(columns, sort=False, dropna=False, observed=True)["value"].sum().reset_index()
+
+
+def _count_order(values: List[int]) -> np.ndarray:
+    """
+    Largest-first order of `values` (given in order of first appearance),
+    breaking ties exactly as `Series.value_counts` does, so leaves come out
+    as the per-node value_counts used to list them.
+    """
+    values = np.asarray(values)[::-1]
+    return np.arange(len(values))[::-1][values.argsort(kind="quicksort")][::-1]
+
+
+def build_hierarchy(df: pd.DataFrame, columns: Sequence[str], top_k: Union[None, int, Sequence[Optional[int]]] = None,
+                    other_label: str = "Other", root_id: str = "Claims") -> Dict[str, Any]:
+    """
+    Nested row counts along `columns`, e.g. Visit_Type -> Diagnosis -> Treatment,
+    as {"id", "children": [{"id", "value", "children": [...]}, ...]}.
+
+    Built from a single group-by over all the columns, so the cost is one
+    pass over the rows plus one over the distinct paths. Inner nodes keep
+    the order in which their values first appear; leaves are ordered by
+    count, largest first, the way `value_counts` orders them.
+
+    `top_k` keeps only the k largest children of every node and folds the
+    rest into one `other_label` child, placed last; give one k for every
+    level or a list with one entry (or None) per level.
+    """
+    columns = list(columns)
+    root: Dict[str, Any] = {"id": root_id, "children": []}
+    if df.empty or not columns:
+        return root
+
+    counts = df.groupby(columns, sort=False, dropna=False, observed=True).size().reset_index(name="value")
+
+    limits = top_k if isinstance(top_k, (list, tuple)) else [top_k] * len(columns)
+    for depth, k in enumerate(limits[:len(columns)]):
+        if k is not None:
+            counts = _prune_level(counts, columns, depth, k, other_label)
+
+    leaf_depth = len(columns) - 1
+    nodes: Dict[tuple, Dict[str, Any]] = {}
+    for row in counts.itertuples(index=False, name=None):
+        path, value = row[:-1], int(row[-1])
+        parent = root
+        for depth in range(len(path)):
+            node = nodes.get(path[:depth + 1])
+            if node is None:
+                node = {"id": path[depth], "value": 0}
+                if depth < leaf_depth:
+                    node["children"] = []
+                parent["children"].append(node)
+                nodes[path[:depth + 1]] = node
+            node["value"] += value
+            parent = node
+
+    def order(node: Dict[str, Any], depth: int) -> None:
+        children: List[Dict[str, Any]] = node["children"]
+        if depth == leaf_depth:
+            children[:] = [children[i] for i in _count_order([child["value"] for child in children])]
+        else:
+            for child in children:
+                order(child, depth + 1)
+        if top_k is not None:
+            children.sort(key=lambda child: child["id"] == other_label)
+
+    order(root, 0)
+    return root
@@ -0,0 +1,99 @@
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+from scipy.signal import fftconvolve
+
+# Points of the internal grid samples are binned onto before convolving
+KDE_BINS = 4096
+# Kernel support, in bandwidths either side of zero
+KDE_KERNEL_RADIUS = 6.0
+
+
+def kde_bandwidth(samples: np.ndarray, bw_method: Union[str, float] = "scott") -> float:
+    """
+    Gaussian kernel standard deviation as `scipy.stats.gaussian_kde` picks it
+    in one dimension: the sample std (ddof=1) times Scott's or Silverman's
+    factor, or times `bw_method` when it is a number.
+    """
+    n = len(samples)
+    if bw_method == "scott":
+        factor = n ** (-1 / 5)
+    elif bw_method == "silverman":
+        factor = (n * 3 / 4) ** (-1 / 5)
+    elif isinstance(bw_method, (int, float)):
+        factor = float(bw_method)
+    else:
+        raise ValueError(f"Unknown bandwidth rule: {bw_method}")
+    return float(np.std(samples, ddof=1)) * factor if n > 1 else 0.0
+
+
+def binned_kde(samples, grid, bw_method: Union[str, float] = "scott", bins: int = KDE_BINS) -> np.ndarray:
+    """
+    Gaussian KDE of `samples` evaluated at the points of `grid`.
+
+    Samples are linearly binned onto `bins` evenly spaced points spanning the
+    grid and the samples, the bin weights are convolved with the sampled
+    kernel by FFT, and the result is interpolated onto `grid`. The cost is
+    O(n + bins log bins), so it hardly grows with the number of samples.
+
+    With the default 4096 bins the result stays within 1e-3 of the peak
+    density of `scipy.stats.gaussian_kde` (same bandwidth rule) on the grid;
+    accuracy drops once the bandwidth gets close to the bin width.
+
+    Empty input gives zeros. When every sample has the same value (including
+    a single sample) there is no spread to scale the kernel by, so one bin
+    width is used, which keeps the density a narrow peak of unit mass.
+    """
+    grid = np.asarray(grid, dtype=float)
+    samples = np.asarray(samples, dtype=float)
+    samples = samples[np.isfinite(samples)]
+    if not len(samples) or not len(grid):
+        return np.zeros_like(grid)
+
+    lo = min(grid.min(), samples.min())
+    hi = max(grid.max(), samples.max())
+    bandwidth = kde_bandwidth(samples, bw_method)
+    if hi == lo:
+        # everything sits on one point; widen the span so bins have a width
+        lo, hi = lo - 1.0, hi + 1.0
+    step = (hi - lo) / (bins - 1)
+    if bandwidth <= 0:
+        bandwidth = step
+
+    # linear binning: each sample splits its weight between the two nearest bins
+    position = (samples - lo) / step
+    left = np.clip(np.floor(position).astype(np.int64), 0, bins - 2)
+    right_weight = position - left
+    weights = np.bincount(left, weights=1 - right_weight, minlength=bins) \
+        + np.bincount(left + 1, weights=right_weight, minlength=bins)
+
+    radius = int(min(np.ceil(KDE_KERNEL_RADIUS * bandwidth / step), bins - 1))
+    offsets = np.arange(-radius, radius + 1) * step / bandwidth
+    kernel = np.exp(-0.5 * offsets ** 2) / (np.sqrt(2 * np.pi) * bandwidth)
+
+    density = fftconvolve(weights, kernel, mode="same") / len(samples)
+    # FFT round-off can leave tiny negatives where the density is ~0
+    density = np.clip(density, 0, None)
+    return np.interp(grid, lo + np.arange(bins) * step, density)
+
+
+def group_densities(values, groups, tiers: Optional[Iterable] = None, grid_size: int = 200,
+                    bw_method: Union[str, float] = "scott") -> Tuple[np.ndarray, Dict]:
+    """
+    Density of `values` within each group on one shared grid spanning all
+    values. `tiers` picks and orders the groups (default: every group, in
+    order of appearance); a tier with no values gets zeros.
+    """
+    values = np.asarray(values, dtype=float)
+    groups = np.asarray(groups, dtype=object)
+    if tiers is None:
+        tiers = list(dict.fromkeys(groups.tolist()))
+
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return np.zeros(0), {tier: np.zeros(0) for tier in tiers}
+
+    grid = np.linspace(finite.min(), finite.max(), grid_size)
+    return grid, {
+        tier: binned_kde(values[groups == tier], grid, bw_method=bw_method) for tier in tiers
+    }
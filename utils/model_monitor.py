@@ -1,45 +1,160 @@
+import os
+import warnings
+from typing import Any, Dict, List
+
 import numpy as np
-from datetime import datetime
-from scipy.stats import ks_2samp
-
-class ModelMonitor:
-    """Class for monitoring model performance and data drift"""
-    def __init__(self):
-        self.performance_history = []
-        self.data_drift_scores = []
-        self.training_date = datetime.now()
-        
-    def log_performance(self, model_name, metrics):
-        """Log model performance metrics"""
-        self.performance_history.append({
-            'timestamp': datetime.now(),
-            'model': model_name,
-            **metrics
-        })
-        
-    def check_data_drift(self, current_data, reference_data):
-        """Calculate data drift metrics"""
-        drift_metrics = {}
-        
-        # For numerical columns
-        num_cols = current_data.select_dtypes(include=['float64', 'int64']).columns
-        for col in num_cols:
-            # Kolmogorov-Smirnov test
-            stat, p = ks_2samp(reference_data[col].dropna(), current_data[col].dropna())
-            drift_metrics[col] = {'ks_stat': stat, 'ks_p': p}
-        
-        # For categorical columns
-        cat_cols = current_data.select_dtypes(include=['object', 'category']).columns
-        for col in cat_cols:
-            # Population Stability Index
-            ref_counts = reference_data[col].value_counts(normalize=True)
-            curr_counts = current_data[col].value_counts(normalize=True)
-            psi = np.sum((curr_counts - ref_counts) * np.log(curr_counts / ref_counts))
-            drift_metrics[col] = {'psi': psi}
-        
-        self.data_drift_scores.append({
-            'timestamp': datetime.now(),
-            'drift_metrics': drift_metrics
-        })
-
-        return drift_metrics
\ No newline at end of file
+import pandas as pd
+from dotenv import load_dotenv
+from scipy.special import kolmogorov
+
+load_dotenv()
+
+# Quantile bins in the reference sketch of a numeric feature
+DRIFT_BINS = int(os.getenv("DRIFT_BINS", 20))
+# Most frequent categories kept per categorical feature; the rest are pooled
+DRIFT_MAX_CATEGORIES = int(os.getenv("DRIFT_MAX_CATEGORIES", 50))
+# PSI above which a feature counts as drifted
+DRIFT_PSI_THRESHOLD = float(os.getenv("DRIFT_PSI_THRESHOLD", 0.2))
+
+# Rows binned per step; bounds the (rows x columns x edges) comparison
+_CHUNK_ROWS = 65_536
+# Floor on bin shares so that empty bins keep the PSI finite
+_PSI_EPSILON = 1e-4
+
+
+def _numeric_matrix(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    return np.column_stack([pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float) for col in columns])
+
+
+def _bin_counts(values: np.ndarray, inner_edges: np.ndarray) -> np.ndarray:
+    """
+    Histogram every column of `values` (rows x columns) over its own inner
+    bin edges (columns x bins-1) in one pass. Returns counts of shape
+    (columns, bins + 1); the last bin counts missing values.
+    """
+    n_cols, n_bins = inner_edges.shape[0], inner_edges.shape[1] + 1
+    offsets = np.arange(n_cols) * (n_bins + 1)
+    counts = np.zeros(n_cols * (n_bins + 1), dtype=np.int64)
+    for start in range(0, len(values), _CHUNK_ROWS):
+        chunk = values[start:start + _CHUNK_ROWS]
+        bins = (chunk[:, :, None] > inner_edges[None, :, :]).sum(axis=2)
+        bins[np.isnan(chunk)] = n_bins
+        counts += np.bincount((bins + offsets).ravel(), minlength=len(counts))
+    return counts.reshape(n_cols, n_bins + 1)
+
+
+def _category_values(series: pd.Series) -> pd.Series:
+    return series.astype("string")
+
+
+def _category_counts(series: pd.Series, categories: List[str]) -> np.ndarray:
+    """Counts over `categories`, then every other value, then missing values."""
+    values = _category_values(series)
+    codes = pd.Categorical(values, categories=categories).codes.astype(np.int64)
+    codes[codes < 0] = len(categories)
+    codes[values.isna().to_numpy()] = len(categories) + 1
+    return np.bincount(codes, minlength=len(categories) + 2)
+
+
+def _psi(reference: np.ndarray, current: np.ndarray) -> np.ndarray:
+    """Population stability index of each row of two share matrices."""
+    reference = np.maximum(reference, _PSI_EPSILON)
+    current = np.maximum(current, _PSI_EPSILON)
+    return np.sum((current - reference) * np.log(current / reference), axis=-1)
+
+
+def _shares(counts: np.ndarray) -> np.ndarray:
+    totals = counts.sum(axis=-1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(totals > 0, counts / np.maximum(totals, 1), 0.0)
+
+
+def build_reference_profile(df: pd.DataFrame, numeric_columns: List[str], categorical_columns: List[str],
+                            bins: int = DRIFT_BINS, max_categories: int = DRIFT_MAX_CATEGORIES) -> Dict[str, Any]:
+    """
+    Compact, JSON-serialisable summary of the rows a model was trained on:
+    quantile bin edges and bin counts per numeric feature, frequency
+    tables of the most common categories per categorical feature.
+    """
+    numeric_columns = [col for col in numeric_columns if col in df.columns]
+    categorical_columns = [col for col in categorical_columns if col in df.columns]
+    profile: Dict[str, Any] = {"rows": len(df), "numeric": None, "categorical": {}}
+
+    if numeric_columns:
+        values = _numeric_matrix(df, numeric_columns)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            inner_edges = np.nanquantile(values, np.arange(1, bins) / bins, axis=0).T
+        # all-missing columns have no quantiles; their rows all land in the missing bin anyway
+        inner_edges = np.nan_to_num(inner_edges, nan=0.0)
+        profile["numeric"] = {
+            "columns": numeric_columns,
+            "edges": inner_edges.tolist(),
+            "counts": _bin_counts(values, inner_edges).tolist(),
+        }
+
+    for col in categorical_columns:
+        frequencies = _category_values(df[col]).value_counts()
+        categories = [str(category) for category in frequencies.index[:max_categories]]
+        profile["categorical"][col] = {
+            "categories": categories,
+            "counts": _category_counts(df[col], categories).tolist(),
+        }
+    return profile
+
+
+def check_data_drift(current_data: pd.DataFrame, profile: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Drift of `current_data` against a reference profile, per feature.
+    Numeric features get the KS statistic between the binned distributions
+    (exact at the bin edges, so a lower bound on the sample KS) with its
+    asymptotic p-value, and the PSI over the bins plus a missing-value bin.
+    Categorical features get the PSI over the reference categories, the
+    pooled rest and missing values, and the share of values outside the
+    reference's categories.
+    Features absent from `current_data` are skipped.
+    """
+    drift_metrics: Dict[str, Dict[str, Any]] = {}
+
+    numeric = profile.get("numeric")
+    if numeric:
+        present = [i for i, col in enumerate(numeric["columns"]) if col in current_data.columns]
+        if present:
+            columns = [numeric["columns"][i] for i in present]
+            inner_edges = np.asarray(numeric["edges"], dtype=float)[present]
+            ref_counts = np.asarray(numeric["counts"], dtype=float)[present]
+            cur_counts = _bin_counts(_numeric_matrix(current_data, columns), inner_edges).astype(float)
+
+            psi = _psi(_shares(ref_counts), _shares(cur_counts))
+            # KS on the non-missing values only
+            ref_n, cur_n = ref_counts[:, :-1].sum(axis=1), cur_counts[:, :-1].sum(axis=1)
+            ref_cdf = np.cumsum(_shares(ref_counts[:, :-1]), axis=1)
+            cur_cdf = np.cumsum(_shares(cur_counts[:, :-1]), axis=1)
+            ks_stat = np.abs(ref_cdf - cur_cdf).max(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                effective_n = ref_n * cur_n / (ref_n + cur_n)
+                ks_p = np.where(effective_n > 0, kolmogorov(ks_stat * np.sqrt(effective_n)), np.nan)
+            missing = _shares(cur_counts)[:, -1]
+
+            for i, col in enumerate(columns):
+                drift_metrics[col] = {
+                    "ks_stat": float(ks_stat[i]),
+                    "ks_p": None if np.isnan(ks_p[i]) else float(ks_p[i]),
+                    "psi": float(psi[i]),
+                    "missing_rate": float(missing[i]),
+                }
+
+    for col, table in profile.get("categorical", {}).items():
+        if col not in current_data.columns:
+            continue
+        ref_shares = _shares(np.asarray(table["counts"], dtype=float))
+        cur_shares = _shares(_category_counts(current_data[col], table["categories"]).astype(float))
+        drift_metrics[col] = {
+            "psi": float(_psi(ref_shares, cur_shares)),
+            "other_rate": float(cur_shares[-2]),
+            "missing_rate": float(cur_shares[-1]),
+        }
+
+    for metrics in drift_metrics.values():
+        metrics["drifted"] = metrics["psi"] > DRIFT_PSI_THRESHOLD
+    return drift_metrics
@@ -0,0 +1,72 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from joblib.externals.loky import ProcessPoolExecutor
+
+load_dotenv()
+
+# Cores one training run may use, shared by its candidate models and their
+# CV folds. 0 trains candidates one after another with library defaults.
+TRAINING_CORE_BUDGET = int(os.getenv("TRAINING_CORE_BUDGET", 0))
+# Upper bound on a per-request core budget
+TRAINING_MAX_CORES = int(os.getenv("TRAINING_MAX_CORES", os.cpu_count() or 1))
+# How often (seconds) a parallel run reports while its candidates train
+TRAINING_POLL_INTERVAL = float(os.getenv("TRAINING_POLL_INTERVAL", 1.0))
+# Candidate pruning: share of the training rows a probe fit uses, and how far
+# (in R²) a probe may trail the best one before its candidate is skipped
+TRAINING_PROBE_FRACTION = float(os.getenv("TRAINING_PROBE_FRACTION", 0.2))
+TRAINING_PRUNE_MARGIN = float(os.getenv("TRAINING_PRUNE_MARGIN", 0.1))
+
+# Native thread pools (BLAS, OpenMP) a worker would otherwise size to the whole machine
+THREAD_LIMIT_VARS = [
+    "OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS",
+]
+
+
+def resolve_core_budget(requested: Optional[int] = None) -> int:
+    """The request's core budget, or TRAINING_CORE_BUDGET, capped at TRAINING_MAX_CORES."""
+    budget = TRAINING_CORE_BUDGET if requested is None else requested
+    return max(0, min(budget, TRAINING_MAX_CORES))
+
+
+def plan_cores(budget: int, candidates: int) -> Tuple[int, Optional[int]]:
+    """
+    Split `budget` cores into (candidates trained at once, cores for each).
+    Without a budget candidates run one at a time and estimators keep their
+    own threading defaults (None).
+    """
+    if budget <= 0 or candidates <= 0:
+        return 1, None
+    workers = min(budget, candidates)
+    return workers, max(1, budget // workers)
+
+
+def run_parallel(fn: Callable[..., Any], tasks: Dict[str, Dict[str, Any]], workers: int, threads: int,
+                 on_wait: Optional[Callable[[List[str]], None]] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Run `fn(**kwargs)` for every named task on `workers` fresh processes, each
+    with its native thread pools limited to `threads`, and yield
+    (name, result) as each task finishes.
+
+    While tasks are running, `on_wait` gets the names still running every
+    TRAINING_POLL_INTERVAL seconds. If it raises, if a task fails, or if the
+    caller stops iterating, the workers are killed and the error propagates.
+    """
+    env = {var: str(threads) for var in THREAD_LIMIT_VARS}
+    executor = ProcessPoolExecutor(max_workers=workers, env=env)
+    finished = False
+    try:
+        futures = {executor.submit(fn, **kwargs): name for name, kwargs in tasks.items()}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=TRAINING_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield futures[future], future.result()
+            if pending and on_wait is not None:
+                on_wait(sorted(futures[future] for future in pending))
+        finished = True
+    finally:
+        executor.shutdown(wait=finished, kill_workers=not finished)
@@ -0,0 +1,140 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# A dated series is reduced once to additive per-day partials: the rows on
+# each day, and the count, sum and sum of squares of its non-missing values.
+# Weekly, monthly and quarterly totals, means and standard deviations all
+# follow by summing partials, so they never need the rows again, and the
+# partials of appended rows merge into the existing ones.
+#
+# Partials are plain lists keyed by field, with days as days since
+# 1970-01-01, so they JSON-encode as they are.
+
+PARTIAL_FIELDS = ["rows", "count", "sum", "sumsq"]
+ROLLUP_PERIODS = ["daily", "weekly", "monthly", "quarterly"]
+# Months per calendar period; daily and weekly go by days
+_PERIOD_MONTHS = {"monthly": 1, "quarterly": 3}
+
+
+def _reduce(days: np.ndarray, columns: Dict[str, np.ndarray]) -> Dict[str, list]:
+    day, inverse = np.unique(days, return_inverse=True)
+    reduced: Dict[str, list] = {"day": day.tolist()}
+    for field, values in columns.items():
+        total = np.bincount(inverse, weights=values, minlength=len(day))
+        reduced[field] = total.astype(np.int64).tolist() if field in ("rows", "count") else total.tolist()
+    return reduced
+
+
+def daily_partials(dates, values=None) -> Dict[str, list]:
+    """
+    Per-day partials of `values` (NaN = missing) by the calendar day of
+    `dates`; rows without a date are left out. Without `values` only the
+    row counts are meaningful.
+    """
+    days = np.asarray(dates, dtype="datetime64[D]")
+    dated = ~np.isnat(days)
+    days = days[dated].astype(np.int64)
+    if values is None:
+        values = np.full(len(days), np.nan)
+    else:
+        values = np.asarray(values, dtype=float)[dated]
+
+    known = ~np.isnan(values)
+    amounts = np.where(known, values, 0.0)
+    return _reduce(days, {
+        "rows": np.ones(len(days)),
+        "count": known.astype(float),
+        "sum": amounts,
+        "sumsq": amounts * amounts,
+    })
+
+
+def merge_partials(*partials: Dict[str, list]) -> Dict[str, list]:
+    """Partials of the union of the rows behind each of `partials`."""
+    days = np.concatenate([np.asarray(p["day"], dtype=np.int64) for p in partials])
+    return _reduce(days, {
+        field: np.concatenate([np.asarray(p[field], dtype=float) for p in partials])
+        for field in PARTIAL_FIELDS
+    })
+
+
+def weekdays(partials: Dict[str, list]) -> np.ndarray:
+    """Day of the week of every partial, Monday = 0."""
+    # 1970-01-01 was a Thursday
+    return (np.asarray(partials["day"], dtype=np.int64) + 3) % 7
+
+
+def period_starts(days: np.ndarray, period: str) -> np.ndarray:
+    """First day (datetime64[D]) of the daily/weekly/monthly/quarterly period holding each of `days`."""
+    dates = np.asarray(days, dtype=np.int64).astype("datetime64[D]")
+    if period == "daily":
+        return dates
+    if period == "weekly":
+        return dates - ((np.asarray(days, dtype=np.int64) + 3) % 7).astype("timedelta64[D]")
+    if period in _PERIOD_MONTHS:
+        months = dates.astype("datetime64[M]").astype(np.int64)
+        months -= months % _PERIOD_MONTHS[period]
+        return months.astype("datetime64[M]").astype("datetime64[D]")
+    raise ValueError(f"Invalid period. Use one of: {', '.join(ROLLUP_PERIODS)}.")
+
+
+def period_ends(starts: np.ndarray, period: str) -> np.ndarray:
+    """Last day of each period starting on `starts`."""
+    if period in _PERIOD_MONTHS:
+        following = starts.astype("datetime64[M]") + _PERIOD_MONTHS[period]
+        return following.astype("datetime64[D]") - 1
+    return starts + (6 if period == "weekly" else 0)
+
+
+def _period_range(first: np.datetime64, last: np.datetime64, period: str) -> np.ndarray:
+    if period in _PERIOD_MONTHS:
+        months = np.arange(first.astype("datetime64[M]"), last.astype("datetime64[M]") + 1, _PERIOD_MONTHS[period])
+        return months.astype("datetime64[D]")
+    return np.arange(first, last + 1, 7 if period == "weekly" else 1)
+
+
+def rollup(partials: Dict[str, list], period: str, fill: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Sum the partials per period. `start` holds the first day of every period
+    with rows, in order, or with `fill` of every period from the first to the
+    last (empty ones summing to zero), as `DataFrame.resample` lays them out.
+    """
+    starts = period_starts(partials["day"], period)
+    if fill and len(starts):
+        periods = _period_range(starts.min(), starts.max(), period)
+    else:
+        periods = np.unique(starts)
+    index = np.searchsorted(periods, starts)
+
+    rolled = {"start": periods}
+    for field in PARTIAL_FIELDS:
+        total = np.bincount(index, weights=np.asarray(partials[field], dtype=float), minlength=len(periods))
+        rolled[field] = total.astype(np.int64) if field in ("rows", "count") else total
+    return rolled
+
+
+def mean_std(rolled: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mean and sample standard deviation (ddof=1) from summed partials; NaN
+    where there are too few values, as pandas gives. The variance comes from
+    the sum of squares, so expect agreement with a two-pass std to roughly
+    1e-12 relative unless the spread is tiny next to the mean.
+    """
+    count = rolled["count"].astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = rolled["sum"] / count
+        var = (rolled["sumsq"] - rolled["sum"] * mean) / (count - 1)
+    std = np.sqrt(np.clip(var, 0, None))
+    std[count < 2] = np.nan
+    return mean, std
+
+
+def period_labels(starts: np.ndarray, period: str) -> List[str]:
+    """'2024-03-04' for days and weeks (by start), '2024-03' for months, '2024-Q1' for quarters."""
+    if period == "monthly":
+        return np.datetime_as_string(starts, unit="M").tolist()
+    if period == "quarterly":
+        months = starts.astype("datetime64[M]").astype(np.int64)
+        return [f"{1970 + m // 12}-Q{m % 12 // 3 + 1}" for m in months.tolist()]
+    return np.datetime_as_string(starts, unit="D").tolist()
@@ -1,12 +1,9 @@
 from sklearn.ensemble import IsolationForest
 import numpy as np
 
-def train_fraud_model(X, y, preprocessor):
-    """Train isolation forest for fraud detection"""
+def train_fraud_model(X_transformed):
+    """Train isolation forest for fraud detection on preprocessed features; returns (model, score threshold), or (None, None)"""
     try:
-        # Use preprocessor to transform data
-        X_transformed = preprocessor.transform(X)
-        
         # Train isolation forest
         fraud_model = IsolationForest(
             n_estimators=100,
@@ -18,6 +15,8 @@ def train_fraud_model(X, y, preprocessor):
         # Set dynamic threshold based on claim amounts
         scores = fraud_model.decision_function(X_transformed)
         fraud_threshold = np.percentile(scores, 1)
+        return fraud_model, float(fraud_threshold)
         
     except Exception as e:
-        print(str(e))
\ No newline at end of file
+        print(str(e))
+        return None, None
\ No newline at end of file
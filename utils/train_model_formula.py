@@ -1,21 +1,178 @@
 from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
-from sklearn.model_selection import train_test_split, RandomizedSearchCV
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, ParameterSampler
 from sklearn.neural_network import MLPRegressor
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import mean_absolute_error, r2_score, mean_squared_error
 import xgboost as xgb
 import pandas as pd
 import numpy as np
-import optuna
 from utils.preprocess_data import preprocess_data
 from utils.calculate_feature_importance import calculate_feature_importance
 from utils.train_fraud_model import train_fraud_model
 from datetime import datetime
-import traceback
-from utils.model_monitor import ModelMonitor
+import logging
+from utils.model_monitor import build_reference_profile
+from utils.parallel_training import TRAINING_PROBE_FRACTION, TRAINING_PRUNE_MARGIN, plan_cores, resolve_core_budget, run_parallel
+from utils.xgboost_tuning import TUNING_VALIDATION_FRACTION, tune_xgboost, xgboost_study_name
+from utils.feature_matrix import build_feature_matrices, feature_cache
+from joblib import Parallel, delayed, parallel_config
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+def _fold_mae(model, params, X_fit, y_fit, X_valid, y_valid):
+    try:
+        estimator = clone(model).set_params(**params)
+        estimator.fit(X_fit, y_fit)
+        return mean_absolute_error(y_valid, estimator.predict(X_valid))
+    except Exception:
+        # a failed fit scores NaN, as RandomizedSearchCV's error_score does
+        logger.exception("Fit failed for parameters %s", params)
+        return np.nan
+
+def randomized_search(model, param_grid, folds, n_iter, n_jobs=None, report=None):
+    """
+    RandomizedSearchCV on pre-transformed folds: the same sampled parameters
+    and fold splits, but each fold's preprocessor was fitted once rather
+    than once per trial. Returns the estimator parameters (without the
+    `regressor__` prefix) with the lowest mean MAE; `report` gets the number
+    of trials scored so far.
+    """
+    trials = [
+        {key.split('__', 1)[1]: value for key, value in params.items()}
+        for params in ParameterSampler(param_grid, n_iter, random_state=42)
+    ]
+    fits = (delayed(_fold_mae)(model, params, *fold) for params in trials for fold in folds)
+    maes = np.empty(len(trials) * len(folds))
+    # parallel fold workers get one native thread each, so n_jobs is all they use
+    with parallel_config(backend='loky', inner_max_num_threads=1) if n_jobs is not None and n_jobs > 1 else nullcontext():
+        for index, mae in enumerate(Parallel(n_jobs=n_jobs, return_as='generator')(fits), start=1):
+            maes[index - 1] = mae
+            if index % len(folds) == 0 and report is not None:
+                report(index // len(folds))
+
+    mean_maes = maes.reshape(len(trials), len(folds)).mean(axis=1)
+    if np.isnan(mean_maes).all():
+        raise ValueError("Every hyperparameter candidate failed to fit")
+    return trials[int(np.nanargmin(mean_maes))]
+
+def fit_candidate(name, model, param_grid, features, enable_hyperparameter_tuning, max_iter, cross_validation_folds,
+                  n_jobs=None, report=None, study_name=None):
+    """
+    Tune (if enabled), fit and evaluate one candidate model on the split's
+    FeatureMatrices. Returns its metrics row and fitted pipeline, which
+    shares the split's fitted preprocessor.
+
+    `n_jobs` cores go to the CV folds while tuning and to the estimator's
+    own threads (where it has `n_jobs`) otherwise; None keeps library
+    defaults. `report`, if given, gets stage and trial progress. XGBoost's
+    Optuna study is kept (and resumed) under `study_name` when given.
+    """
+    def report_stage(**progress):
+        if report is not None:
+            report(**progress)
+
+    total_trials = max_iter if enable_hyperparameter_tuning else 0
+    threaded = n_jobs is not None and 'n_jobs' in model.get_params()
+
+    # Hyperparameter tuning if enabled
+    if enable_hyperparameter_tuning and param_grid is not None:
+        if name == 'XGBoost':
+            # Special handling for XGBoost with Optuna
+            best_params = tune_xgboost(
+                model, *features.holdout(TUNING_VALIDATION_FRACTION), max_iter,
+                study_name=study_name, n_jobs=n_jobs,
+                report=lambda trial: report_stage(stage='tuning', trial=trial),
+            )
+        else:
+            if threaded:
+                # the folds already share the cores; one thread per fold fit
+                model.set_params(n_jobs=1)
+            best_params = randomized_search(
+                model, param_grid, features.folds(cross_validation_folds), max_iter, n_jobs=n_jobs,
+                report=lambda trial: report_stage(stage='tuning', trial=trial),
+            )
+        model.set_params(**best_params)
+
+    # Train model
+    report_stage(stage='fitting', trial=total_trials)
+    if threaded:
+        model.set_params(n_jobs=n_jobs)
+    model.fit(features.X_train, features.y_train)
+
+    # Evaluate
+    y_pred = model.predict(features.X_test)
+    mae = mean_absolute_error(features.y_test, y_pred)
+    rmse = np.sqrt(mean_squared_error(features.y_test, y_pred))
+    r2 = r2_score(features.y_test, y_pred)
+
+    pipeline = Pipeline([
+        ('preprocessor', features.preprocessor),
+        ('regressor', model)
+    ])
+    return {
+        'Model': name,
+        'MAE': mae,
+        'RMSE': rmse,
+        'R2': r2
+    }, pipeline
+
+def _fit_candidates(candidates, budget, report, total_trials=0):
+    """
+    Fit the candidates within `budget` cores, yielding (name, (row, pipeline))
+    as each finishes: one at a time in this process when the budget allows
+    only one, otherwise concurrently on worker processes.
+    """
+    workers, threads = plan_cores(budget, len(candidates))
+    total = {'total_candidates': len(candidates), 'total_trials': total_trials}
+
+    if workers == 1:
+        for candidate_index, (name, args) in enumerate(candidates.items(), start=1):
+            candidate = {'candidate': name, 'candidate_index': candidate_index, **total}
+            report(stage='training', trial=0, **candidate)
+            yield name, fit_candidate(
+                **args, n_jobs=threads, report=lambda **progress: report(**progress, **candidate)
+            )
+        return
+
+    # progress arrives per finished candidate; the heartbeat keeps cancellation responsive
+    report(stage='training', trial=0, candidate=None, candidate_index=0, running=list(candidates), **total)
+    finished = run_parallel(
+        fit_candidate,
+        {name: {**args, 'n_jobs': threads} for name, args in candidates.items()},
+        workers, threads,
+        on_wait=lambda running: report(stage='training', running=running, **total),
+    )
+    for candidate_index, (name, result) in enumerate(finished, start=1):
+        report(stage='training', trial=total_trials, candidate=name, candidate_index=candidate_index, **total)
+        yield name, result
+
+def train_model_formula(model_algorithm, target_variable, test_set_size, cross_validation_folds, enable_hyperparameter_tuning, max_iter, records, progress_callback=None, return_model=False, core_budget=None, prune_candidates=False, dataset_scope=None):
+    """
+    Enhanced model training with multiple algorithms.
+
+    `progress_callback`, if given, is called with a dict describing the current
+    stage, candidate model and tuning trial; an exception raised from it
+    aborts the run.
+
+    `core_budget` cores (default TRAINING_CORE_BUDGET) are shared by
+    the candidates, which then train concurrently, and their CV folds. With
+    `prune_candidates`, candidates whose quick fit on a sample trails the
+    best by more than TRAINING_PRUNE_MARGIN R² are skipped.
+
+    `dataset_scope`, a (user_id, dataset_version) pair, keys the per-worker
+    cache of feature matrices and names the persistent XGBoost tuning study,
+    so repeated runs on the same data reuse both.
+
+    With `return_model`, returns (results, artifacts): the fitted pipeline,
+    fraud model and feature importances along with the metrics, ready for
+    the model registry.
+    """
+    def report(**progress):
+        if progress_callback is not None:
+            progress_callback(progress)
 
-def train_model_formula(model_algorithm, target_variable, test_set_size, cross_validation_folds, enable_hyperparameter_tuning, max_iter, records):
-    """Enhanced model training with multiple algorithms"""
     try:
         X, y, preprocessor, required_prediction_columns = preprocess_data(target_variable, records)
 
@@ -53,12 +210,11 @@ def train_model_formula(model_algorithm, target_variable, test_set_size, cross_v
             }
     
         if model_algorithm == "XGBoost" or model_algorithm == "Auto Select Best":
-            models['XGBoost'] = xgb.XGBRegressor(random_state=42)
+            models['XGBoost'] = xgb.XGBRegressor(random_state=42, tree_method='hist')
             param_grids['XGBoost'] = {
                 'regressor__n_estimators': [50, 100, 200],
                 'regressor__max_depth': [3, 5, 7],
-                'regressor__learning_rate': [0.01, 0.05, 0.1],
-                'regressor__tree_method': ['gpu_hist']  # Enable GPU acceleration
+                'regressor__learning_rate': [0.01, 0.05, 0.1]
             }
     
         if model_algorithm == "Neural Network" or model_algorithm == "Auto Select Best":
@@ -69,86 +225,78 @@ def train_model_formula(model_algorithm, target_variable, test_set_size, cross_v
                 'regressor__solver': ['adam', 'sgd']
             }
 
+        missing_cols = set(required_prediction_columns) - set(X_test.columns)
+        if missing_cols:
+            raise ValueError(f"❗ X_test is missing required columns: {missing_cols}")
+
         # Train and evaluate each model
         results = []
         best_model = None
         best_score = -np.inf
-    
-        for name, model in models.items():
-            # Create pipeline
-            pipeline = Pipeline([
-                ('preprocessor', preprocessor),
-                ('regressor', model)
-            ])
-        
-            # Hyperparameter tuning if enabled
-            if enable_hyperparameter_tuning and name in param_grids:
-                if name == 'XGBoost':
-                    # Special handling for XGBoost with Optuna
-                    def objective(trial):
-                        params = {
-                            'regressor__n_estimators': trial.suggest_int('regressor__n_estimators', 50, 500),
-                            'regressor__max_depth': trial.suggest_int('regressor__max_depth', 3, 10),
-                            'regressor__learning_rate': trial.suggest_float('regressor__learning_rate', 0.001, 0.1, log=True),
-                            'regressor__subsample': trial.suggest_float('regressor__subsample', 0.5, 1.0),
-                            'regressor__colsample_bytree': trial.suggest_float('regressor__colsample_bytree', 0.5, 1.0)
-                        }
-                        pipeline.set_params(**params)
-                        pipeline.fit(X_train, y_train)
-                        return mean_absolute_error(y_test, pipeline.predict(X_test))
-                
-                    study = optuna.create_study(direction='minimize')
-                    study.optimize(objective, n_trials=max_iter)
-                    best_params = study.best_params
-                    pipeline.set_params(**best_params)
-                else:
-                    # Standard RandomizedSearchCV for other models
-                    search = RandomizedSearchCV(
-                        pipeline, 
-                        param_grids[name], 
-                        n_iter=max_iter, 
-                        cv=cross_validation_folds,
-                        scoring='neg_mean_absolute_error', 
-                        random_state=42
-                    )
-                    
-                    try:
-                        # attempt to fit your search (GridSearchCV, RandomizedSearchCV, etc.)
-                        search.fit(X_train, y_train)
-                    except Exception as e:
-                        # print full traceback for more context
-                        traceback.print_exc()
-
-                    pipeline = search.best_estimator_
-                    # self.logger.info(f"Best params for {name}: {search.best_params_}")
-        
-            # Train model
-            pipeline.fit(X_train, y_train)
-            
-            missing_cols = set(required_prediction_columns) - set(X_test.columns)
-            if missing_cols:
-                raise ValueError(f"❗ X_test is missing required columns: {missing_cols}")
-                
-            # Evaluate
-            try:
-                y_pred = pipeline.predict(X_test)
-            except Exception as e:
-                traceback.print_exc()
-                
-            mae = mean_absolute_error(y_test, y_pred)
-            rmse = np.sqrt(mean_squared_error(y_test, y_pred))
-            r2 = r2_score(y_test, y_pred)
-
-            results.append({
-                'Model': name,
-                'MAE': mae,
-                'RMSE': rmse,
-                'R2': r2
-            })
+
+        total_trials = max_iter if enable_hyperparameter_tuning else 0
+        budget = resolve_core_budget(core_budget)
+        study_name = None
+        if dataset_scope is not None and all(dataset_scope):
+            study_name = xgboost_study_name(*dataset_scope, target_variable, test_set_size)
+
+        # Fit the preprocessor once per split and fold; every candidate and trial shares the matrices
+        user_id, dataset_version = dataset_scope or (None, None)
+        feature_key = (user_id, target_variable, test_set_size)
+        features = feature_cache.get(feature_key, dataset_version)
+        if features is None:
+            report(stage='preprocessing')
+            features = build_feature_matrices(preprocessor, X_train, y_train, X_test, y_test)
+        if enable_hyperparameter_tuning:
+            # built here, not in the candidates, so that candidates on worker processes share them
+            if 'XGBoost' in models:
+                features.holdout(TUNING_VALIDATION_FRACTION)
+            if any(name != 'XGBoost' for name in models):
+                features.folds(cross_validation_folds)
+        if dataset_version:
+            feature_cache.put(feature_key, dataset_version, features)
+
+        candidates = {
+            name: {
+                'name': name,
+                'model': model,
+                'param_grid': param_grids.get(name),
+                'features': features,
+                'enable_hyperparameter_tuning': enable_hyperparameter_tuning,
+                'max_iter': max_iter,
+                'cross_validation_folds': cross_validation_folds,
+                'study_name': study_name,
+            }
+            for name, model in models.items()
+        }
+
+        # Skip candidates whose quick untuned fit on a sample trails the best one
+        skipped = []
+        if prune_candidates and len(candidates) > 1:
+            report(stage='probing', total_candidates=len(candidates))
+            n_train = len(features.y_train)
+            probe_rows = min(n_train, max(int(n_train * TRAINING_PROBE_FRACTION), 500))
+            probe = features.sample(np.random.default_rng(42).choice(n_train, probe_rows, replace=False))
+            probes = {
+                name: {**args, 'model': clone(args['model']), 'features': probe, 'enable_hyperparameter_tuning': False}
+                for name, args in candidates.items()
+            }
+            probed = _fit_candidates(probes, budget, lambda **progress: report(**{**progress, 'stage': 'probing'}))
+            probe_scores = {name: row['R2'] for name, (row, _) in probed}
+            cutoff = max(probe_scores.values()) - TRAINING_PRUNE_MARGIN
+            skipped = [name for name in candidates if not probe_scores[name] >= cutoff]
+            for name in skipped:
+                del candidates[name]
+
+        # candidates may finish in any order; rank them in the order they were listed
+        fitted = dict(_fit_candidates(candidates, budget, report, total_trials))
+        for name in candidates:
+            row, pipeline = fitted[name]
+            results.append(row)
         
             # Track best model
-            if r2 > best_score:
-                best_score = r2
+            if row['R2'] > best_score:
+                best_score = row['R2']
                 best_model = pipeline
 
         # Create results DataFrame
@@ -165,31 +313,43 @@ def train_model_formula(model_algorithm, target_variable, test_set_size, cross_v
             # For single model selection, use the last trained pipeline
             model = pipeline
             baseline_metrics = {
-                'MAE': mae,
-                'RMSE': rmse,
-                'R2': r2
+                'MAE': row['MAE'],
+                'RMSE': row['RMSE'],
+                'R2': row['R2']
             }
         
         # Calculate feature importance
-        calculate_feature_importance(model)
+        report(stage='finalizing')
+        feature_importance = calculate_feature_importance(model)
         
-        # Train fraud detection model
-        train_fraud_model(X, y, preprocessor)
+        # Train fraud detection model on the split's feature matrices
+        fraud_model, fraud_threshold = train_fraud_model(features.all_rows())
 
-        # Log model performance
-        monitor = ModelMonitor()
-        monitor.log_performance(
-            model_algorithm,
-            {'MAE': mae, 'RMSE': rmse, 'R2': r2}
-        )
+        # Summarise the training rows for drift checks on later data
+        feature_kinds = {kind: columns for kind, _, columns in preprocessor.transformers}
+        reference_profile = build_reference_profile(X_train, feature_kinds['num'], feature_kinds['cat'])
 
         # Set training date
         training_date = datetime.now()
-    
+
+        if return_model:
+            return results_df, {
+                'pipeline': model,
+                'model': results_df.iloc[0]['Model'] if model_algorithm == "Auto Select Best" else row['Model'],
+                'target_variable': target_variable,
+                'feature_columns': required_prediction_columns,
+                'metrics': {metric: float(value) for metric, value in baseline_metrics.items()},
+                'feature_importance': feature_importance,
+                'fraud_model': fraud_model,
+                'fraud_threshold': fraud_threshold,
+                'skipped_candidates': skipped,
+                'reference_profile': reference_profile,
+                'trained_at': training_date,
+            }
         return results_df
     
     except Exception as e:
         # self.logger.error(f"Training failed: {str(e)}")
         # st.error(f"Training failed: {str(e)}")
-        raise str(e)
+        raise
         
\ No newline at end of file
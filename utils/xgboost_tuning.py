@@ -0,0 +1,187 @@
+import os
+import threading
+import warnings
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+import optuna
+import xgboost as xgb
+from dotenv import load_dotenv
+from sklearn.base import clone
+from sklearn.metrics import mean_absolute_error
+
+load_dotenv()
+
+# Storage URL of the XGBoost tuning studies; runs on the same user, dataset
+# version and split resume their study. Empty keeps studies in memory.
+OPTUNA_STORAGE = os.getenv("OPTUNA_STORAGE", "sqlite:///optuna_studies.db")
+# Trial pruner: "median", "halving" (successive halving) or "none"
+OPTUNA_PRUNER = os.getenv("OPTUNA_PRUNER", "median")
+# Trials evaluated at once; they share the candidate's cores
+OPTUNA_TRIAL_WORKERS = int(os.getenv("OPTUNA_TRIAL_WORKERS", 2))
+# Boosting rounds without improvement on the validation rows before a trial stops
+XGBOOST_EARLY_STOPPING_ROUNDS = int(os.getenv("XGBOOST_EARLY_STOPPING_ROUNDS", 20))
+# Share of the training rows, taken from the end, that trials are scored on
+TUNING_VALIDATION_FRACTION = float(os.getenv("TUNING_VALIDATION_FRACTION", 0.2))
+
+# Seconds without a heartbeat before a running trial counts as dead; a stale
+# study is only deleted once its last trial is older than this
+HEARTBEAT_GRACE_PERIOD = 120
+
+# Boosting rounds between the intermediate scores a trial reports to the
+# pruner; every report is a write to the study storage
+PRUNING_REPORT_INTERVAL = 25
+
+FINISHED_STATES = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+
+
+def xgboost_study_name(user_id: int, dataset_version: str, target_variable: str, test_set_size: float) -> str:
+    return f"xgboost:user:{user_id}:{dataset_version}:{target_variable}:{test_set_size:g}"
+
+
+@lru_cache(maxsize=None)
+def _storage(url: str) -> optuna.storages.RDBStorage:
+    # the heartbeat lets a later run fail the trials of a killed one instead of waiting on them
+    engine_kwargs = {"connect_args": {"timeout": 30}} if url.startswith("sqlite") else {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", optuna.exceptions.ExperimentalWarning)
+        return optuna.storages.RDBStorage(
+            url, engine_kwargs=engine_kwargs, heartbeat_interval=60, grace_period=HEARTBEAT_GRACE_PERIOD,
+        )
+
+
+def _pruner() -> optuna.pruners.BasePruner:
+    if OPTUNA_PRUNER == "median":
+        return optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=PRUNING_REPORT_INTERVAL * 2)
+    if OPTUNA_PRUNER == "halving":
+        return optuna.pruners.SuccessiveHalvingPruner()
+    if OPTUNA_PRUNER == "none":
+        return optuna.pruners.NopPruner()
+    raise ValueError(f"Unknown OPTUNA_PRUNER: {OPTUNA_PRUNER}")
+
+
+def _study_idle(storage: optuna.storages.BaseStorage, study_name: str) -> bool:
+    """
+    Whether no run is tuning a study: once trials whose heartbeat lapsed
+    are failed, none is running and the last one finished more than
+    HEARTBEAT_GRACE_PERIOD ago. A study without trials may have just been
+    created by another run, so it does not count as idle.
+    """
+    study = optuna.load_study(study_name=study_name, storage=storage)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", optuna.exceptions.ExperimentalWarning)
+        optuna.storages.fail_stale_trials(study)
+    trials = study.get_trials(deepcopy=False)
+    if not trials or any(trial.state == optuna.trial.TrialState.RUNNING for trial in trials):
+        return False
+    # Optuna stamps trials with naive local times; waiting trials have none yet
+    stamps = [trial.datetime_complete or trial.datetime_start for trial in trials]
+    stamps = [stamp for stamp in stamps if stamp is not None]
+    return bool(stamps) and (datetime.now() - max(stamps)).total_seconds() > HEARTBEAT_GRACE_PERIOD
+
+
+def _drop_stale_studies(storage: optuna.storages.BaseStorage, study_name: str) -> None:
+    """
+    Delete the user's idle studies on other dataset versions; they can never
+    be resumed. Studies another run is still tuning are left for a later run.
+    """
+    parts = study_name.split(":")
+    user_prefix, version_prefix = ":".join(parts[:3]) + ":", ":".join(parts[:4]) + ":"
+    for study in storage.get_all_studies():
+        if not study.study_name.startswith(user_prefix) or study.study_name.startswith(version_prefix):
+            continue
+        try:
+            if _study_idle(storage, study.study_name):
+                storage.delete_study(storage.get_study_id_from_name(study.study_name))
+        except KeyError:
+            # another run deleted it first
+            continue
+
+
+class _PruningCallback(xgb.callback.TrainingCallback):
+    """Reports the validation MAE to the trial and stops boosting once the pruner says so."""
+
+    def __init__(self, trial: optuna.Trial):
+        self.trial = trial
+
+    def after_iteration(self, model, epoch: int, evals_log) -> bool:
+        if (epoch + 1) % PRUNING_REPORT_INTERVAL == 0:
+            self.trial.report(evals_log["validation_0"]["mae"][-1], step=epoch + 1)
+            if self.trial.should_prune():
+                raise optuna.TrialPruned(f"Pruned after {epoch + 1} rounds")
+        return False
+
+
+def tune_xgboost(model, X_fit, y_fit, X_valid, y_valid, n_trials: int, study_name: Optional[str] = None,
+                 n_jobs: Optional[int] = None, report: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """
+    Search XGBoost hyperparameters with Optuna and return the best ones,
+    `n_estimators` being the rounds early stopping kept.
+
+    Every trial boosts on the preprocessed `X_fit` with CPU `hist` and is
+    scored on `X_valid` (the trailing TUNING_VALIDATION_FRACTION of the
+    training rows). Up to OPTUNA_TRIAL_WORKERS trials run at once, sharing
+    `n_jobs` cores (all cores when None). Named studies live in
+    OPTUNA_STORAGE and are resumed: only the trials still missing from
+    `n_trials` are run. `report` gets the number of finished trials after
+    each one.
+    """
+    cores = n_jobs or os.cpu_count() or 1
+    workers = max(1, min(OPTUNA_TRIAL_WORKERS, cores, n_trials))
+    threads = max(1, cores // workers)
+
+    def objective(trial):
+        params = {
+            'regressor__n_estimators': trial.suggest_int('regressor__n_estimators', 50, 500),
+            'regressor__max_depth': trial.suggest_int('regressor__max_depth', 3, 10),
+            'regressor__learning_rate': trial.suggest_float('regressor__learning_rate', 0.001, 0.1, log=True),
+            'regressor__subsample': trial.suggest_float('regressor__subsample', 0.5, 1.0),
+            'regressor__colsample_bytree': trial.suggest_float('regressor__colsample_bytree', 0.5, 1.0)
+        }
+        regressor = clone(model).set_params(
+            **{name.split('__', 1)[1]: value for name, value in params.items()},
+            tree_method='hist',
+            n_jobs=threads,
+            eval_metric='mae',
+            early_stopping_rounds=XGBOOST_EARLY_STOPPING_ROUNDS,
+            callbacks=[_PruningCallback(trial)],
+        )
+        regressor.fit(X_fit, y_fit, eval_set=[(X_valid, y_valid)], verbose=False)
+        trial.set_user_attr('best_iteration', int(regressor.best_iteration))
+        # predictions use the rounds up to the best iteration
+        return mean_absolute_error(y_valid, regressor.predict(X_valid))
+
+    storage = _storage(OPTUNA_STORAGE) if study_name and OPTUNA_STORAGE else None
+    study = optuna.create_study(
+        study_name=study_name if storage is not None else None,
+        storage=storage,
+        direction='minimize',
+        pruner=_pruner(),
+        load_if_exists=True,
+    )
+    finished = len(study.get_trials(deepcopy=False, states=FINISHED_STATES))
+    if storage is not None and finished == 0:
+        _drop_stale_studies(storage, study_name)
+
+    lock = threading.Lock()
+    counter = [min(finished, n_trials)]
+
+    def on_trial(study, trial):
+        with lock:
+            counter[0] += 1
+            if report is not None:
+                report(counter[0])
+
+    if finished < n_trials:
+        study.optimize(objective, n_trials=n_trials - finished, n_jobs=workers, callbacks=[on_trial])
+
+    complete = study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))
+    if not complete:
+        return {}
+    best = min(complete, key=lambda trial: trial.value)
+    # trial parameters are named as pipeline parameters (`regressor__...`)
+    return {
+        **{name.split('__', 1)[1]: value for name, value in best.params.items()},
+        'n_estimators': best.user_attrs['best_iteration'] + 1,
+    }